@@ -0,0 +1,394 @@
+"""
+Headless HTTP API
+Latest snapshot as JSON (or CSV/NDJSON/Parquet/Arrow) with conditional GET and gzip, no page render
+
+    python api.py --port 8080
+    curl 'http://localhost:8080/v1/summary?exchanges=binance,kraken&fields=exchange,balance,change'
+"""
+
+import os
+import gzip
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import argparse
+from collections import OrderedDict
+from datetime import date, datetime, time as dt_time, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+import pandas as pd
+from aiohttp import web
+from collector import COLLECTOR_MODE, SNAPSHOT_FILE, Collector, read_snapshot_file
+from exports import FORMATS, chunked, encode, history_frames, wallet_frame
+from history import HistoryStore, snapshot_label
+from holdings import (BENCHMARK_PRICE_AGE, EXCHANGES, HISTORICAL_TAKEN_AT, apply_benchmark,
+                      benchmark_snapshot, create_summary_dataframe, open_history_store,
+                      with_usd_values)
+from shared_cache import open_shared_cache
+from stream import STREAM_ENABLED, BalanceStream
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+API_PORT = int(os.environ.get("XRP_API_PORT", "8080"))
+RESPONSE_CACHE_ENTRIES = 64  # Encoded bodies kept for repeated unconditional requests
+GZIP_LEVEL = 6
+FIRST_SNAPSHOT_WAIT = 60  # Seconds a fresh process waits for its first snapshot
+
+# Summary frame column -> API field; the benchmark balance column is renamed separately
+SUMMARY_FIELDS = {
+    "Exchange": "name",
+    "Balance (XRP)": "balance",
+    "Wallet Count": "wallet_count",
+    "Errors": "errors",
+    "Stale Wallets": "stale",
+    "Unfunded": "unfunded",
+    "Change (XRP)": "change",
+    "Change (%)": "change_pct",
+    "Market Share (%)": "market_share_pct",
+    "Value (USD)": "value_usd",
+    "Change (USD)": "change_usd",
+}
+SUMMARY_COLUMNS = ["rank", "exchange", *SUMMARY_FIELDS.values(), "benchmark_balance"]
+WALLET_COLUMNS = ["exchange", "name", "address", "drops", "balance", "failed", "stale", "unfunded",
+                  "as_of", "historical"]
+PER_READ_FIELDS = ("age", "refreshing")  # Recomputed on every read of the collector, never served
+
+
+class BadRequest(Exception):
+    """Invalid query parameter, answered with 400"""
+
+
+# ============================================================================
+# SNAPSHOT SOURCE
+# ============================================================================
+
+class SnapshotSource:
+    """Latest snapshot from an in-process collector or an external collector's file"""
+
+    def __init__(self, store: HistoryStore, mode: str = COLLECTOR_MODE,
+                 snapshot_file: str = SNAPSHOT_FILE):
+        self.store = store
+        self.mode = mode
+        self.snapshot_file = snapshot_file
+        self.collector: Optional[Collector] = None
+        self._file: Tuple[Optional[float], Optional[Dict]] = (None, None)
+
+    def start(self) -> "SnapshotSource":
+        if self.mode != "external":
+            stream = None
+            if STREAM_ENABLED:
+                stream = BalanceStream([addr for wallets in EXCHANGES.values() for addr in wallets]).start()
+            self.collector = Collector(self.store, stream, shared=open_shared_cache()).start()
+        return self
+
+    def latest(self) -> Optional[Dict]:
+        if self.collector is not None:
+            return self.collector.latest()
+        try:
+            mtime = os.path.getmtime(self.snapshot_file)
+        except OSError:
+            return None
+        if mtime != self._file[0]:
+            self._file = (mtime, read_snapshot_file(self.snapshot_file))
+        return self._file[1]
+
+
+@lru_cache(maxsize=16)
+def benchmark_drops(store: HistoryStore, snapshot_id: int) -> pd.Series:
+    """Drops of a stored snapshot by address; stored snapshots never change"""
+    return pd.Series(store.get_drops(snapshot_id), dtype="int64")
+
+
+# ============================================================================
+# QUERY PARAMETERS
+# ============================================================================
+
+def _list_param(request: web.Request, name: str) -> Optional[List[str]]:
+    value = request.query.get(name)
+    if not value:
+        return None
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def parse_exchanges(request: web.Request) -> List[str]:
+    exchanges = _list_param(request, "exchanges")
+    if exchanges is None:
+        return list(EXCHANGES)
+    unknown = [name for name in exchanges if name not in EXCHANGES]
+    if unknown:
+        raise BadRequest(f"Unknown exchanges: {', '.join(unknown)}")
+    return exchanges
+
+
+def parse_date(request: web.Request, name: str, default: Optional[date] = None) -> Optional[date]:
+    value = request.query.get(name)
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise BadRequest(f"{name} must be a YYYY-MM-DD date")
+
+
+def parse_format(request: web.Request) -> str:
+    fmt = request.query.get("format", "json")
+    if fmt not in FORMATS:
+        raise BadRequest(f"format must be one of {', '.join(FORMATS)}")
+    return fmt
+
+
+def parse_fields(request: web.Request, available: List[str]) -> List[str]:
+    fields = _list_param(request, "fields")
+    if fields is None:
+        return available
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise BadRequest(f"Unknown fields: {', '.join(unknown)}; available: {', '.join(available)}")
+    return fields
+
+
+def parse_benchmark(request: web.Request) -> Dict:
+    """Latest stored snapshot on or before ?benchmark=YYYY-MM-DD (default Feb 24, 2025)"""
+    return benchmark_snapshot(request.app["store"],
+                              parse_date(request, "benchmark", HISTORICAL_TAKEN_AT.date()))
+
+
+# ============================================================================
+# VIEWS
+# ============================================================================
+
+def benchmarked_table(store: HistoryStore, snapshot: Dict, exchanges: List[str], benchmark: Dict):
+    return apply_benchmark(snapshot["snapshot"].view(exchanges), benchmark_drops(store, benchmark["id"]))
+
+
+def summary_frame(store: HistoryStore, snapshot: Dict, exchanges: List[str],
+                  benchmark: Dict) -> pd.DataFrame:
+    """create_summary_dataframe output, valued in USD, with API field names and exchange keys"""
+    table = benchmarked_table(store, snapshot, exchanges, benchmark)
+    label = snapshot_label(benchmark)
+    benchmark_price = store.price_at(datetime.fromtimestamp(benchmark["taken_at"], timezone.utc),
+                                     BENCHMARK_PRICE_AGE)
+    df = with_usd_values(create_summary_dataframe(table, label), _price(snapshot)["price"],
+                         benchmark_price, label)
+    keys = {name.title(): name for name in table.exchanges}
+    df = df.rename(columns=dict(SUMMARY_FIELDS, **{f"Balance ({label})": "benchmark_balance"}))
+    df.insert(0, "exchange", df["name"].map(keys))
+    return df.reset_index().rename(columns={"Rank": "rank"})[SUMMARY_COLUMNS]
+
+
+def _price(snapshot: Dict) -> Dict:
+    return snapshot.get("price") or {"price": None, "fetched_at": None}
+
+
+def snapshot_meta(snapshot: Dict) -> Dict:
+    """Snapshot fields of /v1/snapshot; per-read fields such as ages are left out so ETags hold"""
+    price = snapshot.get("price")
+    return {
+        "version": snapshot["version"],
+        "ledger_index": snapshot["ledger_index"],
+        "close_time": snapshot.get("close_time"),
+        "fetched_at": snapshot["fetched_at"],
+        "error": snapshot.get("error"),
+        "price": ({key: value for key, value in price.items() if key not in PER_READ_FIELDS}
+                  if price else None),
+    }
+
+
+# ============================================================================
+# HTTP
+# ============================================================================
+
+def _etag(*parts) -> str:
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'  # Weak: the gzip and identity encodings share it
+
+
+def _not_modified(request: web.Request, etag: str, last_modified: float) -> bool:
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    since = request.headers.get("If-Modified-Since")
+    if since:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _accepts_gzip(request: web.Request) -> bool:
+    return "gzip" in request.headers.get("Accept-Encoding", "").lower()
+
+
+def _cached_body(bodies: OrderedDict, etag: str, build) -> Tuple[bytes, bytes]:
+    """(identity, gzip) encodings of a body, built and compressed once per ETag"""
+    if etag in bodies:
+        bodies.move_to_end(etag)
+        return bodies[etag]
+    body = build()
+    bodies[etag] = (body, gzip.compress(body, GZIP_LEVEL))
+    if len(bodies) > RESPONSE_CACHE_ENTRIES:
+        bodies.popitem(last=False)
+    return bodies[etag]
+
+
+def conditional_response(request: web.Request, snapshot: Dict, etag_parts: Tuple,
+                         content_type: str, build,
+                         last_modified: Optional[float] = None) -> web.Response:
+    """304 if the client's copy is current, else the (cached) body, gzipped when accepted
+
+    The ETag covers the snapshot version plus everything the body depends
+    on, so it is known before any data is serialized.
+    """
+    etag = _etag(request.path, sorted(request.query.items()), *etag_parts)
+    last_modified = last_modified or snapshot["fetched_at"]
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+        "X-Snapshot-Version": str(snapshot["version"]),
+    }
+    if _not_modified(request, etag, last_modified):
+        return web.Response(status=304, headers=headers)
+    body, gzipped = _cached_body(request.app["bodies"], etag, build)
+    if _accepts_gzip(request):
+        body = gzipped
+        headers["Content-Encoding"] = "gzip"
+    return web.Response(body=body, content_type=content_type, headers=headers)
+
+
+def _latest_or_503(request: web.Request) -> Dict:
+    snapshot = request.app["source"].latest()
+    if snapshot is None:
+        raise web.HTTPServiceUnavailable(text=json.dumps({"error": "No snapshot collected yet"}),
+                                         content_type="application/json")
+    return snapshot
+
+
+def _encoded(frame: pd.DataFrame, fmt: str) -> bytes:
+    return b"".join(encode(fmt, chunked(frame)))
+
+
+@web.middleware
+async def errors_middleware(request: web.Request, handler):
+    try:
+        return await handler(request)
+    except BadRequest as e:
+        return web.json_response({"error": str(e)}, status=400)
+
+
+async def handle_snapshot(request: web.Request) -> web.Response:
+    snapshot = _latest_or_503(request)
+    price = _price(snapshot)
+    # Everything snapshot_meta serves, so the ETag is known before serializing
+    etag_parts = (snapshot["version"], snapshot["fetched_at"], snapshot.get("error"),
+                  price["fetched_at"], price.get("error"))
+    return conditional_response(request, snapshot, etag_parts, "application/json",
+                                lambda: json.dumps(snapshot_meta(snapshot), default=str).encode(),
+                                last_modified=max(snapshot["fetched_at"], price["fetched_at"] or 0))
+
+
+async def handle_summary(request: web.Request) -> web.Response:
+    """Per-exchange totals, market share, USD value and change vs. the benchmark"""
+    snapshot = _latest_or_503(request)
+    exchanges = parse_exchanges(request)
+    fields = parse_fields(request, SUMMARY_COLUMNS)
+    fmt = parse_format(request)
+    benchmark = parse_benchmark(request)
+
+    def build() -> bytes:
+        df = summary_frame(request.app["store"], snapshot, exchanges, benchmark)
+        return _encoded(df[fields], fmt)
+
+    price_at = _price(snapshot)["fetched_at"]
+    return conditional_response(request, snapshot, (snapshot["version"], benchmark["id"], price_at),
+                                FORMATS[fmt][0], build,
+                                last_modified=max(snapshot["fetched_at"], price_at or 0))
+
+
+async def handle_wallets(request: web.Request) -> web.Response:
+    """One row per wallet with drops, XRP balance, status flags and benchmark drops"""
+    snapshot = _latest_or_503(request)
+    exchanges = parse_exchanges(request)
+    fields = parse_fields(request, WALLET_COLUMNS)
+    fmt = parse_format(request)
+    benchmark = parse_benchmark(request)
+
+    def build() -> bytes:
+        table = benchmarked_table(request.app["store"], snapshot, exchanges, benchmark)
+        return _encoded(wallet_frame(table)[fields], fmt)
+
+    return conditional_response(request, snapshot, (snapshot["version"], benchmark["id"]),
+                                FORMATS[fmt][0], build)
+
+
+async def handle_history(request: web.Request) -> web.StreamResponse:
+    """Stored balances between two dates, streamed chunk by chunk"""
+    today = datetime.now(timezone.utc).date()
+    start = parse_date(request, "start", today)
+    end = parse_date(request, "end", today)
+    fmt = parse_format(request)
+    chunks: Iterator[bytes] = encode(fmt, history_frames(
+        request.app["store"],
+        datetime.combine(start, dt_time.min, tzinfo=timezone.utc),
+        datetime.combine(end, dt_time.max, tzinfo=timezone.utc),
+    ))
+    response = web.StreamResponse(headers={"Content-Type": FORMATS[fmt][0]})
+    if _accepts_gzip(request):
+        response.enable_compression(web.ContentCoding.gzip)
+    await response.prepare(request)
+    loop = asyncio.get_running_loop()
+    while True:
+        chunk = await loop.run_in_executor(None, next, chunks, None)  # SQLite and encoding block
+        if chunk is None:
+            break
+        await response.write(chunk)
+    await response.write_eof()
+    return response
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    snapshot = request.app["source"].latest()
+    age = time.time() - snapshot["fetched_at"] if snapshot else None
+    return web.json_response({"ok": snapshot is not None, "age": age})
+
+
+def make_app(source: SnapshotSource, store: HistoryStore) -> web.Application:
+    app = web.Application(middlewares=[errors_middleware])
+    app["source"] = source
+    app["store"] = store
+    app["bodies"] = OrderedDict()  # ETag -> encoded body, least recently used first
+    app.router.add_get("/v1/snapshot", handle_snapshot)
+    app.router.add_get("/v1/summary", handle_summary)
+    app.router.add_get("/v1/wallets", handle_wallets)
+    app.router.add_get("/v1/history", handle_history)
+    app.router.add_get("/healthz", handle_health)
+    return app
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the latest XRP exchange snapshot over HTTP")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    store = open_history_store()
+    source = SnapshotSource(store).start()
+    if source.collector is not None:
+        source.collector.wait_for_snapshot(FIRST_SNAPSHOT_WAIT)
+    web.run_app(make_app(source, store), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
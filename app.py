@@ -6,16 +6,26 @@ Interactive Streamlit dashboard with async fetching, auto-refresh, and improved
 import streamlit as st
 import streamlit.components.v1 as components
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import requests
-import asyncio
-import aiohttp
+import os
 import time
-from datetime import datetime
-from typing import Dict, Optional
-import json
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, time as dt_time, timedelta, timezone
+from typing import Dict, Optional, Tuple
+from functools import partial
+from charts import CHART_TYPES, build_change_chart, build_holdings_chart
+from history import HistoryStore, snapshot_label
+from holdings import (BENCHMARK_PRICE_AGE, EXCHANGES, HISTORICAL_TAKEN_AT, REGISTRY, apply_benchmark,
+                      benchmark_snapshot, create_summary_dataframe, open_history_store, with_usd_values)
+from exports import FORMATS, chunked, encode, file_name, history_frames, nested_json, wallet_frame
+from flows import FlowStore, net_flows
+from richlist import RICHLIST_FILE, read_richlist
+from collector import (BALANCE_INTERVAL, COLLECTOR_MODE, PRICE_INTERVAL, REFRESH_LEDGERS, SNAPSHOT_FILE,
+                       Collector, read_snapshot_file)
+from shared_cache import open_shared_cache
+from stream import STREAM_ENABLED, BalanceStream
+from metrics import metrics, start_metrics_server
+from rippled import DROPS_PER_XRP, LEDGER_SECONDS, endpoint_manager
+from snapshot import Snapshot
+from wallets import WalletTable
 
 # ============================================================================
 # ANALYTICS
@@ -54,400 +64,13 @@ st.set_page_config(
 # CONFIGURATION
 # ============================================================================
 
-RIPPLED_URLS = [
-    "https://s1.ripple.com:51234",
-    "https://s2.ripple.com:51234",
-    "https://xrplcluster.com",
-]
-MAX_RETRIES = 2
-REQUEST_TIMEOUT = 8
-MAX_WORKERS = 20  # Concurrent requests
-
-# ============================================================================
-# HISTORICAL DATA - February 24, 2025 Benchmark
-# ============================================================================
-
-HISTORICAL_BALANCES_20250224 = {
-    "r38a3PtqW3M7LRESgaR4dyHjg3AxAmiZCt": 500000022.920354,
-    "r4G689g4KePYLKkyyumM1iUppTP4nhZwVC": 500000023.954709,
-    "rDxJNbV23mu9xsWoQHoBqZQvc77YcbJXwb": 980472688.335846,
-    "rHHQeqjz2QyNj1DVoAbcvfaKLv7RxpHMNE": 427.863089,
-    "rJWbw1u3oDDRcYLFqiWFjhGWRKVcBAWdgp": 500000022.940415,
-    "rJo4m69u9Wd1F8fN2RbgAsJEF6a4hW1nSi": 500000022.974330,
-    "rLgn612WAgRoZ285YmsQ4t7kb8Ui3csdoU": 500000022.970497,
-    "rMNUAfSz2spLEbaBwPnGtxTzZCajJifnzH": 500000022.930304,
-    "rNcAdhSLXBrJ3aZUq22HaNtNEPpB5fR8Ri": 500000070.927547,
-    "raQwCVAJVqjrVm1Nj5SFRcX8i22BhdC9WA": 5380330.943804,
-    "rfL1mn4VTCoHdhHhHMwqpShCFUaDBRk6Z5": 500000113.144652,
-    "rs48xReB6gjKtTnTfii93iwUhjhTJsW78B": 500000022.951598,
-    "rwa7YXssGVAL9yPKw6QJtCen2UqZbRQqpM": 500000111.032735,
-    "r3ZVNKgkkT3A7hbEZ8HxnNnLDCCmZiZECV": 4319156.176484,
-    "rEb8TK3gBgk5auZkwc6sHnwrGVJH8DuaLh": 7375.223257,
-    "rEeEWeP88cpKUddKk37B2EZeiHBGiBXY3": 122.800031,
-    "rMvYS27SYs5dXdFsUgpvv1CSrPsCz7ePF5": 219728.667554,
-    "rNU4eAowPuixS5ZCWaRL72UUeKgxcKExpK": 6152514.319652,
-    "rNxp4h8apvRis6mJf9Sh8C6iRxfrDWN7AV": 268204.837425,
-    "rPCpZwPKogNodbjRxGDnefVXu9Q9R4PN4Q": 593.363378,
-    "rPJ5GFpyDLv7gqeB1uZVUBwDwi41kaXN5A": 109917943.727643,
-    "rPz2qA93PeRCyHyFCqyNggnyycJR1N4iNf": 661827727.919798,
-    "rhWj9gaovwu2hZxYW7p388P8GRbuXFLQkK": 4831865.223177,
-    "rGZjPjMkfhAqmc1ssEiT753uAgyftHRo2m": 20.251542,
-    "rLHzPsX6oXkzU2qL12kHCH8G8cnZv1rBJh": 25860812.904039,
-    "rUeDDFNp2q7Ymvyv75hFGC8DAcygVyJbNF": 265582363.149146,
-    "rp7TCczQuQo61dUo1oAgwdpRxLrA8vDaNV": 290523350.512168,
-    "rJn2zAPdFA193sixJwuFixRkYDUtx3apQh": 4653377.535326,
-    "rMrgNBrkE6FdCjWih5VAWkGMrmerrWpiZt": 9.757080,
-    "rMvCasZ9cohYrSZRNYPTZfoaaSUQMfgQ8G": 116576792.538589,
-    "rNFKfGBzMspdKfaZdpnEyhkFyw7C1mtQ8x": 20.965423,
-    "raQxZLtqurEXvH5sgijrif7yXMNwvFRkJN": 147378587.843680,
-    "rwBHqnCgNRnk3Kyoc6zon6Wt4Wujj3HNGe": 57941994.752545,
-    "r39uEuRjzLaSgvkjTfcejodbSrXLM3cYnX": 293.297424,
-    "rDDyH5nfvozKZQCwiBrWfcE528sWsBPWET": 2639.366730,
-    "rKcVYzVK1f4PhRFjLhWP7QmteG5FpPgRub": 36.929646,
-    "rNRc2S2GSefSkTkAiyjE6LDzMonpeHp6jS": 318277941.998112,
-    "rUaESVd1yLMy5VyoJvwwuqE8ZiCb2PEqBR": 1123.897979,
-    "raSZXZApFg7Nj1B5G6BnhoL6HcTqVMopJ3": 79576.400141,
-}
-
-HISTORICAL_DATE = "Feb 24, 2025"
-
-# ============================================================================
-# EXCHANGE DEFINITIONS (condensed for brevity - same as original)
-# ============================================================================
-
-EXCHANGES = {
-     "robinhood": {
-        "rEAKseZ7yNgaDuxH74PkqB12cVWohpi7R6": "Robinhood1",
-        "r4ZuQtPNXGRMKfPjAsn2J7gRqoQuWnTPFP": "Robinhood2"
-    },
-    "bitflyer": {
-        "rpY7bZBkA98P8zds5LdBktAKj9ifekPdkE": "BitFlyer 3",
-        "rhWVCsCXrkwTeLBg6DyDr7abDaHz3zAKmn": "BitFlyer 4"
-    },
-    "bitpoint": {
-        "rwPbLSqTDYwvCsGZEzDTNo3SgzCwEjQdWZ": "BitPoint 1",
-        "rfmMjAXq65hpAxEf1RLNQq6RgYTSVkQUW5": "BitPoint 2"
-    },
-    "bitget": {
-        "rGDreBvnHrX1get7na3J4oowN19ny4GzFn": "Bitget Global"
-    },
-    "bitso": {
-        "rLSn6Z3T8uCxbcd1oxwfGQN1Fdn5CyGujK": "Bitso 3"
-    },
-    "binance": {
-        "rEb8TK3gBgk5auZkwc6sHnwrGVJH8DuaLh": "Binance 1",
-        "rNU4eAowPuixS5ZCWaRL72UUeKgxcKExpK": "Binance 10",
-        "rNxp4h8apvRis6mJf9Sh8C6iRxfrDWN7AV": "Binance 11",
-        "rPJ5GFpyDLv7gqeB1uZVUBwDwi41kaXN5A": "Binance 12",
-        "rPz2qA93PeRCyHyFCqyNggnyycJR1N4iNf": "Binance 13",
-        "rhWj9gaovwu2hZxYW7p388P8GRbuXFLQkK": "Binance 14",
-        "rarG6FaeYhnzSKSS5EEPofo4gFsPn2bZKk": "Binance 15",
-        "rs8ZPbYqgecRcDzQpJYAMhSxSi5htsjnza": "Binance 5",
-        "rDAE53VfMvftPB4ogpWGWvzkQxfht6JPxr": "Binance 6",
-        "rfQ9EcLkU6WnNmkS3EwUkFeXeN47Rk8Cvi": "Binance 18",
-        "rBtttd61FExHC68vsZ8dqmS3DfjFEceA1A": "Binance 9",
-        "rLoqMgpjwGEQinYEM623za8c2nC2Uah8v7": "Binance 21",
-        "rQUp2PKzH3vCtKs5H9tsPPE1rTsN6fhjqn": "Binance 22",
-        "rEeEWeP88cpKUddKk37B2EZeiHBGiBXY3": "Binance US 1",
-        "rMvYS27SYs5dXdFsUgpvv1CSrPsCz7ePF5": "Binance US 2",
-        "r3ZVNKgkkT3A7hbEZ8HxnNnLDCCmZiZECV": "Binance US 3",
-        "rPCpZwPKogNodbjRxGDnefVXu9Q9R4PN4Q": "Binance US 4",
-        "rP3mUZyCDzZkTSd1VHoBbFt8HGm8fyq8qV": "Binance 17",
-        "rDecw8UhrZZUiaWc91e571b3TL41MUioh7": "Binance 16",
-        "rJpj1Mv21gJzsbsVnkp1U4nqchZbmZ9pM5": "Binance (XRP-BF2 Reserve)",
-        "rfxbaKNt5SnMw5rPRRm4C53YK76MEnVXro": "Binance Charity2"
-    },
-    "bitpanda": {
-        "rUEfYyerfok6Yo38tTTTZKeRefNh9iB1Bd": "Bitpanda1",
-        "rhVWrjB9EGDeK4zuJ1x2KXSjjSpsDQSaU6": "Bitpanda2",
-        "r3T75fuLjX51mmfb5Sk1kMNuhBgBPJsjza": "Bitpanda3",
-        "rbrCJQZVk6jYra1MPuSvX3Vpe4to9fAvh":  "Bitpanda4"
-    },
-
-    "bitstamp": {
-        "rDsbeomae4FXwgQTJp9Rs64Qg9vDiTCdBv": "Bitstamp1",
-        "rUobSiUpYH2S97Mgb4E7b7HuzQj2uzZ3aD": "Bitstamp2",
-        "rBMFF7vhe2pxYS5wo3dpXMDrbbRudB7hGf": "Bitstamp3",
-        "rEXmdJZRfjXN3XGVdz99dGSZpQyJqUeirE": "Bitstamp"
-    },
-    "bitbank": {
-        "rLbKbPyuvs4wc1h13BEPHgbFGsRXMeFGL6": "Bitbank1",
-        "rw7m3CtVHwGSdhFjV4MyJozmZJv3DYQnsA": "Bitbank2",
-        "rwggnsfxvCmDb3YP9Hs1TaGvrPR7ngrn7Z": "Bitbank3",
-        "r97KeayHuEsDwyU1yPBVtMLLoQr79QcRFe": "Bitbank4"
-    },
-    "bitfinex": {
-        "rLW9gnQo7BQhU6igk5keqYnH3TVrCxGRzm": "Bitfinex1",
-        "rE3hWEGquaixF2XwirNbA1ds4m55LxNZPk": "Bitfinex2"
-    },
-    "bitrue": {
-        "rKq7xLeTaDFCg9cdy9MmgxpPWS8EZf2fNq": "Bitrue1",
-        "raLPjTYeGezfdb6crXZzcC8RkLBEwbBHJ5": "Bitrue2",
-        "rfKsmLP6sTfVGDvga6rW6XbmSFUzc3G9f3": "Bitrue3",
-        "rNYW2bie6KwUSYhhtcnXWzRy5nLCa1UNCn": "Bitrue Insurance Fund",
-        "r4DbbWjsZQ2hCcxmjncr7MRjpXTBPckGa9": "Bitrue Cold2"
-    },
-    "bithumb": {
-        "rPMM1dRp7taeRkbT74Smx2a25kTAHdr4N5": "Bithumb1",
-        "rNTkgxs5WG5mU5Sz26YoDVrHim5Y5ohC7": "Bithumb2",
-        "r9hUMZBc3MWRc4YdsdZgNCW5Qef8wNSXpb": "Bithumb3",
-        "r9LHiNDZvpLoWPoKnbH2JWjFET8zoYT4Y5": "Bithumb4",
-        "rD7XQw67JWBXuo2WPX2gZRsGKNsDUGTbx5": "Bithumb",
-        "rZcBQae9iSJqFYBpNCfxGLXH7xuEzizxR": "Bithumb10",
-        "rrsSUzrT2mYAMiL46pm7cwn6MmMmxVkEWM": "Bithumb11",
-        "rPyCQm8E5j78PDbrfKF24fRC7qUAk1kDMZ": "Bithumb12",
-        "rw3fRcmn5PJyPKuvtAwHDSpEqoW2JKmKbu": "Bithumb13"
-    },
-    "bitkub": {
-        "rE3Cc3i6163Qzo7oc6avFQAxQE4gyCWhGP": "Bitkub 3"
-    },
-    "BTC Markes": {
-        "r94JFtstbXmyG21h3RHKcNfkAHxAQ6HSGC": "BTC Markets 1",
-        "rL3ggCUKaiR1iywkGW6PACbn3Y8g5edWiY": "BTC Markets 2",
-        "rU7xJs7QmjbiyxpEozNYUFQxaRD5kueY7z": "BTC Markets 3",
-        "rwWZxJQ8R2mvvtaFUJHhF6kfV64atBiPww": "BTC Markets 4",
-        "r3zUhJWabAMMLT5n631r2wDh9RP3dN1bRy": "BTC Markets 5",
-        "rKRYAqMFTTGMZ47eXJVRKcqLJgnPQbXisg": "BTC Markets 6"
-    },
-
-    "bybit": {
-        "rMrgNBrkE6FdCjWih5VAWkGMrmerrWpiZt": "Bybit 1",
-        "rNFKfGBzMspdKfaZdpnEyhkFyw7C1mtQ8x": "Bybit 2",
-        "rJn2zAPdFA193sixJwuFixRkYDUtx3apQh": "Bybit 3",
-        "rMvCasZ9cohYrSZRNYPTZfoaaSUQMfgQ8G": "Bybit 4",
-        "rwBHqnCgNRnk3Kyoc6zon6Wt4Wujj3HNGe": "Bybit 5",
-        "raQxZLtqurEXvH5sgijrif7yXMNwvFRkJN": "Bybit 6"
-    },
-    "coincheck": {
-        "rNQEMJA4PsoSrZRn9J6RajAYhcDzzhf8ok": "Coincheck 1",
-        "rwgvfze315jjAAxT2TyyDqAPzL68HpAp6v": "Coincheck 2",
-        "r99QSej32nAcjQAri65vE5ZXjw6xpUQ2Eh": "Coincheck 3"
-    },
-    "coinbase": {
-        "rLNaPoKeeBjZe2qs6x52yVPZpZ8td4dc6w": "Coinbase1",
-        "rw2ciyaNshpHe7bCHo4bRWq6pqqynnWKQg": "Coinbase2",
-        "rUfghnh1VAWajpAmxgrzLPiCXJ7RwdJUgt": "Coinbase3",
-        "rwpTh9DDa52XkM9nTKp2QrJuCGV5d1mQVP": "Coinbase4",
-        "r3YsZdkznVzYBv141qhwXHDWoPUXLdksNw": "Coinbase5",
-        "r4sRyacXpbh4HbagmgfoQq8Q3j8ZJzbZ1J": "Coinbase6",
-        "rUjfTQpvBr6wsGGxMw6sRmRQGG76nvp8Ln": "Coinbase7",
-        "rRmgo6NW1W7GHjC5qEpcpQnq8NE74ZS1P": "Coinbase10",
-        "rHrHuQM3E114yMyPjeULWfQmbwVBrHsBEy": "Coinbase11",
-        "rLBunuhuRY7aUCnDkSQhaf5ewCvdcWUYjR": "Coinbase12",
-        "rDw1Z5BqJejpKCGfncHJ9rwRq2kYLo4sJG": "Coinbase13",
-        "rwnYLUsoBQX3ECa1A5bSKLdbPoHKnqf63J": "Coinbase14",
-        "rsTtGH7a9mom5X8Y9D3kxroXWvA912RgUZ": "Coinbase (Cold 176)",
-        "r9mkuV6bpvok7SZ8Zargiw5KzZHDFbaApy": "Coinbase (Cold 285)",
-        "rNaJVWotxZ9nGTBiHRWR6LR1deXHa8FRLf": "Coinbase (Cold 418)",
-        "rGG4LZruYFJ34PNCi1doapgA1hynz3gxX7": "Coinbase (Cold 125)",
-        "rnVcQzWJP2sJbJF3GgvdAeqveW1V7dT2Vq": "Coinbase (Cold 283)",
-        "r417XbsvuBJpkMC4eHtGpvAHxgC24mb6Nc": "Coinbase (Cold 193)",
-        "rPeuuqP9rNhskesoA3ferKfp6VT5SvLAzU": "Coinbase (Cold 299)",
-        "raMRJ2d3djqwSUBK28W31R7aJQfK21zU1C": "Coinbase (Cold 456)",
-        "rBRaRTaq99U216NSDt7dFRrfzAtZzyrgS6": "Coinbase (Cold 188)",
-        "rsVDKTbUceVQqNKrSzYj8HtkVcS7TuRWSN": "Coinbase (Cold 36)",
-        "rBj8PDBTKKuXWJaWbaEtdkV8hq4oxRWhsB": "Coinbase (Cold 392)",
-        "rMJbEvjzqVeGJHs5ySZvuF2dHhWKx69t6G": "Coinbase (Cold 100)",
-        "rw4rHH5LrTUZ5WDXieCPT14E89PwnmXtoV": "Coinbase (Cold 48)",
-        "rNbMpc8JgLKnXs51KVYAmt4zbDvE8kgQEi": "Coinbase (Cold 232)",
-        "rnaxGortNCoxkWUq18jCGmQDeCrLBmiz42": "Coinbase (Cold 92)",
-        "rMsfxSZfdj3F1vBeVRte6b83LMV4AtZAHX": "Coinbase (Cold 434)",
-        "rf9CWxJKUwHm4eZo3Z8SHi6Z1D6RoqFqqq": "Coinbase (Cold 196)",
-        "rKmcvfZ4AeVCsJDNLZg3Xwbs86F33sC6bR": "Coinbase (Cold 78)",
-        "rnYzsCmvD35kBntkY5g4kf7hStMGKSQfwz": "Coinbase (Cold 149)",
-        "rJQC2RzzALgus6ZZgu34nXnpz67v3bRSzi": "Coinbase (Cold 210)",
-        "r939VcVXx5Zx9wJ1TL61StPEKaqaYf75XQ": "Coinbase (Cold 104)",
-        "r9rg8WT6KPXE8FGYbsGG6YaEG6wrbLxqF9": "Coinbase (Cold 206)",
-        "rGoDpsHfkkSvNatyXHZPiJk7qydd7uahQz": "Coinbase (Cold 183)",
-        "raQ3drgGw2eFHTnck6SZxKe2JhQr8Lm8w1": "Coinbase (Cold 108)",
-        "rnWnrbjNw5Ezdqy51a769Rror8U3xRkYxK": "Coinbase (Cold 137)",
-        "rwTjgH22nenAtDpPWy4g7xPhBqhVU845Az": "Coinbase (Cold 265)",
-        "rBAzrxLFZSqni5K67kPqX3WN7VLDTcUVWJ": "Coinbase (Cold 375)",
-        "rnioNuMG47FKY7sZ82EtKt1kBfD4Lg5M4S": "Coinbase (Cold 122)",
-        "rMAxoQbdkCHYpH9VTmdiyrR1F7T4Yvyk2k": "Coinbase (Cold 400)",
-        "rUejaQ5zgB7fMKhj72SPK7xAdGo6ujx2ca": "Coinbase (Cold 87)",
-        "rGK3t5Ppw46RciqcHtrUtvcvhD7M99HJvU": "Coinbase (Cold 379)",
-        "rUb2Ds39TAXnnbKekuUmJsZk11BaenHWHG": "Coinbase (Cold 353)",
-        "rJZkhPxEbvpyuM1tPV2YfkSgSmFPwP4Af6": "Coinbase (Cold 414)",
-        "r9gGyhLJNhWRUPEXbcGXR7HowrAgQL4i4B": "Coinbase (Cold 155)",
-        "rHCwZG3cNaKSr3aANX36m4McU3pLAj91Jr": "Coinbase (Cold 197)",
-        "rLex7Hn4VFotWPCzE1xXnPtx1GfqTzLnJi": "Coinbase (Cold 394)",
-        "rEe4cm8ZvQSMS4h4Jwuj3RtCVwqATwZ1sK": "Coinbase (Cold 396)",
-        "ram3dNqeea6s9HpyH8ANoFMSTW78Gk3gBv": "Coinbase (Cold 146)",
-        "rGthywLPxJPsmCZaWuA7K6xZ5EYJLjoq7e": "Coinbase (Cold 345)",
-        "rKt48W1Eg5M6DWD1CkDDYioA7Civ8zEjiy": "Coinbase (Cold 324)",
-        "rEEKHC9pyscnFz5hqMEe8dMQY5j1ymLC3Y": "Coinbase (Cold 259)",
-        "rnkzrdCPPHhHTEu5XMfmLw2Z5wq9ZNJxFM": "Coinbase (Cold 333)",
-        "rNdTXdz2fABUprp4LrvknEiqYXkvpzN4kx": "Coinbase (Cold 248)",
-        "rMgdeXXHKpnFi9FUZQgZRc73gDFjVK8PMN": "Coinbase (Cold 290)",
-        "rs4qVgzVsYTeTv9Fh5URf6CDeNn22AxXax": "Coinbase (Cold 43)",
-        "rUFDke2TLvmLQaAH6LZYmURAfQ1SCQDSLt": "Coinbase (Cold 135)",
-        "rJUkHKXn7fonFnYs5aP1igXZ3Y1xzKB1": "Coinbase (Cold 321)",
-        "rL2kYqQW7BThQrEVzf1SgohWnXV7adWfqf": "Coinbase (Cold 298)",
-        "rHvCuXyoLzurq45ZNy91kzDmGJLqjf42Z8": "Coinbase (Cold 74)",
-        "r4VDPsS5yatqpkdBoJxNWh3TWWXTnmR62r": "Coinbase (Cold 31)",
-        "rQrYaxwU6vFvA37maEVcs1hLGgxFDxaKZn": "Coinbase (Cold 395)",
-        "raon8BEsrawPug1yEs8ChX4ccEC4bhbEbw": "Coinbase (Cold 136)",
-        "rNqCrZDNfW3apqmrk94AuAdy35eW5jB2pP": "Coinbase (Cold 181)",
-        "rfJL7vFfPsXLhjTctNJJf443tASrrs1Nap": "Coinbase (Cold 409)",
-        "rME6BCc8wFqLFtD6yGDMChPEpChN59VCym": "Coinbase (Cold 300)",
-        "rNx5iPejwegrf6CXgWNsZMGXgj4C2e2QGo": "Coinbase (Cold 187)",
-        "r4pUXa53aRzH11u2ZrPLk1tuM5mFayXwZM": "Coinbase (Cold 403)",
-        "rKrur5amu1cx5ZMdfZ7QdwTLyQta7dXzWW": "Coinbase (Cold 141)",
-        "rhDUYzz8faQi1NkAkD4UqPGhHVtMML4uY1": "Coinbase (Cold 233)",
-        "rH2JhAxcApv8tEJa62jzGZFYgf77NduFDP": "Coinbase (Cold 143)",
-        "rp8XdQLjn41ao7CNHyorP4hS8fbPbACoEw": "Coinbase (Cold 247)",
-        "rJT8GJhJaiugYSgZW6HuZmaGXYKudNXFbw": "Coinbase (Cold 384)",
-        "rsXm9nBire6zqajappuFPLJuydvHDuqz8g": "Coinbase (Cold 124)",
-        "rhhJhWUpU7A1enRxKAmWqyV5c9Y1xrVQTm": "Coinbase (Cold 157)",
-        "rPQmWocoQACFezEbQmmcRPSEhRxqp1Ksz9": "Coinbase (Cold 302)",
-        "rGCc2ah3xtnizjpH3gd2wQm6R837eaULa4": "Coinbase (Cold 438)",
-        "r9ZMdQ63S8NvgdCyLpfhkdbWDfQ57eKD9c": "CoinbaseCold366"
-    },
-    "coinone": {
-        "rp2diYfVtpbgEMyaoWnuaWgFCAkqCAEg28": "Coinone1",
-        "rPsmHDMkheWZvbAkTA8A9bVnUdadPn7XBK": "Coinone2",
-        "rhuCPEoLFYbpbwyhXioSumPKrnfCi3AXJZ": "Coinone3",
-        "rMksM39efoP4XyAqEjzFUEowwnVbQTh6KW": "Coinone4",
-        "rDKw32dPXHfoeGoD3kVtm76ia1WbxYtU7D": "Coinone5"
-    },
-    "coinjar": {
-        "rPvKH3CoiKnne5wAYphhsWgqAEMf1tRAE7": "Coinjar"
-    },
-    "crypto.com": {
-        "r4DymtkgUAh2wqRxVfdd3Xtswzim6eC6c5": "Crypto.com 1",
-        "rPHNKf25y3aqATYfrMv9LQnTRHQUYELXfn": "Crypto.com 2",
-        "rJmXYcKCGJSayp4sAdp6Eo4CdSFtDVv7WG": "Crypto.com 3",
-        "rKNwXQh9GMjaU8uTqKLECsqyib47g5dMvo": "Crypto.com 4",
-        "rKV8HEL3vLc6q9waTiJcewdRdSFyx67QFb": "Crypto Exchange"
-    },
-    "Doppler Finance": {
-        "rprFy94qJB5riJpMmnPDp3ttmVKfcrFiuq": "Doppler Finance 1",
-        "rEPQxsSVER2r4HeVR4APrVCB45K68rqgp2": "Doppler Finance 2"
-    },
-
-    "firi": {
-        "raJHqa1o57DwjtrLCZjdkMKRtfHnbrwSse": "Firi"
-    },
-    "etoro": {
-        "rsdvR9WZzKszBogBJrpLPE64WWyEW4ffzS": "eToro1",
-        "raQ9yYPNDQwyeqAAX9xJgjjQ7wUtLxJ5JV": "eToro2",
-        "rBMe3zVBLgeh2QN4CeX6B17zwbcN6JEmZB": "eToro3",
-        "rEvwSpejhGTbdAXbxRTpGAzPBQkBRZxN5s": "eToro4",
-        "rM9EyDmjxeukZGT6wfkxncqeM3ABJsro3a": "eToro5"
-    },
-    "gate.io": {
-        "rHcFoo6a9qT5NHiVn1THQRhsEGcxtYCV4d": "Gate.io 1",
-        "rLzxZuZuAHM7k3FzfmhGkXVwScM4QSxoY7": "Gate.io 2",
-        "rNnWmrc1EtNRe5SEQEs9pFibcjhpvAiVKF": "Gate.io 3",
-        "rNu9U5sSouNoFunHp9e9trsLV6pvsSf54z": "Gate.io 4"
-    },
-    "gemini": {
-        "raBQUYdAhnnojJQ6Xi3eXztZ74ot24RDq1": "Gemini1",
-        "raq2gccLh11AwvBrpYcHntUTv4xQNRpyyG": "Gemini2",
-        "rBYpyCjNwBDQFrgEdVfyosSgQS6iL6sTHe": "Gemini3"
-    },
-    "kraken": {
-        "rLHzPsX6oXkzU2qL12kHCH8G8cnZv1rBJh": "Kraken1",
-        "rUeDDFNp2q7Ymvyv75hFGC8DAcygVyJbNF": "Kraken2",
-        "rGZjPjMkfhAqmc1ssEiT753uAgyftHRo2m": "Kraken3",
-        "rp7TCczQuQo61dUo1oAgwdpRxLrA8vDaNV": "Kraken4",
-        "rEvuKRoEbZSbM5k5Qe5eTD9BixZXsfkxHf": "Kraken5",
-        "rnJrjec2vrTJAAQUTMTjj7U6xdXrk9N4mT": "Kraken6",
-        "rHapXGCL7KXTovvpEqLfDiZ6WV7vMhPWGJ": "Kraken7"
-    },
-    "KuCoin": {
-         "rLpvuHZFE46NUyZH5XaMvmYRJZF7aory7t": "Kucoin11",
-         "rNFugeoj3ZN8Wv6xhuLegUBBPXKCyWLRkB": "Kucoin5",
-         "rBxszqhQkhPALtkSpGuVeqR6hNtZ8xTH3T": "Kucoin7",
-         "rp4gqz1XdqMsWRZbzPdPAQWw1tg5LuwUVP": "Kucoin8"
-    },
-    "luno": {
-        "rsRy14FvipgqudiGmptJBhr1RtpsgfzKMM": "Luno1",
-        "rsbfd5ZYWqy6XXf6hndPbRjDAzfmWc1CeQ": "Luno2"
-    },
-    "mexc": {
-        "rs2dgzYeqYqsk8bvkQR5YPyqsXYcA24MP2": "Mexc"
-    },
-    "mercadobitcoin": {
-        "rnW8je5SsuFjkMSWkgfXvqZH3gLTpXxfFH": "Mercado Bitcoin 1",
-        "rPEPYN8sHU3cytBwVm69qPbVztaoj7wNf": "Mercado Bitcoin 3"
-    },
-    "okx": {
-        "rUzWJkXyEtT8ekSSxkBYPqCvHpngcy6Fks": "Okx"
-    },
-    "paribu": {
-        "rM9e4hDCEu4hY8SESypL9ymM2sMauDCncf": "Paribu 3"
-    },
-    "tradeogre": {
-        "rhsZa1NR9GqA7NtQjDe5HtYWZxPAZ4oGrE": "TradeOgre"
-    },
-    "uphold": {
-        "rQrQMKhcw3WnptGeWiYSwX5Tz3otyJqPnq": "Uphold2",
-        "rMdG3ju8pgyVh29ELPWaDuA74CpWW6Fxns": "Uphold3",
-        "rBEc94rUFfLfTDwwGN7rQGBHc883c2QHhx": "Uphold4",
-        "rsX8cp4aj9grKVD9V1K2ouUBXgYsjgUtBL": "Uphold8",
-        "rErKXcbZj9BKEMih6eH6ExvBoHn9XLnTWe": "Uphold9",
-        "rKe7pZPwdKEubmEDCAu9djJVsQfK4Atmzr": "Uphold11",
-        "rsXT3AQqhHDusFs3nQQuwcA1yXRLZJAXKw": "uphold12"
-    },
-    "upbit": {
-        "raQwCVAJVqjrVm1Nj5SFRcX8i22BhdC9WA": "Upbit1",
-        "rfL1mn4VTCoHdhHhHMwqpShCFUaDBRk6Z5": "Upbit12",
-        "rwa7YXssGVAL9yPKw6QJtCen2UqZbRQqpM": "Upbit13",
-        "rNcAdhSLXBrJ3aZUq22HaNtNEPpB5fR8Ri": "Upbit14",
-        "r38a3PtqW3M7LRESgaR4dyHjg3AxAmiZCt": "Upbit15",
-        "rMNUAfSz2spLEbaBwPnGtxTzZCajJifnzH": "Upbit16",
-        "rJWbw1u3oDDRcYLFqiWFjhGWRKVcBAWdgp": "Upbit17",
-        "rs48xReB6gjKtTnTfii93iwUhjhTJsW78B": "Upbit18",
-        "rJo4m69u9Wd1F8fN2RbgAsJEF6a4hW1nSi": "Upbit19",
-        "rLgn612WAgRoZ285YmsQ4t7kb8Ui3csdoU": "Upbit20",
-        "r4G689g4KePYLKkyyumM1iUppTP4nhZwVC": "Upbit21",
-        "rDxJNbV23mu9xsWoQHoBqZQvc77YcbJXwb": "Upbit22",
-        "rHHQeqjz2QyNj1DVoAbcvfaKLv7RxpHMNE": "Upbit23"
-    },
-     "sbi": {
-        "rNRc2S2GSefSkTkAiyjE6LDzMonpeHp6jS": "SBI VC TRADE 4",
-        "raSZXZApFg7Nj1B5G6BnhoL6HcTqVMopJ3": "SBI VC Trade 5",
-        "r39uEuRjzLaSgvkjTfcejodbSrXLM3cYnX": "SBI VC Trade 6",
-        "rDDyH5nfvozKZQCwiBrWfcE528sWsBPWET": "SBI VC Trade 1",
-        "rKcVYzVK1f4PhRFjLhWP7QmteG5FpPgRub": "SBI VC Trade 2",
-        "rUaESVd1yLMy5VyoJvwwuqE8ZiCb2PEqBR": "SBI VC Trade 3"
-    },
-
-    "stake": {
-        "rnqZnvzoJjdg7n1P9pmumJ7FQ5wxNH3gYC": "Stake1",
-        "razLtrbzXVXYvViLqUKLh8YenGLJid9ZTW": "Stake2",
-        "rBA7oBScBPccjDcemGhkmCY82v2ZeLa2K2f": "Stake3",
-        "rBndy89HdamJ3UHNekAS6ALjW9WoCE2W5s": "Stake4"
-    },
-    "korbit": {
-        "rBTjeJu1Rvnbq476Y7PDnvnXUeERV9CxEQ": "Korbit1",
-        "rJRarS792K6LTqHsFkZGzM1Ue6G8jZ2AfK": "Korbit2",
-        "rGU8q9qNCCQG2eMgJpLJJ1YFF5JAbntqau": "Korbit3",
-        "r9WGxuEbUSh3ziYt34mBRViPbqVxZmwsu3": "Korbit4",
-        "rNWWbLxbZRKd51NNZCEjoSNovrrx7yiPyt": "Korbit5",
-        "rGq74nAmw1ARejUNLYEBGxiQBaoNtryEe9": "Korbit6",
-        "rsYFhEk4uFvwvvKJomHL7KhdF29r2sw9KD": "Korbit7",
-        "rwnXZEUe7o29SPcWZwnZukR8fdXmFMWHAN": "Korbit8"
-    },
-    "swissbirg": {
-        "rfyE1wqH1YY3u6BcauQwYuoD13GVtJErXq": "SwissBirg 3"
-    },
-    "virtune": {
-        "rnaiDK2aDkDCCoRk3n9oyzbrtBcGPdHL2t": "Virtune"
-    },
-    "Evernorth": {
-        "rsT3yYMkuicxW1hYsy787mg5XHhkz2uQRk": "Evernorth1",
-        "rKXXrAgpkHQN8m4HxAQCYmDCPPUByc9mVq": "Evernorth2",
-        "rKhjV48GdbgxAAfSvusqGNktGwAxnzzXpv": "Evernorth3",
-        "rGJBNGkDeRPNvNJCi57Ht1ncdht9SuctLe": "Evernorth4",
-        "rJX1qoSGYmx5NWJEpsBGKvxmYpGR7mDtop": "Evernorth5", 
-        "rJuyHPDFpfeVhxfxZboTf7BYu1ptGus1v3": "Evernorth6",
-        "rUgQciCPP1AiwQ9f5zstYu9RzVfsKQRGc2": "Evernorth7",
-        "rPhQdyEaz4kcSoYKTAQhvkvdYxWKKw2vSC": "Evernorth8",
-        "rGy4zJtGfGtF7dtjZmBraQTcfZSQgwqpaa": "Evernorth9"
-}
+# Node URLs and timeouts live in rippled.py, concurrency limits in
+# endpoints.py; the wallet registry and benchmark in holdings.py
+FIRST_SNAPSHOT_WAIT = 60  # Seconds a fresh process waits for its first snapshot
+VIEW_CACHE_ENTRIES = 32  # Derived views kept per kind, least recently used evicted first
+FLOW_WINDOW_HOURS = 24  # Net flow window of the flows section
+HISTORY_EXPORT_DAYS = 7  # Longest history range downloaded through the dashboard; longer ones stream from /v1/history
+API_URL = os.environ.get("XRP_API_URL", "")  # Public base URL of api.py, linked for long history exports
 
 # ============================================================================
 # CUSTOM CSS - Enhanced Dark/Light Mode Support
@@ -543,178 +166,552 @@ def inject_custom_css():
 
 
 # ============================================================================
-# DATA FETCHING - Concurrent/Parallel
+# DATA - shared background collector
 # ============================================================================
 
-def fetch_single_balance(address: str, session: requests.Session) -> tuple:
-    """Fetch balance for a single address with fallback URLs"""
-    for url in RIPPLED_URLS:
+@st.cache_resource
+def get_history_store() -> HistoryStore:
+    """Shared history store, seeded with the Feb 24, 2025 benchmark"""
+    return open_history_store()
+
+
+@st.cache_resource
+def get_flow_store() -> FlowStore:
+    """Transfers recorded by flows.py, read from the history database"""
+    return FlowStore()
+
+
+@st.cache_resource
+def get_balance_stream() -> Optional[BalanceStream]:
+    """Process-wide incremental tracker for every address in EXCHANGES"""
+    if not STREAM_ENABLED:
+        return None
+    addresses = [addr for wallets in EXCHANGES.values() for addr in wallets]
+    return BalanceStream(addresses).start()
+
+
+@st.cache_resource
+def get_collector() -> Collector:
+    """Process-wide collector thread shared by every session"""
+    return Collector(get_history_store(), get_balance_stream(), shared=open_shared_cache()).start()
+
+
+@st.cache_resource
+def get_metrics_server():
+    """Prometheus/JSON metrics endpoint on XRP_METRICS_PORT, once per process"""
+    return start_metrics_server()
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_snapshot_file(mtime: float) -> Optional[Dict]:
+    """Snapshot written by an external collector, parsed once per file version
+
+    A resource, not cache_data: every session gets the same frozen object
+    instead of unpickling its own copy on each rerun.
+    """
+    return read_snapshot_file(SNAPSHOT_FILE)
+
+
+def load_snapshot() -> Optional[Dict]:
+    """Latest completed snapshot; never triggers a fetch from the page"""
+    if COLLECTOR_MODE == "external":
         try:
-            data = {
-                "method": "account_info",
-                "params": [{"account": address, "ledger_index": "validated", "strict": True}]
-            }
-            response = session.post(url, json=data, timeout=REQUEST_TIMEOUT)
-            if response.status_code == 200:
-                result = response.json()
-                if "result" in result and "account_data" in result["result"]:
-                    balance = int(result["result"]["account_data"]["Balance"]) / 1_000_000
-                    return (address, balance, None)
-        except Exception as e:
-            continue
-    return (address, 0.0, "Failed to fetch")
-
-
-@st.cache_data(ttl=300, show_spinner=False)
-def fetch_all_balances_parallel() -> Dict:
-    """Fetch all balances using parallel requests"""
-    results = {}
-    all_addresses = []
-    address_to_exchange = {}
-    address_to_name = {}
-    
-    # Build address mapping
-    for exchange_name, wallets in EXCHANGES.items():
-        for address, wallet_name in wallets.items():
-            all_addresses.append(address)
-            address_to_exchange[address] = exchange_name
-            address_to_name[address] = wallet_name
-    
-    # Initialize results structure
-    for exchange_name, wallets in EXCHANGES.items():
-        results[exchange_name] = {
-            "total": 0,
-            "historical": 0,
-            "wallets": [],
-            "wallet_count": len(wallets),
-            "has_historical": False,
-            "errors": 0
-        }
-    
-    # Parallel fetch with ThreadPoolExecutor
-    balances = {}
-    with requests.Session() as session:
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            futures = {executor.submit(fetch_single_balance, addr, session): addr 
-                      for addr in all_addresses}
-            
-            for future in as_completed(futures):
-                address, balance, error = future.result()
-                balances[address] = (balance, error)
-    
-    # Process results
-    for address, (balance, error) in balances.items():
-        exchange_name = address_to_exchange[address]
-        wallet_name = address_to_name[address]
-        historical = HISTORICAL_BALANCES_20250224.get(address)
-        
-        wallet_info = {
-            "address": address,
-            "name": wallet_name,
-            "balance": balance,
-            "historical": historical,
-            "error": error
-        }
-        
-        if historical is not None:
-            results[exchange_name]["historical"] += historical
-            results[exchange_name]["has_historical"] = True
-            wallet_info["change"] = balance - historical
-            wallet_info["change_pct"] = ((balance - historical) / historical * 100) if historical > 0 else 0
-        
-        results[exchange_name]["total"] += balance
-        results[exchange_name]["wallets"].append(wallet_info)
-        if error:
-            results[exchange_name]["errors"] += 1
-    
-    # Calculate change for exchanges with historical data
-    for exchange_name, info in results.items():
-        if info["has_historical"] and info["historical"] > 0:
-            info["change"] = info["total"] - info["historical"]
-            info["change_pct"] = (info["change"] / info["historical"]) * 100
-    
-    return results
+            return load_snapshot_file(os.path.getmtime(SNAPSHOT_FILE))
+        except OSError:
+            return None
+    collector = get_collector()
+    return collector.latest() or collector.wait_for_snapshot(FIRST_SNAPSHOT_WAIT)
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_richlist_file(mtime: float) -> Optional[Dict]:
+    """Last finished rich list, parsed once per file version"""
+    return read_richlist(RICHLIST_FILE)
 
 
-@st.cache_data(ttl=60, show_spinner=False)
-def get_xrp_price() -> Dict:
-    """Fetch XRP price from CoinGecko"""
+def load_richlist() -> Optional[Dict]:
+    """Last rich list written by richlist.py, None if it never ran"""
     try:
-        response = requests.get(
-            "https://api.coingecko.com/api/v3/simple/price",
-            params={"ids": "ripple", "vs_currencies": "usd", "include_24hr_change": "true"},
-            timeout=5
-        )
-        if response.status_code == 200:
-            data = response.json()
-            return {"price": data["ripple"]["usd"], "change_24h": data["ripple"]["usd_24h_change"]}
-    except:
-        pass
-    return {"price": None, "change_24h": None}
-
-
-def create_summary_dataframe(data: Dict) -> pd.DataFrame:
-    """Create summary DataFrame"""
-    rows = []
-    for exchange, info in data.items():
-        row = {
-            "Exchange": exchange.title(),
-            "Balance (XRP)": info["total"],
-            "Wallet Count": info["wallet_count"],
-            "Errors": info.get("errors", 0)
-        }
-        if info.get("has_historical"):
-            row[f"Balance ({HISTORICAL_DATE})"] = info["historical"]
-            row["Change (XRP)"] = info.get("change", 0)
-            row["Change (%)"] = info.get("change_pct", 0)
-        else:
-            row[f"Balance ({HISTORICAL_DATE})"] = None
-            row["Change (XRP)"] = None
-            row["Change (%)"] = None
-        rows.append(row)
+        return load_richlist_file(os.path.getmtime(RICHLIST_FILE))
+    except OSError:
+        return None
+
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def load_benchmark(snapshot_id: int) -> pd.Series:
+    """Drops of a stored snapshot by address, shared; snapshots never change once written"""
+    return pd.Series(get_history_store().get_drops(snapshot_id), dtype="int64")
+
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def load_benchmark_price(taken_at: float) -> Optional[float]:
+    """Stored USD price when a benchmark snapshot was taken, None if none was recorded then"""
+    return get_history_store().price_at(datetime.fromtimestamp(taken_at, timezone.utc), BENCHMARK_PRICE_AGE)
+
+
+def current_price() -> Optional[float]:
+    """Last good USD price, however old"""
+    return ((load_snapshot() or {}).get("price") or {}).get("price")
+
+
+def resolve_benchmark(on_date) -> Dict:
+    """Latest stored snapshot on or before `on_date`, else the seeded benchmark"""
+    return benchmark_snapshot(get_history_store(), on_date)
+
+
+# ============================================================================
+# DERIVED VIEWS - memoized per snapshot version and filter selection
+# ============================================================================
+
+# `key` is (snapshot version, selected exchanges, benchmark id, benchmark
+# label) and identifies the data; the remaining hashed arguments are display
+# options. Underscored arguments are not hashed: they are fully determined
+# by `key`. Results are shared between sessions and must not be modified.
+
+def view_key(snapshot: Snapshot, exchanges, benchmark: Dict, benchmark_label: str) -> Tuple:
+    return (snapshot.version, tuple(exchanges), benchmark["id"], benchmark_label)
+
+
+@st.cache_resource(max_entries=VIEW_CACHE_ENTRIES, show_spinner=False)
+def summary_view(key: Tuple, _snapshot: Snapshot,
+                 _benchmark: pd.Series) -> Tuple[WalletTable, pd.DataFrame]:
+    """Filtered wallet table and per-exchange summary frame"""
+    _, exchanges, _, benchmark_label = key
+    table = apply_benchmark(_snapshot.view(exchanges), _benchmark)
+    return table, create_summary_dataframe(table, benchmark_label)
+
+
+@st.cache_resource(max_entries=VIEW_CACHE_ENTRIES, show_spinner=False)
+def rankings_table(key: Tuple, show_historical: bool, all_drops: Optional[int], price: Optional[float],
+                   benchmark_price: Optional[float], _df: pd.DataFrame) -> pd.DataFrame:
+    """Summary columns formatted as display strings
+
+    With `all_drops` (every account's XRP, from the rich list) the share of
+    all XRP is shown next to the share among the selected exchanges. With a
+    `price`, holdings are valued in USD, and with the benchmark's own price
+    the USD change since the benchmark is shown too.
+    """
+    display_cols = ["Exchange", "Balance (XRP)", "Market Share (%)"]
+    if price:
+        display_cols.insert(2, "Value (USD)")
+    if show_historical:
+        display_cols.extend(["Change (XRP)", "Change (%)"])
+        if price and benchmark_price:
+            display_cols.append("Change (USD)")
     
-    df = pd.DataFrame(rows)
-    df = df.sort_values("Balance (XRP)", ascending=False).reset_index(drop=True)
-    total = df["Balance (XRP)"].sum()
-    df["Market Share (%)"] = (df["Balance (XRP)"] / total * 100) if total > 0 else 0
-    df.index = df.index + 1
-    df.index.name = "Rank"
-    return df
+    display_df = with_usd_values(_df, price, benchmark_price, key[3])[display_cols]
+    if all_drops:
+        share = _df["Balance (XRP)"] * DROPS_PER_XRP / all_drops * 100
+        display_df.insert(3, "Share of All XRP (%)", share.apply(lambda x: f"{x:.2f}%"))
+    display_df["Balance (XRP)"] = display_df["Balance (XRP)"].apply(lambda x: f"{x:,.0f}")
+    display_df["Market Share (%)"] = display_df["Market Share (%)"].apply(lambda x: f"{x:.2f}%")
+    if "Value (USD)" in display_df:
+        display_df["Value (USD)"] = display_df["Value (USD)"].apply(lambda x: f"${x:,.0f}")
+    if "Change (USD)" in display_df:
+        display_df["Change (USD)"] = display_df["Change (USD)"].apply(
+            lambda x: f"{'+' if x >= 0 else '-'}${abs(x):,.0f}" if pd.notna(x) else "N/A")
+    if show_historical:
+        display_df["Change (XRP)"] = display_df["Change (XRP)"].apply(lambda x: f"{x:+,.0f}" if pd.notna(x) else "N/A")
+        display_df["Change (%)"] = display_df["Change (%)"].apply(lambda x: f"{x:+.2f}%" if pd.notna(x) else "N/A")
+    return display_df
+
+
+@st.cache_resource(max_entries=VIEW_CACHE_ENTRIES, show_spinner=False)
+def holdings_figure(key: Tuple, top_n: int, chart_type: str, _df: pd.DataFrame):
+    return build_holdings_chart(_df.head(top_n), chart_type)
+
+
+@st.cache_resource(max_entries=VIEW_CACHE_ENTRIES, show_spinner=False)
+def change_figures(key: Tuple, _df: pd.DataFrame):
+    """Absolute and percentage change charts, None without benchmark data"""
+    hist_df = _df[_df["Change (XRP)"].notna()]
+    if not len(hist_df):
+        return None
+    return (build_change_chart(hist_df, "Change (XRP)", "Absolute Change"),
+            build_change_chart(hist_df, "Change (%)", "Percentage Change"))
+
+
+@st.cache_resource(max_entries=VIEW_CACHE_ENTRIES, show_spinner=False)
+def wallet_details(key: Tuple, exchange: str, richlist_ledger: Optional[int], _table: WalletTable,
+                   _ranks: Dict[str, int]) -> pd.DataFrame:
+    """One exchange's wallets, largest first, with formatted balance and status
+
+    `_ranks` are the rich list's ranks among all accounts, fixed by `richlist_ledger`.
+    """
+    wallet_df = _table.wallets(exchange)
+    wallet_df = wallet_df.sort_values("balance", ascending=False)
+    wallet_df["balance"] = wallet_df["balance"].apply(lambda x: f"{x:,.0f}")
+    wallet_df["status"] = [
+        f"stale (as of {datetime.fromtimestamp(w['as_of']).strftime('%Y-%m-%d %H:%M')})" if w["stale"]
+        else ("failed" if w["failed"] else "unfunded" if w["unfunded"] else "ok")
+        for w in wallet_df.to_dict("records")
+    ]
+    columns = ["name", "address", "balance", "status"]
+    if _ranks:
+        wallet_df["rank"] = wallet_df["address"].map(_ranks).astype("Int64")
+        columns.insert(3, "rank")
+    return wallet_df[columns]
+
+
+@st.cache_resource(max_entries=VIEW_CACHE_ENTRIES, show_spinner=False)
+def export_file(key: Tuple, fmt: str, _table: WalletTable, _df: pd.DataFrame) -> bytes:
+    """Download payload, built on the first click: summary CSV, nested JSON or per-wallet rows"""
+    if fmt == "csv":
+        return _df.to_csv().encode()
+    if fmt == "json":
+        return nested_json(_table)
+    return b"".join(encode(fmt, chunked(wallet_frame(_table))))
+
+
+def history_export(start, end, fmt: str) -> bytes:
+    """Stored balances between two dates
+
+    st.download_button holds the whole payload in memory, so the range is
+    capped at HISTORY_EXPORT_DAYS; only /v1/history streams longer ones.
+    """
+    start = datetime.combine(start, dt_time.min, tzinfo=timezone.utc)
+    end = datetime.combine(end, dt_time.max, tzinfo=timezone.utc)
+    return b"".join(encode(fmt, history_frames(get_history_store(), start, end)))
 
 
 # ============================================================================
 # MAIN APP
 # ============================================================================
 
-def main():
-    inject_custom_css()
+@st.cache_resource(max_entries=VIEW_CACHE_ENTRIES, show_spinner=False)
+def flow_view(exchanges: Tuple, latest: float, hour: int):
+    """Net flow table and chart of the last FLOW_WINDOW_HOURS, per (exchanges, newest transfer, hour)"""
+    end = datetime.fromtimestamp((hour + 1) * 3600, timezone.utc)
+    flows = get_flow_store().hourly_flows(end - timedelta(hours=FLOW_WINDOW_HOURS), end)
+    table = net_flows(flows[flows["exchange"].isin(exchanges)])
+    table = table.rename(columns={
+        "exchange": "Exchange", "external_in": "External In", "external_out": "External Out",
+        "inter_exchange_in": "From Exchanges", "inter_exchange_out": "To Exchanges",
+        "internal": "Internal", "net": "Net Flow (XRP)",
+    })
+    if not len(table):
+        return table, None
+    figure = build_change_chart(table, "Net Flow (XRP)", "Net Flow (XRP)")
+    display_df = table.copy()
+    for column in display_df.columns[1:]:
+        display_df[column] = display_df[column].apply(lambda x: f"{x:,.0f}")
+    display_df["Net Flow (XRP)"] = table["Net Flow (XRP)"].apply(lambda x: f"{x:+,.0f}")
+    return display_df, figure
+
+
+def format_age(seconds: Optional[float]) -> str:
+    """Compact age such as '45s' or '3m 10s'"""
+    if seconds is None:
+        return "n/a"
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m {seconds % 60}s"
+    return f"{seconds // 3600}h {seconds % 3600 // 60}m"
+
+
+def interval_label(seconds: int) -> str:
+    if not seconds:
+        return f"Every {REFRESH_LEDGERS} ledgers"
+    return f"{seconds // 60} min" if seconds >= 60 else f"{seconds}s"
+
+
+def snapshot_age(snapshot: Dict) -> float:
+    """Seconds since the snapshot was fetched (also for externally written ones)"""
+    return time.time() - snapshot["fetched_at"]
+
+
+def render_debug_panel():
+    """Phase timings, fetch counters, endpoint health and concurrency limits of this process"""
+    st.markdown("---")
+    st.markdown("### 🛠️ Debug Metrics")
+    if COLLECTOR_MODE == "external":
+        st.caption("Fetch timings live in the collector process; scrape its metrics endpoint.")
+    stats = metrics.to_dict()
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**Timings (s)**")
+        timings = pd.DataFrame([
+            dict(h["labels"], metric=h["name"], count=h["count"], mean=h["mean"],
+                 last=h["last"], p95=h["p95"])
+            for h in stats["histograms"]
+        ])
+        if len(timings):
+            st.dataframe(timings, width="stretch")
+    with col2:
+        st.markdown("**Counters**")
+        counters = pd.DataFrame([dict(c["labels"], metric=c["name"], value=c["value"])
+                                 for c in stats["counters"]])
+        if len(counters):
+            st.dataframe(counters, width="stretch")
+        st.markdown("**Endpoints**")
+        st.dataframe(pd.DataFrame(endpoint_manager.snapshot()), width="stretch")
+        history = pd.DataFrame(endpoint_manager.limit_history())
+        if len(history):
+            st.markdown("**Concurrency limits**")
+            history["at"] = pd.to_datetime(history["at"], unit="s", utc=True)
+            st.line_chart(history.pivot_table(index="at", columns="url", values="limit").ffill())
+    skipped = REGISTRY.invalid + [dict(d, reason=f"also listed under {d['exchanges'][0]}",
+                                       exchange=d["exchanges"][1]) for d in REGISTRY.duplicates]
+    st.markdown(f"**Registry**: {len(REGISTRY):,} wallets, {len(skipped)} skipped")
+    if skipped:
+        st.dataframe(pd.DataFrame(skipped)[["exchange", "address", "label", "reason"]],
+                     width="stretch")
+
+
+# ============================================================================
+# SECTIONS - fragments that rerun alone on their own inputs and on the
+# auto-refresh timer; each reads the latest snapshot itself
+# ============================================================================
+
+def current_view(selection: Tuple) -> Optional[Tuple]:
+    """(snapshot, key, filtered table, summary frame) for (exchanges, benchmark, label)"""
+    snapshot = load_snapshot()
+    if snapshot is None:
+        return None
+    selected_exchanges, benchmark, benchmark_label = selection
+    key = view_key(snapshot["snapshot"], selected_exchanges, benchmark, benchmark_label)
+    filtered_data, df = summary_view(key, snapshot["snapshot"], load_benchmark(benchmark["id"]))
+    return snapshot, key, filtered_data, df
+
+
+def render_status_badge():
+    snapshot = load_snapshot()
+    is_fresh = snapshot is not None and not snapshot.get("error") \
+        and snapshot_age(snapshot) < 2 * BALANCE_INTERVAL
+    st.markdown(f"""
+        <div class="status-badge status-live" style="{'' if is_fresh else 'color: #ffb300; border-color: #ffb300;'}">
+            <span class="status-dot" style="{'' if is_fresh else 'background: #ffb300;'}"></span>
+            {'LIVE' if is_fresh else 'STALE'}
+        </div>
+    """, unsafe_allow_html=True)
+
+
+def render_price():
+    """Last good price with its age; amber once it is older than a few refreshes or sources fail"""
+    xrp_data = (load_snapshot() or {}).get("price")
+    if not xrp_data:
+        st.caption("💲 XRP price unavailable: no price source has answered yet")
+        return
+    change = xrp_data.get("change_24h")
+    change_html = ""
+    if change is not None:
+        change_color = "#00c853" if change >= 0 else "#ff5252"
+        change_html = (f'<span style="color: {change_color}; font-size: 14px; margin-left: 10px;">'
+                       f'{"+" if change >= 0 else ""}{change:.2f}%</span>')
+    price_age = time.time() - xrp_data["fetched_at"]
+    stale = bool(xrp_data.get("error")) or price_age > 3 * PRICE_INTERVAL
+    age_text = f"{format_age(price_age)} ago" + (" · last good price" if stale else "")
+    sources = xrp_data.get("sources") or {}
+    quotes = " · ".join(f"{name} ${quote:.4f}" for name, quote in sources.items())
+    source_text = f" · median of {len(sources)} sources" if len(sources) > 1 else \
+        (f" · {quotes}" if sources else "")
+    st.markdown(f"""
+        <div class="price-widget" title="{quotes}">
+            <span style="color: #00d4ff; font-size: 12px; font-weight: 600;">XRP PRICE</span>
+            <span style="color: #fff; font-size: 24px; font-weight: bold; margin-left: 15px;">${xrp_data["price"]:.4f}</span>
+            {change_html}
+            <span style="color: {'#ffb300' if stale else '#8a8f98'}; font-size: 12px; margin-left: 10px;">{'⚠️ ' if stale else ''}{age_text}{source_text}</span>
+        </div>
+    """, unsafe_allow_html=True)
+
+
+def render_overview(selection: Tuple, show_historical: bool, refresh_interval: Optional[int]):
+    """Refresh status and key metrics; asks for a refresh once data is older than the interval"""
+    view = current_view(selection)
+    if view is None:
+        return
+    snapshot, key, filtered_data, df = view
+    benchmark_label = selection[2]
+    if refresh_interval and COLLECTOR_MODE != "external" and not get_collector().following_ledgers() \
+            and snapshot_age(snapshot) > refresh_interval and not snapshot.get("refreshing"):
+        get_collector().request_refresh()
+    if snapshot.get("error"):
+        st.warning(f"⚠️ Latest refresh failed ({snapshot['error']}). "
+                   f"Showing the last good data from {format_age(snapshot_age(snapshot))} ago.")
     
-    # Header with status
-    col_title, col_status = st.columns([4, 1])
-    with col_title:
-        st.title("💎 XRP Exchange Holdings Tracker")
-    with col_status:
-        st.markdown("""
-            <div class="status-badge status-live">
-                <span class="status-dot"></span>
-                LIVE
-            </div>
-        """, unsafe_allow_html=True)
+    ledger_index = filtered_data.ledger_index
+    updated = datetime.fromtimestamp(snapshot["fetched_at"]).strftime("%H:%M:%S")
+    refreshing = " · refreshing…" if snapshot.get("refreshing") else ""
+    ledger = f"📒 Snapshot from validated ledger #{ledger_index:,} · " if ledger_index else ""
+    if ledger_index and filtered_data.close_time:
+        closed = datetime.fromtimestamp(filtered_data.close_time).strftime("%H:%M:%S")
+        ledger = f"📒 Snapshot from validated ledger #{ledger_index:,}, closed {closed} · "
+    st.caption(f"{ledger}Updated: {updated} ({format_age(snapshot_age(snapshot))} ago){refreshing}")
     
-    # XRP Price Display
-    xrp_data = get_xrp_price()
-    if xrp_data["price"]:
-        change_color = "#00c853" if xrp_data["change_24h"] >= 0 else "#ff5252"
-        change_sign = "+" if xrp_data["change_24h"] >= 0 else ""
-        st.markdown(f"""
-            <div class="price-widget">
-                <span style="color: #00d4ff; font-size: 12px; font-weight: 600;">XRP PRICE</span>
-                <span style="color: #fff; font-size: 24px; font-weight: bold; margin-left: 15px;">${xrp_data["price"]:.4f}</span>
-                <span style="color: {change_color}; font-size: 14px; margin-left: 10px;">{change_sign}{xrp_data["change_24h"]:.2f}%</span>
-            </div>
-        """, unsafe_allow_html=True)
+    # Key Metrics
+    st.markdown("### 📈 Market Overview")
+    total_xrp = df["Balance (XRP)"].sum()
+    top3_share = df.head(3)["Market Share (%)"].sum()
+    exchange_count = len(df)
+    total_errors = int(df["Errors"].sum())
+    total_stale = int(df["Stale Wallets"].sum())
+    
+    cols = st.columns(5)
+    with cols[0]:
+        st.metric("Total XRP", f"{total_xrp:,.0f}")
+    with cols[1]:
+        st.metric("Exchanges", f"{exchange_count}")
+    with cols[2]:
+        st.metric("Top 3 Share", f"{top3_share:.1f}%")
+    with cols[3]:
+        if show_historical:
+            total_hist = df[f"Balance ({benchmark_label})"].dropna().sum()
+            change = total_xrp - total_hist if total_hist > 0 else 0
+            st.metric("Net Change", f"{change:+,.0f}")
+    with cols[4]:
+        if total_errors > 0:
+            delta = f"{total_stale} at last known balance" if total_stale else "retry later"
+            st.metric("⚠️ Errors", f"{total_errors}", delta=delta, delta_color="inverse")
+        else:
+            st.metric("Status", "✅ All OK")
+    
+    price = current_price()
+    if price:
+        value = f"💵 Worth ${total_xrp * price:,.0f} at ${price:.4f}"
+        total_hist = df[f"Balance ({benchmark_label})"].dropna().sum()
+        benchmark_price = load_benchmark_price(selection[1]["taken_at"]) if show_historical else None
+        if benchmark_price and total_hist > 0:
+            change_usd = total_xrp * price - total_hist * benchmark_price
+            value += (f", {'+' if change_usd >= 0 else '-'}${abs(change_usd):,.0f} since {benchmark_label} "
+                      f"(then ${benchmark_price:.4f})")
+        st.caption(value)
+    
+    richlist = load_richlist()
+    if richlist and richlist["total_drops"]:
+        held = sum(richlist["exchanges"].get(name, 0) for name in selection[0])
+        closed = datetime.fromtimestamp(richlist["close_time"], timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+        st.caption(f"🐋 The selected exchanges held {held / richlist['total_drops'] * 100:.2f}% of the "
+                   f"{richlist['total_drops'] / DROPS_PER_XRP:,.0f} XRP in all {richlist['accounts']:,} "
+                   f"accounts at ledger #{richlist['ledger_index']:,} ({closed}, rich list)")
+
+
+def render_holdings_chart(selection: Tuple):
+    heading = st.empty()
+    col_type, col_n = st.columns(2)
+    with col_type:
+        chart_type = st.selectbox("Chart Type", CHART_TYPES)
+    with col_n:
+        top_n = st.slider("Top N", 5, 20, 10)
+    heading.markdown(f"### 📊 Top {top_n} Holdings")
+    view = current_view(selection)
+    if view is None:
+        return
+    _, key, _, df = view
     
-    st.markdown(f"Real-time tracking | Benchmark: **{HISTORICAL_DATE}**")
+    with metrics.timed("phase_seconds", phase="render", chart="holdings"):
+        fig = holdings_figure(key, top_n, chart_type, df)
+        st.plotly_chart(fig, width="stretch")
+
+
+def render_rankings(selection: Tuple, show_historical: bool):
+    st.markdown("### 🏆 Rankings")
+    view = current_view(selection)
+    if view is None:
+        return
+    _, key, _, df = view
+    richlist = load_richlist()
+    all_drops = richlist["total_drops"] if richlist else None
+    benchmark_price = load_benchmark_price(selection[1]["taken_at"]) if show_historical else None
+    table = rankings_table(key, show_historical, all_drops, current_price(), benchmark_price, df)
+    st.dataframe(table, width="stretch", height=400)
+
+
+def render_change_charts(selection: Tuple):
+    st.markdown(f"### 📊 Change Since {selection[2]}")
+    view = current_view(selection)
+    if view is None:
+        return
+    _, key, _, df = view
+    render_started = time.perf_counter()
+    figures = change_figures(key, df)
+    
+    if figures is not None:
+        fig, fig2 = figures
+        col1, col2 = st.columns(2)
+        with col1:
+            st.plotly_chart(fig, width="stretch")
+        
+        with col2:
+            st.plotly_chart(fig2, width="stretch")
+        metrics.observe("phase_seconds", time.perf_counter() - render_started,
+                        phase="render", chart="change")
+
+
+def render_flows(selection: Tuple):
+    """Net XRP moved into each selected exchange, from the transfers flows.py reads"""
+    st.markdown(f"### 🔀 Net Flows, Last {FLOW_WINDOW_HOURS}h")
+    latest = get_flow_store().latest_close_time()
+    if latest is None:
+        return
+    table, figure = flow_view(tuple(selection[0]), latest, int(time.time() // 3600))
+    if figure is None:
+        st.info("No transfers for the selected exchanges in this window.")
+        return
+    col1, col2 = st.columns(2)
+    with col1:
+        st.plotly_chart(figure, width="stretch")
+    with col2:
+        st.dataframe(table, width="stretch", hide_index=True)
+    st.caption("External: wallets outside the registry · Internal: between one exchange's own "
+               "wallets, left out of the net flow")
+
+
+def render_wallet_details(selection: Tuple):
+    st.markdown("### 🔍 Wallet Details")
+    selected = st.selectbox("Select Exchange", options=selection[0])
+    view = current_view(selection)
+    if view is None:
+        return
+    _, key, filtered_data, _ = view
+    if selected and selected in filtered_data.exchanges:
+        richlist = load_richlist() or {}
+        st.dataframe(wallet_details(key, selected, richlist.get("ledger_index"), filtered_data,
+                                    richlist.get("ranks", {})), width="stretch")
+        if richlist:
+            st.caption(f"Rank: among all XRP accounts at ledger #{richlist['ledger_index']:,} (rich list)")
+
+
+def render_exports(selection: Tuple):
+    """Download buttons; payloads are generated only when a button is clicked"""
+    view = current_view(selection)
+    if view is None:
+        return
+    _, key, filtered_data, df = view
+    buttons = [("📥 Download CSV", "csv"), ("📥 Download JSON", "json"), ("📥 Wallets NDJSON", "ndjson"),
+               ("📥 Wallets Parquet", "parquet"), ("📥 Wallets Arrow", "arrow")]
+    for col, (label, fmt) in zip(st.columns(len(buttons)), buttons):
+        with col:
+            st.download_button(label, partial(export_file, key, fmt, filtered_data, df),
+                               file_name("xrp_holdings", fmt), FORMATS[fmt][0], on_click="ignore")
+    
+    with st.expander("📜 Export balance history"):
+        today = datetime.now(timezone.utc).date()
+        col_range, col_fmt, col_button = st.columns([2, 1, 1])
+        with col_range:
+            dates = st.date_input("Range", value=(today, today), max_value=today)
+        with col_fmt:
+            fmt = st.selectbox("Format", list(FORMATS), index=list(FORMATS).index("parquet"))
+        too_long = len(dates) == 2 and (dates[1] - dates[0]).days >= HISTORY_EXPORT_DAYS
+        with col_button:
+            if len(dates) == 2 and not too_long:
+                st.download_button("📥 Download", partial(history_export, dates[0], dates[1], fmt),
+                                   file_name("xrp_history", fmt), FORMATS[fmt][0], on_click="ignore")
+        if too_long:
+            query = f"/v1/history?start={dates[0]}&end={dates[1]}&format={fmt}"
+            link = f"[stream it from the API]({API_URL.rstrip('/')}{query})" if API_URL \
+                else f"stream it from the API (`python api.py`, then `GET {query}`)"
+            st.info(f"Ranges longer than {HISTORY_EXPORT_DAYS} days are too large to download here; {link}.")
+
+
+def main():
+    inject_custom_css()
+    get_metrics_server()
+    
+    # Latest snapshot from the collector; only a cold start waits for one
+    with st.spinner("⚡ Collecting the first snapshot..."):
+        snapshot = load_snapshot()
     
     # Sidebar
     with st.sidebar:
@@ -722,11 +719,15 @@ def main():
         
         # Auto-refresh
         auto_refresh = st.checkbox("🔄 Auto-refresh", value=False)
-        refresh_interval = st.selectbox("Interval", [60, 120, 300, 600], format_func=lambda x: f"{x//60} min" if x >= 60 else f"{x}s", disabled=not auto_refresh)
+        # 0 follows the collector's ledger-driven snapshots instead of a wall-clock interval
+        intervals = ([0] if REFRESH_LEDGERS and STREAM_ENABLED and COLLECTOR_MODE != "external" else []) \
+            + [60, 120, 300, 600]
+        refresh_interval = st.selectbox("Interval", intervals, format_func=interval_label, disabled=not auto_refresh)
         
-        if st.button("🔄 Refresh Now", type="primary", use_container_width=True):
-            st.cache_data.clear()
-            st.rerun()
+        if st.button("🔄 Refresh Now", type="primary", width="stretch",
+                     disabled=COLLECTOR_MODE == "external"):
+            get_collector().request_refresh()
+            st.toast("Refresh started in the background")
         
         st.markdown("---")
         
@@ -739,65 +740,49 @@ def main():
         
         # Display options
         show_historical = st.checkbox("Show historical comparison", value=True)
+        benchmark_date = st.date_input("Benchmark date", value=HISTORICAL_TAKEN_AT.date(),
+                                       max_value=datetime.now(timezone.utc).date(),
+                                       disabled=not show_historical)
+        benchmark = resolve_benchmark(benchmark_date)
+        benchmark_label = snapshot_label(benchmark)
+        st.caption(f"Comparing against: {benchmark_label}")
         show_wallet_details = st.checkbox("Show wallet details", value=False)
-        chart_type = st.selectbox("Chart Type", ["Bar", "Treemap", "Pie"])
-        top_n = st.slider("Top N", 5, 20, 10)
-        
-        st.markdown("---")
-        st.caption(f"Updated: {datetime.now().strftime('%H:%M:%S')}")
+        show_debug = st.checkbox("Show debug metrics", value=False)
+    
+    # Data-bearing sections rerun on their own every interval while auto-refresh is on.
+    # Following ledgers, they only re-read the snapshot; the collector decides when to fetch.
+    every = (refresh_interval or REFRESH_LEDGERS * LEDGER_SECONDS) if auto_refresh else None
+    live = partial(st.fragment, run_every=every)
+    
+    # Header with status
+    col_title, col_status = st.columns([4, 1])
+    with col_title:
+        st.title("💎 XRP Exchange Holdings Tracker")
+    with col_status:
+        live(render_status_badge)()
+    
+    # XRP Price Display
+    live(render_price)()
+    
+    st.markdown(f"Real-time tracking | Benchmark: **{benchmark_label}**")
     
-    # Auto-refresh logic
     if auto_refresh:
         st.markdown(f"""
             <div class="refresh-indicator">
-                ⏱️ Auto-refresh: {refresh_interval//60}m
+                ⏱️ Auto-refresh: {interval_label(refresh_interval)}
             </div>
         """, unsafe_allow_html=True)
-        time.sleep(0.1)
-        st_autorefresh = st.empty()
-        # Use streamlit's built-in rerun with timer
-        if 'last_refresh' not in st.session_state:
-            st.session_state.last_refresh = time.time()
-        if time.time() - st.session_state.last_refresh > refresh_interval:
-            st.session_state.last_refresh = time.time()
-            st.cache_data.clear()
-            st.rerun()
     
     if not selected_exchanges:
         st.warning("⚠️ Please select at least one exchange.")
         return
     
-    # Fetch data with loading indicator
-    with st.spinner("⚡ Fetching live data (parallel)..."):
-        data = fetch_all_balances_parallel()
-    
-    filtered_data = {k: v for k, v in data.items() if k in selected_exchanges}
-    df = create_summary_dataframe(filtered_data)
+    if snapshot is None:
+        st.error("⚠️ No data collected yet. The first refresh is still running, please retry shortly.")
+        return
     
-    # Key Metrics
-    st.markdown("### 📈 Market Overview")
-    total_xrp = df["Balance (XRP)"].sum()
-    top3_share = df.head(3)["Market Share (%)"].sum()
-    exchange_count = len(df)
-    total_errors = sum(info.get("errors", 0) for info in filtered_data.values())
-    
-    cols = st.columns(5)
-    with cols[0]:
-        st.metric("Total XRP", f"{total_xrp:,.0f}")
-    with cols[1]:
-        st.metric("Exchanges", f"{exchange_count}")
-    with cols[2]:
-        st.metric("Top 3 Share", f"{top3_share:.1f}%")
-    with cols[3]:
-        if show_historical:
-            total_hist = df[f"Balance ({HISTORICAL_DATE})"].dropna().sum()
-            change = total_xrp - total_hist if total_hist > 0 else 0
-            st.metric("Net Change", f"{change:+,.0f}")
-    with cols[4]:
-        if total_errors > 0:
-            st.metric("⚠️ Errors", f"{total_errors}", delta="retry later", delta_color="inverse")
-        else:
-            st.metric("Status", "✅ All OK")
+    selection = (selected_exchanges, benchmark, benchmark_label)
+    live(render_overview)(selection, show_historical, refresh_interval if auto_refresh else None)
     
     st.markdown("---")
     
@@ -805,86 +790,35 @@ def main():
     col_chart, col_table = st.columns([1.2, 1])
     
     with col_chart:
-        st.markdown(f"### 📊 Top {top_n} Holdings")
-        chart_df = df.head(top_n)
-        
-        if chart_type == "Bar":
-            fig = px.bar(chart_df, x="Exchange", y="Balance (XRP)", 
-                        color="Market Share (%)", color_continuous_scale="Blues",
-                        text=chart_df["Balance (XRP)"].apply(lambda x: f"{x/1e6:.1f}M"))
-            fig.update_traces(textposition="outside")
-            fig.update_layout(xaxis_tickangle=-45, height=450, showlegend=False)
-        elif chart_type == "Treemap":
-            fig = px.treemap(chart_df, path=["Exchange"], values="Balance (XRP)",
-                           color="Balance (XRP)", color_continuous_scale="Blues")
-            fig.update_layout(height=450)
-        else:
-            fig = px.pie(chart_df, names="Exchange", values="Balance (XRP)", hole=0.4)
-            fig.update_layout(height=450)
-        
-        st.plotly_chart(fig, use_container_width=True)
+        live(render_holdings_chart)(selection)
     
     with col_table:
-        st.markdown("### 🏆 Rankings")
-        display_cols = ["Exchange", "Balance (XRP)", "Market Share (%)"]
-        if show_historical:
-            display_cols.extend(["Change (XRP)", "Change (%)"])
-        
-        display_df = df[display_cols].copy()
-        display_df["Balance (XRP)"] = display_df["Balance (XRP)"].apply(lambda x: f"{x:,.0f}")
-        display_df["Market Share (%)"] = display_df["Market Share (%)"].apply(lambda x: f"{x:.2f}%")
-        if show_historical:
-            display_df["Change (XRP)"] = display_df["Change (XRP)"].apply(lambda x: f"{x:+,.0f}" if pd.notna(x) else "N/A")
-            display_df["Change (%)"] = display_df["Change (%)"].apply(lambda x: f"{x:+.2f}%" if pd.notna(x) else "N/A")
-        
-        st.dataframe(display_df, use_container_width=True, height=400)
+        live(render_rankings)(selection, show_historical)
     
     # Historical Analysis
     if show_historical:
         st.markdown("---")
-        st.markdown(f"### 📊 Change Since {HISTORICAL_DATE}")
-        hist_df = df[df["Change (XRP)"].notna()].copy()
-        
-        if len(hist_df) > 0:
-            col1, col2 = st.columns(2)
-            with col1:
-                sorted_df = hist_df.sort_values("Change (XRP)")
-                colors = ['#ff5252' if x < 0 else '#00c853' for x in sorted_df["Change (XRP)"]]
-                fig = go.Figure(go.Bar(x=sorted_df["Change (XRP)"], y=sorted_df["Exchange"],
-                                      orientation='h', marker_color=colors))
-                fig.update_layout(title="Absolute Change", height=350)
-                st.plotly_chart(fig, use_container_width=True)
-            
-            with col2:
-                sorted_pct = hist_df.sort_values("Change (%)")
-                colors_pct = ['#ff5252' if x < 0 else '#00c853' for x in sorted_pct["Change (%)"]]
-                fig2 = go.Figure(go.Bar(x=sorted_pct["Change (%)"], y=sorted_pct["Exchange"],
-                                       orientation='h', marker_color=colors_pct))
-                fig2.update_layout(title="Percentage Change", height=350)
-                st.plotly_chart(fig2, use_container_width=True)
+        live(render_change_charts)(selection)
+    
+    # Flows, once flows.py has recorded any
+    if get_flow_store().latest_close_time() is not None:
+        st.markdown("---")
+        live(render_flows)(selection)
     
     # Wallet Details
     if show_wallet_details:
         st.markdown("---")
-        st.markdown("### 🔍 Wallet Details")
-        selected = st.selectbox("Select Exchange", options=selected_exchanges)
-        if selected and selected in filtered_data:
-            wallet_df = pd.DataFrame(filtered_data[selected]["wallets"])
-            wallet_df = wallet_df.sort_values("balance", ascending=False)
-            wallet_df["balance"] = wallet_df["balance"].apply(lambda x: f"{x:,.0f}")
-            st.dataframe(wallet_df[["name", "address", "balance"]], use_container_width=True)
+        live(render_wallet_details)(selection)
     
     # Export
     st.markdown("---")
-    col1, col2 = st.columns(2)
-    with col1:
-        csv = df.to_csv()
-        st.download_button("📥 Download CSV", csv, f"xrp_holdings_{datetime.now().strftime('%Y%m%d')}.csv", "text/csv")
-    with col2:
-        json_str = json.dumps(filtered_data, indent=2, default=str)
-        st.download_button("📥 Download JSON", json_str, f"xrp_holdings_{datetime.now().strftime('%Y%m%d')}.json", "application/json")
+    live(render_exports)(selection)
+    
+    if show_debug:
+        render_debug_panel()
     
-    st.caption("💡 Data cached for 5 minutes. Parallel fetching enabled for faster loading.")
+    st.caption("💡 Balances are refreshed in the background after ledgers that move a tracked wallet "
+               "(every 5 minutes without the live stream); pages never wait on the XRP Ledger.")
 
 
 if __name__ == "__main__":
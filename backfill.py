@@ -0,0 +1,274 @@
+"""
+Historical balance backfill
+Fetches every tracked wallet at past ledger indexes or dates into the history store, resumably
+
+    python backfill.py --ledgers 93000000 93500000
+    python backfill.py --start 2025-01-01 --end 2025-06-30 --every 1d
+"""
+
+import re
+import math
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+from history import HistoryStore
+from holdings import REGISTRY, open_history_store
+from metrics import metrics
+from rippled import (ACCOUNT_ERRORS, FETCH_MODE, FETCH_MODES, LEDGER_SECONDS, fetch_balances,
+                     get_ledger, get_validated_ledger_index)
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+POINT_WORKERS = 2  # Points fetched at once; each fans out under the endpoint limits
+CHUNK_ADDRESSES = 500  # Addresses fetched and stored per checkpoint
+FIRST_LEDGER = 32570  # Oldest ledger full-history nodes serve
+DATE_TOLERANCE = 60  # A stored snapshot closed this many seconds before a date covers it
+STEP_UNITS = {"h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+def parse_when(text: str) -> datetime:
+    """A date (its close, 23:59:59 UTC) or an ISO datetime (UTC unless it says otherwise)"""
+    if re.fullmatch(r"\d{4}-\d{2}-\d{2}", text):
+        return datetime.combine(date.fromisoformat(text), dt_time(23, 59, 59), tzinfo=timezone.utc)
+    when = datetime.fromisoformat(text)
+    return when if when.tzinfo else when.replace(tzinfo=timezone.utc)
+
+
+def parse_step(text: str) -> timedelta:
+    """"1d", "7d", "12h" or "1w" """
+    match = re.fullmatch(r"(\d+)([hdw])", text)
+    if not match or not int(match.group(1)):
+        raise ValueError(f"Bad step {text!r}, expected e.g. 12h, 1d or 1w")
+    return timedelta(seconds=int(match.group(1)) * STEP_UNITS[match.group(2)])
+
+
+def date_range(start: datetime, end: datetime, step: timedelta) -> List[datetime]:
+    """`start`, `start + step`, ... up to and including `end`"""
+    points = []
+    while start <= end:
+        points.append(start)
+        start += step
+    return points
+
+
+# ============================================================================
+# LEDGER CLOCK - dates to ledger indexes
+# ============================================================================
+
+class LedgerClock:
+    """Finds the ledger closed at a given time
+
+    rippled has no lookup by time, so this searches on close times,
+    interpolating between ledgers it has already seen. Targets resolved in
+    order therefore take a handful of requests each.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._known: Dict[int, int] = {}  # ledger index -> close time (Unix seconds)
+        self.latest: Optional[int] = None
+
+    def close_time(self, ledger_index: int) -> Optional[int]:
+        if ledger_index not in self._known:
+            ledger = get_ledger(ledger_index)
+            if ledger is None:
+                return None
+            self._known[ledger_index] = ledger["close_time"]
+        return self._known[ledger_index]
+
+    def _bracket(self, when: float) -> Tuple[Optional[int], Optional[int]]:
+        """Closest known ledgers closed at or before and after `when`"""
+        before = [i for i, t in self._known.items() if t <= when]
+        after = [i for i, t in self._known.items() if t > when]
+        return max(before, default=None), min(after, default=None)
+
+    def ledger_at(self, when: datetime) -> Optional[int]:
+        """Index of the last validated ledger closed at or before `when`, None if unavailable"""
+        target = when.timestamp()
+        with self._lock:
+            if self.latest is None:
+                self.latest = get_validated_ledger_index()
+                if self.latest is None or self.close_time(self.latest) is None:
+                    self.latest = None
+                    return None
+            low, high = self._bracket(target)
+            if high is None:
+                return None  # Not closed yet
+            step = max(1, math.ceil((self._known[high] - target) / LEDGER_SECONDS))
+            while low is None:  # Walk back, doubling the step, until a ledger closed before `when`
+                guess = max(FIRST_LEDGER, high - step)
+                close = self.close_time(guess)
+                if close is None:
+                    return None  # Older than any node's history
+                if close <= target:
+                    low = guess
+                elif guess == FIRST_LEDGER:
+                    return None
+                else:
+                    high, step = guess, step * 2
+            bisect = False
+            while high - low > 1:
+                if bisect:
+                    guess = (low + high) // 2
+                else:  # Interpolate, alternating with bisection so bad guesses stay cheap
+                    span = self._known[high] - self._known[low]
+                    share = (target - self._known[low]) / span if span else 0.5
+                    guess = min(high - 1, max(low + 1, low + round(share * (high - low))))
+                bisect = not bisect
+                close = self.close_time(guess)
+                if close is None:
+                    return None
+                if close <= target:
+                    low = guess
+                else:
+                    high = guess
+            return low
+
+
+# ============================================================================
+# BACKFILL
+# ============================================================================
+
+def missing_addresses(store: HistoryStore, ledger_index: int, addresses: List[str]) -> List[str]:
+    """Addresses with no balance stored at `ledger_index` yet"""
+    snapshot = store.snapshot_for_ledger(ledger_index)
+    if snapshot is None:
+        return list(addresses)
+    stored = store.get_drops(snapshot["id"])
+    return [addr for addr in addresses if addr not in stored]
+
+
+def covered_ledger(store: HistoryStore, when: datetime) -> Optional[int]:
+    """Ledger of a snapshot already stored for `when`, so it need not be looked up again"""
+    snapshot = store.snapshot_at(when)
+    if snapshot and snapshot["ledger_index"] and when.timestamp() - snapshot["taken_at"] <= DATE_TOLERANCE:
+        return snapshot["ledger_index"]
+    return None
+
+
+def backfill_point(store: HistoryStore, addresses: List[str], ledger_index: int,
+                   taken_at: datetime, mode: str = FETCH_MODE,
+                   chunk_addresses: int = CHUNK_ADDRESSES) -> Dict:
+    """Fetch and store the balances at one ledger that are not stored yet
+
+    Each chunk is stored as soon as it is fetched, so an interrupted point
+    resumes with the addresses it still lacks. Accounts that did not exist
+    yet are stored with zero drops like unfunded ones; addresses that failed
+    are left out and picked up by the next run.
+    """
+    missing = missing_addresses(store, ledger_index, addresses)
+    result = {"ledger_index": ledger_index, "taken_at": taken_at, "stored": 0,
+              "skipped": len(addresses) - len(missing), "failed": 0}
+    for start in range(0, len(missing), chunk_addresses):
+        balances, _ = fetch_balances(missing[start:start + chunk_addresses], mode, ledger_index)
+        drops = {addr: amount for addr, (amount, error) in balances.items()
+                 if error is None or error in ACCOUNT_ERRORS}
+        if drops:
+            store.record_drops(drops, ledger_index, taken_at)
+        result["stored"] += len(drops)
+        result["failed"] += len(balances) - len(drops)
+    outcome = "failed" if result["failed"] else "stored" if result["stored"] else "skipped"
+    metrics.inc("backfill_points_total", result=outcome)
+    metrics.inc("backfill_balances_total", result["stored"], result="stored")
+    metrics.inc("backfill_balances_total", result["skipped"], result="skipped")
+    metrics.inc("backfill_balances_total", result["failed"], result="failed")
+    return result
+
+
+def backfill(store: HistoryStore, addresses: List[str], ledgers: Optional[List[int]] = None,
+             dates: Optional[List[datetime]] = None, mode: str = FETCH_MODE,
+             workers: int = POINT_WORKERS) -> Iterator[Dict]:
+    """Backfill every ledger index and date, yielding one result per point as it finishes
+
+    Dates are resolved to the last ledger closed at or before them; a date
+    the store already has a snapshot for is not looked up again. Points run
+    `workers` at a time while the next dates are being resolved. The store
+    is the checkpoint: a rerun only fetches what is not stored yet.
+    """
+    clock = LedgerClock()
+
+    def targets() -> Iterator[Tuple[Optional[int], Optional[datetime], object]]:
+        for ledger_index in sorted(set(ledgers or [])):
+            yield ledger_index, None, ledger_index
+        for when in sorted(set(dates or [])):
+            yield covered_ledger(store, when) or clock.ledger_at(when), when, when
+
+    def run(ledger_index: int, target) -> Dict:
+        snapshot = store.snapshot_for_ledger(ledger_index)
+        if snapshot is not None:
+            taken_at = datetime.fromtimestamp(snapshot["taken_at"], timezone.utc)
+        else:
+            close = get_ledger(ledger_index)
+            if close is None:
+                return unavailable(ledger_index, target)
+            taken_at = datetime.fromtimestamp(close["close_time"], timezone.utc)
+        return dict(backfill_point(store, addresses, ledger_index, taken_at, mode), target=target)
+
+    def unavailable(ledger_index, target) -> Dict:
+        metrics.inc("backfill_points_total", result="unavailable")
+        return {"ledger_index": ledger_index, "taken_at": None, "stored": 0, "skipped": 0,
+                "failed": len(addresses), "target": target}
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="backfill") as executor:
+        futures = []
+        for ledger_index, when, target in targets():
+            if ledger_index is None:
+                yield unavailable(None, target)
+            else:
+                futures.append(executor.submit(run, ledger_index, target))
+            while futures and futures[0].done():
+                yield futures.pop(0).result()
+        for future in futures:
+            yield future.result()
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill wallet balances at past ledgers or dates")
+    parser.add_argument("--ledgers", type=int, nargs="+", default=[], help="Ledger indexes")
+    parser.add_argument("--dates", nargs="+", default=[],
+                        help="Dates (their 23:59:59 UTC close) or ISO datetimes")
+    parser.add_argument("--start", help="First date of a range")
+    parser.add_argument("--end", help="Last date of a range (default: today)")
+    parser.add_argument("--every", default="1d", help="Range step, e.g. 12h, 1d or 1w")
+    parser.add_argument("--mode", choices=FETCH_MODES, default=FETCH_MODE)
+    parser.add_argument("--workers", type=int, default=POINT_WORKERS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    dates = [parse_when(text) for text in args.dates]
+    if args.start:
+        end = parse_when(args.end) if args.end else datetime.now(timezone.utc)
+        dates += date_range(parse_when(args.start), end, parse_step(args.every))
+    if not dates and not args.ledgers:
+        parser.error("give --ledgers, --dates or --start")
+
+    store = open_history_store()
+    totals = {"stored": 0, "skipped": 0, "failed": 0}
+    for result in backfill(store, REGISTRY.addresses, args.ledgers, dates, args.mode, args.workers):
+        for key in totals:
+            totals[key] += result[key]
+        target = result["target"]
+        label = target.isoformat() if isinstance(target, datetime) else f"ledger {target}"
+        if result["ledger_index"] is None or result["taken_at"] is None:
+            logger.warning("%s: no validated ledger for it on any node (not closed yet or beyond their history)", label)
+        else:
+            logger.info("%s -> ledger #%s (%s): %d stored, %d already stored, %d failed", label,
+                        f"{result['ledger_index']:,}", result["taken_at"].strftime("%Y-%m-%d %H:%M:%S UTC"),
+                        result["stored"], result["skipped"], result["failed"])
+    logger.info("Done: %d balances stored, %d already stored, %d failed (rerun to retry)",
+                totals["stored"], totals["skipped"], totals["failed"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Offline benchmark of the fetch pipeline
+Drives the fetch engines, summary DataFrame and chart building against a local fake rippled
+
+    python benchmark.py --accounts 10000 --latency 0.02 --engines batch threads async stream
+"""
+
+import os
+import gc
+import json
+import time
+import argparse
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+from fake_rippled import FakeRippled, make_address
+from registry import Registry
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+ENGINES = ("batch", "threads", "async", "stream")
+WALLETS_PER_EXCHANGE = 250  # Synthetic registry layout for --accounts
+STREAM_READY_TIMEOUT = 600
+
+
+def synthetic_registry(accounts: int) -> Registry:
+    """Registry of `accounts` generated addresses spread over fake exchanges"""
+    exchanges: Dict[str, Dict[str, str]] = {}
+    for i in range(accounts):
+        name = f"exchange{i // WALLETS_PER_EXCHANGE:03d}"
+        exchanges.setdefault(name, {})[make_address(i)] = f"{name} wallet {i % WALLETS_PER_EXCHANGE}"
+    return Registry.from_dict(exchanges)
+
+
+def percentile(samples: List[float], pct: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def run_engine(engine: str, registry: Registry, fake: FakeRippled, iterations: int,
+               warmup: int) -> Dict:
+    """Time `iterations` refreshes plus DataFrame and chart builds for one engine"""
+    # Imported here: rippled and stream read their node lists at import time
+    from charts import build_change_chart, build_holdings_chart
+    from holdings import apply_benchmark, create_summary_dataframe, fetch_all_balances_parallel
+    from rippled import endpoint_manager
+    from stream import BalanceStream
+
+    addresses = registry.addresses
+    stream = None
+    ready_time = None
+    if engine == "stream":
+        started = time.perf_counter()
+        stream = BalanceStream(addresses).start()
+        while not stream.ready:
+            if time.perf_counter() - started > STREAM_READY_TIMEOUT:
+                raise TimeoutError("Balance stream never finished its first sweep")
+            time.sleep(0.01)
+        ready_time = time.perf_counter() - started
+        fetch: Callable[[], Dict] = lambda: fetch_all_balances_parallel(stream, registry=registry)
+    else:
+        fetch = lambda: fetch_all_balances_parallel(registry=registry, mode=engine)
+
+    historical = None
+
+    def pipeline(timings: Dict[str, List[float]]):
+        nonlocal historical
+        started = time.perf_counter()
+        data = fetch()
+        timings["fetch"].append(time.perf_counter() - started)
+        if historical is None:
+            historical = {address: drops * 9 // 10 for address, drops in data.good_drops().items()}
+        started = time.perf_counter()
+        df = create_summary_dataframe(apply_benchmark(data, historical))
+        timings["dataframe"].append(time.perf_counter() - started)
+        started = time.perf_counter()
+        build_holdings_chart(df.head(10))
+        hist_df = df[df["Change (XRP)"].notna()]
+        build_change_chart(hist_df, "Change (XRP)", "Absolute Change")
+        build_change_chart(hist_df, "Change (%)", "Percentage Change")
+        timings["charts"].append(time.perf_counter() - started)
+        return data
+
+    try:
+        for _ in range(warmup):
+            pipeline({"fetch": [], "dataframe": [], "charts": []})
+        timings = {"fetch": [], "dataframe": [], "charts": []}
+        requests_before, throttled_before = fake.requests, fake.throttled
+        for _ in range(iterations):
+            data = pipeline(timings)
+        requests = (fake.requests - requests_before) / iterations
+        throttled = (fake.throttled - throttled_before) / iterations
+
+        # Separate traced pass: tracemalloc slows everything down too much to time
+        gc.collect()
+        tracemalloc.start()
+        pipeline({"fetch": [], "dataframe": [], "charts": []})
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        if stream is not None:
+            stream.stop()
+
+    mean_fetch = sum(timings["fetch"]) / len(timings["fetch"])
+    return {
+        "engine": engine,
+        "accounts": len(addresses),
+        "iterations": iterations,
+        "ready_s": ready_time,
+        "fetch_p50_s": percentile(timings["fetch"], 50),
+        "fetch_p99_s": percentile(timings["fetch"], 99),
+        "accounts_per_s": len(addresses) / mean_fetch if mean_fetch else None,
+        "requests_per_refresh": requests,
+        "throttled_per_refresh": throttled,
+        "limits": "/".join(str(e["limit"]) for e in endpoint_manager.snapshot()),
+        "dataframe_p50_s": percentile(timings["dataframe"], 50),
+        "charts_p50_s": percentile(timings["charts"], 50),
+        "peak_mb": peak / 1024 / 1024,
+        "errors": int(data.frame["failed"].sum()),
+    }
+
+
+def format_report(results: List[Dict]) -> str:
+    columns = [("engine", "{}"), ("accounts", "{:,}"), ("ready_s", "{:.3f}"),
+               ("fetch_p50_s", "{:.3f}"), ("fetch_p99_s", "{:.3f}"), ("accounts_per_s", "{:,.0f}"),
+               ("requests_per_refresh", "{:,.1f}"), ("throttled_per_refresh", "{:,.1f}"),
+               ("limits", "{}"), ("dataframe_p50_s", "{:.4f}"),
+               ("charts_p50_s", "{:.4f}"), ("peak_mb", "{:.1f}"), ("errors", "{}")]
+    rows = [[name for name, _ in columns]]
+    for result in results:
+        rows.append([fmt.format(result[name]) if result[name] is not None else "-"
+                     for name, fmt in columns])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    return "\n".join("  ".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows)
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fetch pipeline against a fake rippled")
+    parser.add_argument("--accounts", type=int, default=0,
+                        help="Synthetic wallet count (default: the real registry)")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--nodes", type=int, default=3, help="Fake nodes to spread requests over")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds added to each request")
+    parser.add_argument("--jitter", type=float, default=0.005)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered 503")
+    parser.add_argument("--capacity", type=int, default=0,
+                        help="Requests in flight per fake node before it answers 429 (0: unlimited)")
+    parser.add_argument("--tx-per-ledger", type=int, default=5,
+                        help="Payments between tracked wallets per fake ledger (stream engine)")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    fake = FakeRippled(args.latency, args.jitter, args.error_rate, ledger_interval=3.5,
+                       tx_per_ledger=args.tx_per_ledger, capacity=args.capacity)
+    http_urls, ws_urls = fake.start(args.nodes)
+    os.environ["XRP_RIPPLED_URLS"] = ",".join(http_urls)
+    os.environ["XRP_RIPPLED_WS_URLS"] = ",".join(ws_urls)
+
+    registry = synthetic_registry(args.accounts) if args.accounts else Registry.from_file()
+
+    results = []
+    for engine in args.engines:
+        print(f"Running {engine}...", flush=True)
+        results.append(run_engine(engine, registry, fake, args.iterations, args.warmup))
+    print(format_report(results))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
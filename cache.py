@@ -0,0 +1,184 @@
+"""
+Stale-while-revalidate cache entries
+Serve the last good value with its age while a single background refresh runs
+"""
+
+import time
+import logging
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+RETRY_DELAY = 30  # Seconds before retrying a failed refresh
+
+
+# ============================================================================
+# SWR ENTRY
+# ============================================================================
+
+class SWREntry:
+    """One cached value refreshed by `loader`, never blanked by a failure
+
+    Readers always get the last good value immediately. At most one refresh
+    runs at a time (single-flight); concurrent requests for a refresh join the
+    one in progress. A failed refresh keeps the old value, records the error
+    and is retried after `retry_delay`.
+
+    With a `shared` cache (shared_cache.SharedCache) and a `codec` of
+    (encode, decode) functions, refreshes are also single-flight across
+    processes: a value another process fetched is adopted instead of
+    loaded again.
+    """
+
+    def __init__(self, name: str, loader: Callable[[], object], ttl: float,
+                 retry_delay: float = RETRY_DELAY, shared=None,
+                 codec: Optional[Tuple[Callable[[object], bytes], Callable[[bytes], object]]] = None):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self.retry_delay = retry_delay
+        self.shared = shared
+        self.codec = codec
+        self._cond = threading.Condition()
+        self._refreshing = False
+        self.value = None
+        self.fetched_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.failed_at: Optional[float] = None
+
+    def age(self) -> Optional[float]:
+        if self.fetched_at is None:
+            return None
+        return time.time() - self.fetched_at
+
+    def seconds_until_due(self) -> float:
+        """Seconds until the entry should be refreshed; <= 0 means now"""
+        now = time.time()
+        due = 0.0 if self.fetched_at is None else self.fetched_at + self.ttl
+        if self.failed_at is not None and (self.fetched_at is None or self.failed_at > self.fetched_at):
+            due = max(due, self.failed_at + self.retry_delay)
+        return due - now
+
+    def get(self, revalidate: bool = True) -> Dict:
+        """Current value with its age; starts a background refresh when stale"""
+        if revalidate and self.seconds_until_due() <= 0:
+            self.refresh()
+        with self._cond:
+            return {
+                "value": self.value,
+                "fetched_at": self.fetched_at,
+                "age": self.age(),
+                "refreshing": self._refreshing,
+                "error": self.error,
+            }
+
+    def refresh(self, wait: bool = False, timeout: Optional[float] = None) -> bool:
+        """Start a refresh unless one is running; returns True if this call started it
+
+        With `wait`, blocks until the refresh (this one or the one already
+        running) has finished.
+        """
+        with self._cond:
+            if self._refreshing:
+                if wait:
+                    self._cond.wait_for(lambda: not self._refreshing, timeout)
+                return False
+            self._refreshing = True
+        if wait:
+            self._run()
+        else:
+            threading.Thread(target=self._run, name=f"swr-{self.name}", daemon=True).start()
+        return True
+
+    def touch(self):
+        """Mark the current value as checked now, e.g. when its source is known unchanged"""
+        with self._cond:
+            if self.value is not None and not self._refreshing:
+                self.fetched_at = time.time()
+
+    def seed(self, value, fetched_at: float):
+        """Start from a value kept elsewhere (e.g. stored history) until the first refresh"""
+        with self._cond:
+            if self.value is None:
+                self.value = value
+                self.fetched_at = fetched_at
+                self._cond.notify_all()
+
+    def wait_for_value(self, timeout: float):
+        """Block until a first value exists or the first refresh failed (cold start only)"""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self.value is not None or (self.failed_at is not None and not self._refreshing),
+                timeout
+            )
+            return self.value
+
+    def _load(self) -> Tuple[object, float]:
+        if self.shared is None:
+            return self.loader(), time.time()
+        encode, decode = self.codec
+        return self.shared.fetch(self.name, self.loader, self.ttl, encode, decode,
+                                 newer_than=self.fetched_at)
+
+    def _run(self):
+        try:
+            value, fetched_at = self._load()
+        except Exception as e:
+            logger.warning("Refresh of %s failed: %s", self.name, e)
+            with self._cond:
+                self.error = str(e)
+                self.failed_at = time.time()
+        else:
+            with self._cond:
+                self.value = value
+                self.fetched_at = fetched_at
+                self.error = None
+        finally:
+            with self._cond:
+                self._refreshing = False
+                self._cond.notify_all()
+
+
+# ============================================================================
+# NEGATIVE CACHE
+# ============================================================================
+
+class NegativeCache:
+    """Remembers keys known to be dead, each for `ttl` seconds
+
+    Used for accounts the ledger reported as missing or malformed, so they
+    are re-checked rarely instead of on every refresh.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[str, tuple] = {}
+
+    def add(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+
+    def get(self, key: str):
+        """Cached value for `key`, None if unknown or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[1] >= self.ttl:
+                del self._entries[key]
+                return None
+            return entry[0]
+
+    def discard(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
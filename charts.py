@@ -0,0 +1,38 @@
+"""
+Plotly figures for the dashboard
+Streamlit-free so the benchmark can build them headlessly
+"""
+
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+CHART_TYPES = ["Bar", "Treemap", "Pie"]
+
+
+def build_holdings_chart(chart_df: pd.DataFrame, chart_type: str = "Bar") -> go.Figure:
+    """Top holdings as a bar chart, treemap or donut"""
+    if chart_type == "Bar":
+        fig = px.bar(chart_df, x="Exchange", y="Balance (XRP)",
+                    color="Market Share (%)", color_continuous_scale="Blues",
+                    text=chart_df["Balance (XRP)"].apply(lambda x: f"{x/1e6:.1f}M"))
+        fig.update_traces(textposition="outside")
+        fig.update_layout(xaxis_tickangle=-45, height=450, showlegend=False)
+    elif chart_type == "Treemap":
+        fig = px.treemap(chart_df, path=["Exchange"], values="Balance (XRP)",
+                       color="Balance (XRP)", color_continuous_scale="Blues")
+        fig.update_layout(height=450)
+    else:
+        fig = px.pie(chart_df, names="Exchange", values="Balance (XRP)", hole=0.4)
+        fig.update_layout(height=450)
+    return fig
+
+
+def build_change_chart(hist_df: pd.DataFrame, column: str, title: str) -> go.Figure:
+    """Horizontal bars of `column`, red for losses and green for gains"""
+    sorted_df = hist_df.sort_values(column)
+    colors = ['#ff5252' if x < 0 else '#00c853' for x in sorted_df[column]]
+    fig = go.Figure(go.Bar(x=sorted_df[column], y=sorted_df["Exchange"],
+                           orientation='h', marker_color=colors))
+    fig.update_layout(title=title, height=350)
+    return fig
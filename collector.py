@@ -0,0 +1,292 @@
+"""
+Background collector for balances and price
+Refreshes on closed ledgers (or a schedule) into a shared snapshot so page renders never wait on rippled
+
+Run standalone with `python collector.py` and start the dashboard with
+XRP_COLLECTOR=external to share one collector between processes.
+"""
+
+import os
+import json
+import logging
+import argparse
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+from cache import SWREntry
+from history import HistoryStore
+from metrics import METRICS_PORT, metrics, start_metrics_server
+from holdings import EXCHANGES, fetch_all_balances_parallel, open_history_store
+from prices import PriceService
+from shared_cache import SharedCache, open_shared_cache
+from snapshot import Snapshot, freeze, thaw
+from stream import STREAM_ENABLED, BalanceStream
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+BALANCE_INTERVAL = 300  # Seconds between balance refreshes without a live stream
+REFRESH_LEDGERS = int(os.environ.get("XRP_REFRESH_LEDGERS", "5"))  # With a live stream: at most one refresh per this many ledgers (0: schedule only)
+HISTORY_INTERVAL = BALANCE_INTERVAL  # Seconds between balance snapshots stored in history, however often balances refresh
+PRICE_INTERVAL = 60  # Seconds between price refreshes
+COLLECTOR_MODE = os.environ.get("XRP_COLLECTOR", "thread")  # "thread" or "external"
+SNAPSHOT_FILE = os.environ.get("XRP_SNAPSHOT_FILE", "xrp_snapshot.json")
+
+
+# ============================================================================
+# COLLECTOR
+# ============================================================================
+
+# How entries travel through a shared cache between replicas
+def _encode_snapshot(snapshot: Snapshot) -> bytes:
+    return json.dumps(snapshot.to_dict()).encode()
+
+
+def _decode_snapshot(data: bytes) -> Snapshot:
+    return Snapshot.from_dict(json.loads(data))
+
+
+def _encode_json(value) -> bytes:
+    return json.dumps(value).encode()
+
+
+def _decode_json(data: bytes):
+    return json.loads(data)
+
+
+class Collector:
+    """Keeps the latest good balance and price snapshot
+
+    Balances and price are stale-while-revalidate entries: the collector
+    refreshes each one when it falls due, readers get the last good value
+    with its age, and a failed refresh never replaces it. With a `shared`
+    cache, replicas of the dashboard take turns: one fetches each entry per
+    interval and the others adopt its result.
+
+    With a balance `stream`, balances follow the ledger instead of the
+    clock: a closed ledger triggers a refresh when a tracked balance
+    changed since the current snapshot, at most once per `refresh_ledgers`
+    ledgers. A quiet ledger only marks the snapshot as checked. The
+    interval schedule remains the fallback while the stream is down.
+    History keeps its own clock: a refresh is stored only once
+    `history_interval` has passed since the newest stored snapshot.
+
+    The price is the median of several sources (prices.PriceService) under
+    token-bucket quotas shared through the same cache. Every good price is
+    stored with the history, and a restarted collector starts from the last
+    stored one, so the dashboard shows a price with its age even while every
+    source is failing.
+    """
+
+    def __init__(self, store: Optional[HistoryStore] = None,
+                 stream: Optional[BalanceStream] = None,
+                 snapshot_file: Optional[str] = None,
+                 balance_interval: float = BALANCE_INTERVAL,
+                 price_interval: float = PRICE_INTERVAL,
+                 shared: Optional[SharedCache] = None,
+                 refresh_ledgers: int = REFRESH_LEDGERS,
+                 history_interval: float = HISTORY_INTERVAL):
+        self.store = store
+        self.history_interval = history_interval
+        self.stream = stream
+        self.refresh_ledgers = refresh_ledgers
+        self.snapshot_file = snapshot_file
+        self.balances = SWREntry("balances", self._load_balances, balance_interval,
+                                 shared=shared, codec=(_encode_snapshot, _decode_snapshot))
+        self.prices = PriceService(shared=shared)
+        self.price = SWREntry("price", self._load_price, price_interval,
+                              shared=shared, codec=(_encode_json, _decode_json))
+        last_price = store.latest_price() if store is not None else None
+        if last_price is not None:
+            self.price.seed({key: last_price[key] for key in ("price", "change_24h", "sources")},
+                            last_price["taken_at"])
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._ledger_due = threading.Event()  # A closed ledger asked for a balance refresh
+        self._thread: Optional[threading.Thread] = None
+        if stream is not None and refresh_ledgers > 0:
+            stream.on_ledger(self._on_ledger)
+
+    def following_ledgers(self) -> bool:
+        """True while balances are refreshed on closed ledgers rather than on the schedule"""
+        return self.refresh_ledgers > 0 and self.stream is not None and self.stream.ready
+
+    def _on_ledger(self, ledger_index: int, close_time: Optional[int], changed_ledger: int):
+        """Stream callback for every completed ledger"""
+        snapshot = self.balances.value
+        if snapshot is not None and snapshot.ledger_index is not None:
+            if changed_ledger <= snapshot.ledger_index:
+                self.balances.touch()
+                metrics.inc("ledger_refreshes_total", result="quiet")
+                return
+            if ledger_index - snapshot.ledger_index < self.refresh_ledgers:
+                metrics.inc("ledger_refreshes_total", result="deferred")
+                return
+        self._ledger_due.set()
+        self._wake.set()
+        metrics.inc("ledger_refreshes_total", result="refreshed")
+
+    def _last_known(self) -> Dict[str, Tuple[int, float]]:
+        """Last good drops per address: previous snapshot, else the history store"""
+        previous = self.balances.value
+        if previous is None:
+            return self.store.latest_balances() if self.store is not None else {}
+        return previous.data.last_known(self.balances.fetched_at)
+
+    def _load_balances(self) -> Snapshot:
+        table = fetch_all_balances_parallel(self.stream, self._last_known())
+        taken_at = datetime.fromtimestamp(table.close_time, timezone.utc) if table.close_time \
+            else datetime.now(timezone.utc)
+        if self._history_due(taken_at):
+            self.store.record_drops(table.good_drops(), table.ledger_index, taken_at)
+        return Snapshot(table, table.ledger_index, close_time=table.close_time)
+
+    def _history_due(self, taken_at: datetime) -> bool:
+        """True when a snapshot taken at `taken_at` should be stored; the store is shared by replicas"""
+        if self.store is None:
+            return False
+        newest = self.store.list_snapshots(1)
+        return not newest or taken_at.timestamp() - newest[0]["taken_at"] >= self.history_interval
+
+    def _load_price(self) -> Dict:
+        price = self.prices.fetch()
+        if self.store is not None:
+            self.store.record_price(price)
+        return price
+
+    def request_refresh(self):
+        """Refresh everything now, without waiting for the result"""
+        self.balances.refresh()
+        self.price.refresh()
+
+    def latest(self, revalidate: bool = True) -> Optional[Dict]:
+        """Latest good snapshot with ages, or None before the first one
+
+        `snapshot` and `data` are the shared immutable Snapshot and its
+        balances, never copies. Reading a stale entry starts its background
+        refresh, so data keeps moving even if the collector loop is busy with
+        the other entry.
+        """
+        balances = self.balances.get(revalidate)
+        price = self.price.get(revalidate)
+        snapshot = balances["value"]
+        if snapshot is None:
+            return None
+        return dict(
+            snapshot=snapshot,
+            data=snapshot.data,
+            ledger_index=snapshot.ledger_index,
+            close_time=snapshot.close_time,
+            version=snapshot.version,
+            fetched_at=balances["fetched_at"],
+            age=balances["age"],
+            refreshing=balances["refreshing"],
+            error=balances["error"],
+            price=dict(price["value"], fetched_at=price["fetched_at"], age=price["age"],
+                       error=price["error"]) if price["value"] else None,
+        )
+
+    def wait_for_snapshot(self, timeout: float) -> Optional[Dict]:
+        self.balances.wait_for_value(timeout)
+        return self.latest()
+
+    def run_once(self):
+        """Run whichever refreshes are due, on the schedule or after a closed ledger"""
+        ledger_due = self._ledger_due.is_set()
+        self._ledger_due.clear()
+        for entry in (self.balances, self.price):
+            if entry.seconds_until_due() <= 0 or (ledger_due and entry is self.balances):
+                entry.refresh(wait=True)
+        if self.snapshot_file:
+            write_snapshot_file(self.latest(revalidate=False), self.snapshot_file)
+
+    def run(self):
+        while not self._stop.is_set():
+            self.run_once()
+            delay = min(self.balances.seconds_until_due(), self.price.seconds_until_due())
+            self._wake.wait(max(1.0, delay))
+            self._wake.clear()
+
+    def start(self) -> "Collector":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="collector", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+
+# ============================================================================
+# SNAPSHOT FILE - sharing with an external collector process
+# ============================================================================
+
+def write_snapshot_file(snapshot: Optional[Dict], path: str = SNAPSHOT_FILE):
+    """Atomically replace the snapshot file"""
+    if snapshot is None:
+        return
+    payload = thaw({key: value for key, value in snapshot.items() if key not in ("snapshot", "data")})
+    payload["snapshot"] = snapshot["snapshot"].to_dict()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(payload, f, default=str)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot_file(path: str = SNAPSHOT_FILE) -> Optional[Dict]:
+    """Snapshot written by an external collector, None if there is none yet
+
+    Returned in the same shape as Collector.latest, with frozen data.
+    """
+    try:
+        with open(path) as f:
+            raw = json.load(f)
+    except (OSError, ValueError):
+        return None
+    try:
+        snapshot = Snapshot.from_dict(raw["snapshot"])
+    except (KeyError, TypeError):
+        return None  # Written by an older collector
+    return dict(raw, snapshot=snapshot, data=snapshot.data, price=freeze(raw.get("price")))
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Collect XRP exchange balances in the background")
+    parser.add_argument("--balance-interval", type=float, default=BALANCE_INTERVAL)
+    parser.add_argument("--price-interval", type=float, default=PRICE_INTERVAL)
+    parser.add_argument("--refresh-ledgers", type=int, default=REFRESH_LEDGERS,
+                        help="With the balance stream, refresh at most once per this many ledgers (0: schedule only)")
+    parser.add_argument("--history-interval", type=float, default=HISTORY_INTERVAL,
+                        help="Seconds between balance snapshots stored in history")
+    parser.add_argument("--snapshot-file", default=SNAPSHOT_FILE)
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="Serve /metrics and /metrics.json on this port (0 disables)")
+    parser.add_argument("--once", action="store_true", help="Collect one snapshot and exit")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if not args.once:
+        start_metrics_server(args.metrics_port)
+    store = open_history_store()
+    stream = None
+    if STREAM_ENABLED and not args.once:
+        stream = BalanceStream([addr for wallets in EXCHANGES.values() for addr in wallets]).start()
+    collector = Collector(store, stream, args.snapshot_file, args.balance_interval,
+                          args.price_interval, open_shared_cache(), args.refresh_ledgers,
+                          args.history_interval)
+    if args.once:
+        collector.run_once()
+    else:
+        collector.run()
+
+
+if __name__ == "__main__":
+    main()
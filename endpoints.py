@@ -0,0 +1,465 @@
+"""
+Endpoint health tracking for rippled nodes
+Rolling latency/error scoring, circuit breaking, adaptive concurrency limits and hedged requests
+"""
+
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import Executor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, List, Optional, Tuple
+from metrics import metrics
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+HEALTH_WINDOW = 100  # Samples kept per endpoint
+MIN_SAMPLES = 10  # Samples needed before p95 / error-rate decisions
+DEFAULT_LATENCY = 0.5  # Assumed latency (s) of an endpoint with no samples
+ERROR_PENALTY = 4.0  # Score multiplier per unit of error rate
+FAILURE_THRESHOLD = 5  # Consecutive failures that open the circuit
+ERROR_RATE_THRESHOLD = 0.5  # Rolling error rate that opens the circuit
+CIRCUIT_COOLDOWN = 30  # Seconds an open circuit stays open
+HEDGE_DEFAULT_DELAY = 1.0  # Hedge delay (s) until p95 is known
+HEDGE_MIN_DELAY = 0.05
+INITIAL_LIMIT = 8  # Starting in-flight request limit per endpoint
+MIN_LIMIT = 1
+MAX_LIMIT = 32
+BACKOFF_FACTOR = 0.5  # Limit multiplier on 429/503, timeouts and slowDown/tooBusy
+LATENCY_TOLERANCE = 2.0  # Latency over this multiple of the baseline counts as queueing
+LATENCY_BACKOFF = 0.9  # Limit multiplier when latency rises past the tolerance
+BASELINE_DRIFT = 0.01  # Share of each slower sample the latency baseline moves up by
+LIMIT_HISTORY = 500  # Limit changes kept per endpoint
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+
+class EndpointError(Exception):
+    """Raised when no endpoint could serve a request"""
+
+
+class EndpointSkipped(Exception):
+    """The node answered but cannot serve this request; try the next one
+
+    Counted as a healthy response, so e.g. a node without the requested
+    ledger is not penalized for it.
+    """
+
+
+class EndpointOverloaded(Exception):
+    """The node is shedding load (429/503, timeout, slowDown); cuts its concurrency limit"""
+
+
+def outcome(error: Optional[BaseException]) -> Tuple[bool, bool]:
+    """(ok, overloaded) of a finished request from the exception it raised"""
+    return (error is None or isinstance(error, EndpointSkipped),
+            isinstance(error, EndpointOverloaded))
+
+
+# ============================================================================
+# ENDPOINT MANAGER
+# ============================================================================
+
+class EndpointStats:
+    """Rolling health statistics and circuit state for one URL"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.latencies = deque(maxlen=HEALTH_WINDOW)
+        self.outcomes = deque(maxlen=HEALTH_WINDOW)
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.limit = float(INITIAL_LIMIT)
+        self.in_flight = 0
+        self.baselines: Dict[str, float] = {}  # Request kind -> latency baseline
+        self.cut_at = 0.0  # Requests started before the last cut do not cut again
+        self.history = deque([(time.time(), INITIAL_LIMIT)], maxlen=LIMIT_HISTORY)
+
+    def has_slot(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def score(self) -> float:
+        """Lower is better: median latency inflated by the error rate"""
+        latency = self.percentile(50) or DEFAULT_LATENCY
+        return latency * (1 + ERROR_PENALTY * self.error_rate())
+
+
+class EndpointManager:
+    """Routes requests to the healthiest rippled node within its concurrency limit
+
+    Thread-safe; one instance is shared by every fetch engine so health
+    statistics and limits carry over between refreshes.
+
+    Each endpoint gets an AIMD limit on requests in flight: the limit grows
+    by one per limit's worth of successes while latency stays within
+    LATENCY_TOLERANCE of the endpoint's baseline for that kind of request,
+    shrinks by LATENCY_BACKOFF when latency climbs past it and is cut by
+    BACKOFF_FACTOR when the node sheds load. Requests wait for a free slot,
+    which is handed to waiting threads and coroutines oldest first.
+    """
+
+    def __init__(self, urls: List[str]):
+        self._lock = threading.Lock()
+        self._stats = {url: EndpointStats(url) for url in urls}
+        self._waiters = deque()  # (urls, hand_over) of requests waiting for a slot
+        self.hedges_sent = 0
+        self.hedge_wins = 0
+        for url in urls:
+            metrics.set("rippled_concurrency_limit", INITIAL_LIMIT, endpoint=url)
+
+    def _refresh_state(self, stats: EndpointStats, now: float):
+        if stats.state == OPEN and now - stats.opened_at >= CIRCUIT_COOLDOWN:
+            # Let the next request probe the node with a clean slate
+            stats.state = HALF_OPEN
+            stats.latencies.clear()
+            stats.outcomes.clear()
+
+    def ranked(self) -> List[str]:
+        """URLs ordered best-first; open circuits only when nothing else is left"""
+        now = time.monotonic()
+        with self._lock:
+            for stats in self._stats.values():
+                self._refresh_state(stats, now)
+            usable = [s for s in self._stats.values() if s.state != OPEN]
+            blocked = [s for s in self._stats.values() if s.state == OPEN]
+            usable.sort(key=lambda s: s.score())
+            blocked.sort(key=lambda s: s.opened_at)
+        return [s.url for s in usable + blocked]
+
+    def capacity(self) -> int:
+        """Most requests all endpoints together may ever have in flight"""
+        return MAX_LIMIT * len(self._stats)
+
+    # ------------------------------------------------------------ slots
+
+    def _free(self, urls: List[str]) -> Optional[str]:
+        """First of `urls` with a free slot, skipping open circuits unless all are open"""
+        candidates = [self._stats[url] for url in urls if url in self._stats]
+        if any(s.state != OPEN for s in candidates):
+            candidates = [s for s in candidates if s.state != OPEN]
+        for stats in candidates:
+            if stats.has_slot():
+                return stats.url
+        return None
+
+    def _take(self, url: str) -> str:
+        self._stats[url].in_flight += 1
+        return url
+
+    def _dispatch(self):
+        """Hand free slots to waiting requests, oldest first"""
+        while self._waiters and any(s.has_slot() for s in self._stats.values()):
+            for i, (urls, hand_over) in enumerate(self._waiters):
+                url = self._free(urls)
+                if url is not None:
+                    del self._waiters[i]
+                    hand_over(self._take(url))
+                    break
+            else:
+                return
+
+    def try_acquire(self, urls: List[str]) -> Optional[str]:
+        """Take a slot on the first of `urls` that has one free, None if all are busy"""
+        with self._lock:
+            url = self._free(urls)
+            return self._take(url) if url is not None else None
+
+    def acquire(self, urls: List[str]) -> str:
+        """Block until one of `urls` has a free slot; returns the URL, slot taken"""
+        granted = []
+        ready = threading.Event()
+
+        def hand_over(url: str):
+            granted.append(url)
+            ready.set()
+
+        with self._lock:
+            url = self._free(urls)
+            if url is not None:
+                return self._take(url)
+            self._waiters.append((urls, hand_over))
+        ready.wait()
+        return granted[0]
+
+    async def acquire_async(self, urls: List[str]) -> str:
+        """Async counterpart of acquire"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def deliver(url: str):
+            if future.done():  # Cancelled meanwhile: pass the slot on
+                self.release(url)
+            else:
+                future.set_result(url)
+
+        waiter = (urls, lambda url: loop.call_soon_threadsafe(deliver, url))
+        with self._lock:
+            url = self._free(urls)
+            if url is not None:
+                return self._take(url)
+            self._waiters.append(waiter)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            raise
+
+    def release(self, url: str):
+        """Give back a slot taken by acquire"""
+        with self._lock:
+            stats = self._stats.get(url)
+            if stats is None:
+                return
+            stats.in_flight -= 1
+            in_flight = stats.in_flight
+            self._dispatch()
+        metrics.set("rippled_in_flight", in_flight, endpoint=url)
+
+    # ------------------------------------------------------------ outcomes
+
+    def _set_limit(self, stats: EndpointStats, limit: float, reason: str) -> Optional[str]:
+        old = int(stats.limit)
+        stats.limit = min(MAX_LIMIT, max(MIN_LIMIT, limit))
+        if int(stats.limit) == old:
+            return None
+        stats.history.append((time.time(), int(stats.limit)))
+        return reason
+
+    def _adapt(self, stats: EndpointStats, latency: float, ok: bool, overloaded: bool,
+               started: float, kind: str) -> Optional[str]:
+        """Move the endpoint's limit after one request; returns why it changed, if it did"""
+        now = time.monotonic()
+        if overloaded:
+            if started < stats.cut_at:  # Already cut for this episode
+                return None
+            stats.cut_at = now
+            return self._set_limit(stats, stats.limit * BACKOFF_FACTOR, "overload")
+        if not ok:
+            return None  # Plain failures are the circuit breaker's business
+        baseline = stats.baselines.get(kind)
+        if baseline is None or latency < baseline:
+            stats.baselines[kind] = latency
+        else:
+            stats.baselines[kind] = baseline + (latency - baseline) * BASELINE_DRIFT
+            if latency > baseline * LATENCY_TOLERANCE:
+                if started < stats.cut_at:
+                    return None
+                stats.cut_at = now
+                return self._set_limit(stats, stats.limit * LATENCY_BACKOFF, "latency")
+        if stats.in_flight * 2 >= stats.limit:  # Only grow a limit that is actually used
+            return self._set_limit(stats, stats.limit + 1 / stats.limit, "increase")
+        return None
+
+    def record(self, url: str, latency: float, ok: bool, overloaded: bool = False,
+               started: Optional[float] = None, kind: str = ""):
+        """Record the outcome of one request
+
+        `started` (time.monotonic()) and `kind` (e.g. the JSON-RPC method)
+        feed the adaptive limit; without `started` only health is tracked.
+        """
+        metrics.observe("rippled_request_seconds", latency, endpoint=url)
+        metrics.inc("rippled_requests_total", endpoint=url,
+                    outcome="ok" if ok else "overloaded" if overloaded else "error")
+        changed = None
+        with self._lock:
+            stats = self._stats.get(url)
+            if stats is None:
+                return
+            stats.requests += 1
+            stats.latencies.append(latency)
+            stats.outcomes.append(ok or overloaded)  # Shedding load is the limit's business, not an error
+            if started is not None:
+                changed = self._adapt(stats, latency, ok, overloaded, started, kind)
+                if changed:
+                    self._dispatch()
+            limit = int(stats.limit)
+            if ok:
+                stats.consecutive_failures = 0
+                if stats.state == HALF_OPEN:
+                    stats.state = CLOSED
+            else:
+                stats.failures += 1
+                if not overloaded:  # Bursts of 429s are the limit's business, not the circuit's
+                    stats.consecutive_failures += 1
+                tripped = (stats.consecutive_failures >= FAILURE_THRESHOLD
+                           or (len(stats.outcomes) >= MIN_SAMPLES
+                               and stats.error_rate() >= ERROR_RATE_THRESHOLD))
+                if stats.state == HALF_OPEN or tripped:
+                    stats.state = OPEN
+                    stats.opened_at = time.monotonic()
+        if changed:
+            metrics.set("rippled_concurrency_limit", limit, endpoint=url)
+            metrics.inc("rippled_limit_changes_total", endpoint=url, reason=changed)
+
+    def hedge_delay(self, url: str) -> float:
+        """Seconds to wait on `url` before sending a hedged duplicate"""
+        with self._lock:
+            stats = self._stats.get(url)
+            if stats is None or len(stats.latencies) < MIN_SAMPLES:
+                return HEDGE_DEFAULT_DELAY
+            return max(HEDGE_MIN_DELAY, stats.percentile(95))
+
+    def note_hedge(self, won: bool = False):
+        metrics.inc("rippled_hedges_total", result="won" if won else "sent")
+        with self._lock:
+            if won:
+                self.hedge_wins += 1
+            else:
+                self.hedges_sent += 1
+
+    def snapshot(self) -> List[Dict]:
+        """Per-endpoint health summary for display and metrics"""
+        with self._lock:
+            return [{
+                "url": s.url,
+                "state": s.state,
+                "limit": int(s.limit),
+                "in_flight": s.in_flight,
+                "p50": s.percentile(50),
+                "p95": s.percentile(95),
+                "error_rate": s.error_rate(),
+                "requests": s.requests,
+                "failures": s.failures,
+            } for s in self._stats.values()]
+
+    def limit_history(self) -> List[Dict]:
+        """Every recorded limit change as {"url", "at" (epoch seconds), "limit"}, oldest first"""
+        with self._lock:
+            rows = [{"url": s.url, "at": at, "limit": limit}
+                    for s in self._stats.values() for at, limit in s.history]
+        return sorted(rows, key=lambda row: row["at"])
+
+
+# ============================================================================
+# HEDGED CALLS
+# ============================================================================
+
+def hedged_call(manager: EndpointManager, attempt: Callable[[str], object],
+                executor: Executor, kind: str = ""):
+    """Run `attempt(url)` on the best node, hedging to the next one after p95
+
+    `attempt` raises on failure. The first successful result wins; a losing
+    request is left to finish on its own and still feeds the health stats.
+    Failed requests are replaced by the next node in ranked order, keeping one
+    request in flight before the hedge fires and two after. Every request
+    holds a slot of its node's concurrency limit; the first goes to the best
+    node with a free slot, and a hedge is only sent if a slot is free.
+    """
+    queue = manager.ranked()
+    if not queue:
+        raise EndpointError("No endpoints configured")
+    pending = {}
+    in_flight = 1  # Raised to 2 once the hedge fires
+    hedge_due = True
+    last_error: Optional[BaseException] = None
+
+    def launch(url: str):
+        queue.remove(url)
+        started = time.monotonic()
+        future = executor.submit(attempt, url)
+
+        def finish(done, url=url, started=started):
+            ok, overloaded = outcome(done.exception())
+            manager.record(url, time.monotonic() - started, ok, overloaded, started, kind)
+            manager.release(url)
+
+        future.add_done_callback(finish)
+        pending[future] = url
+        return future
+
+    primary = launch(manager.acquire(queue))
+    while pending:
+        timeout = None
+        if hedge_due and queue:
+            timeout = manager.hedge_delay(next(iter(pending.values())))
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            hedge_due = False
+            url = manager.try_acquire(queue)
+            if url is not None:  # Every other node is at its limit: do not pile on
+                in_flight = 2
+                manager.note_hedge()
+                launch(url)
+        for future in done:
+            pending.pop(future)
+            error = future.exception()
+            if error is None:
+                if future is not primary and primary in pending:
+                    manager.note_hedge(won=True)
+                return future.result()
+            last_error = error
+        while queue and len(pending) < in_flight:
+            launch(manager.acquire(queue))
+    raise EndpointError(str(last_error) if last_error else "No endpoints configured")
+
+
+async def hedged_call_async(manager: EndpointManager, attempt, kind: str = ""):
+    """Async counterpart of hedged_call; `attempt(url)` is a coroutine function
+
+    Losing requests are cancelled once a result arrives.
+    """
+    queue = manager.ranked()
+    if not queue:
+        raise EndpointError("No endpoints configured")
+    pending = {}
+    in_flight = 1  # Raised to 2 once the hedge fires
+    hedge_due = True
+    last_error: Optional[BaseException] = None
+
+    def launch(url: str):
+        queue.remove(url)
+        task = asyncio.ensure_future(attempt(url))
+        pending[task] = (url, time.monotonic())
+        return task
+
+    primary = launch(await manager.acquire_async(queue))
+    try:
+        while pending:
+            timeout = None
+            if hedge_due and queue:
+                timeout = manager.hedge_delay(next(iter(pending.values()))[0])
+            done, _ = await asyncio.wait(pending, timeout=timeout,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                hedge_due = False
+                url = manager.try_acquire(queue)
+                if url is not None:  # Every other node is at its limit: do not pile on
+                    in_flight = 2
+                    manager.note_hedge()
+                    launch(url)
+            for task in done:
+                url, started = pending.pop(task)
+                error = task.exception()
+                ok, overloaded = outcome(error)
+                manager.record(url, time.monotonic() - started, ok, overloaded, started, kind)
+                manager.release(url)
+                if error is None:
+                    if task is not primary and primary in pending:
+                        manager.note_hedge(won=True)
+                    return task.result()
+                last_error = error
+            while queue and len(pending) < in_flight:
+                launch(await manager.acquire_async(queue))
+    finally:
+        for task, (url, _) in pending.items():
+            task.cancel()
+            manager.release(url)
+    raise EndpointError(str(last_error) if last_error else "No endpoints configured")
@@ -0,0 +1,169 @@
+"""
+Data exports
+Summary, wallet and history tables as CSV, JSON, NDJSON, Parquet or Arrow, written chunk by chunk
+"""
+
+import json
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from history import HistoryStore
+from rippled import DROPS_PER_XRP
+from wallets import WalletTable
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+CHUNK_ROWS = 50_000  # Rows serialized per chunk
+
+# Format -> (MIME type, file extension)
+FORMATS: Dict[str, tuple] = {
+    "csv": ("text/csv", "csv"),
+    "json": ("application/json", "json"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.file", "arrow"),
+}
+
+
+# ============================================================================
+# TABLES
+# ============================================================================
+
+def wallet_frame(table: WalletTable) -> pd.DataFrame:
+    """One row per wallet: exchange, name, address, drops, XRP balance and status flags"""
+    frame = table.frame
+    columns = ["exchange", "name", "address", "drops", "failed", "stale", "unfunded", "as_of"]
+    if "historical" in frame:
+        columns.append("historical")
+    out = frame[columns].reset_index(drop=True)
+    out.insert(4, "balance", out["drops"] / DROPS_PER_XRP)
+    return out
+
+
+def chunked(frame: pd.DataFrame, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    for start in range(0, max(len(frame), 1), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+
+def history_frames(store: HistoryStore, start: datetime, end: datetime,
+                   chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Every stored balance taken between `start` and `end`, oldest snapshot first"""
+    for rows in store.iter_balances(start, end, chunk_rows):
+        frame = pd.DataFrame(rows, columns=["taken_at", "ledger_index", "address", "drops"])
+        frame["taken_at"] = pd.to_datetime(frame["taken_at"], unit="s", utc=True)
+        frame["balance"] = frame["drops"] / DROPS_PER_XRP
+        yield frame
+
+
+# ============================================================================
+# ENCODERS - each turns an iterator of frames into an iterator of bytes
+# ============================================================================
+
+class _Sink:
+    """Write-only file collecting what pyarrow writers emit until drained"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def _csv(frames: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    header = True
+    for frame in frames:
+        yield frame.to_csv(index=False, header=header).encode()
+        header = False
+
+
+def _ndjson(frames: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    for frame in frames:
+        if len(frame):
+            yield frame.to_json(orient="records", lines=True, date_format="iso").encode()
+
+
+def _json(frames: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """A JSON array of row objects, one chunk at a time"""
+    yield b"["
+    first = True
+    for frame in frames:
+        if len(frame):
+            body = frame.to_json(orient="records", date_format="iso")[1:-1]
+            yield (body if first else "," + body).encode()
+            first = False
+    yield b"]"
+
+
+def _arrow_table(frame: pd.DataFrame) -> pa.Table:
+    return pa.Table.from_pandas(frame, preserve_index=False)
+
+
+def _parquet(frames: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    sink, writer = _Sink(), None
+    for frame in frames:
+        table = _arrow_table(frame)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema, compression="zstd")
+        writer.write_table(table)
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
+
+
+def _arrow(frames: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    sink, writer = _Sink(), None
+    for frame in frames:
+        table = _arrow_table(frame)
+        if writer is None:
+            writer = pa.ipc.new_file(sink, table.schema)
+        writer.write_table(table)
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
+
+
+ENCODERS = {"csv": _csv, "json": _json, "ndjson": _ndjson, "parquet": _parquet, "arrow": _arrow}
+
+
+def encode(fmt: str, frames: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """Serialize frames lazily; nothing is produced until the iterator is consumed"""
+    if fmt not in ENCODERS:
+        raise ValueError(f"Unknown export format {fmt!r}, expected one of {', '.join(ENCODERS)}")
+    return ENCODERS[fmt](frames)
+
+
+def nested_json(table: WalletTable) -> bytes:
+    """The {exchange: {total, wallets: [...]}} document of the dashboard's JSON download"""
+    return json.dumps(table.to_dict(), indent=2, default=str).encode()
+
+
+# ============================================================================
+# OUTPUT
+# ============================================================================
+
+def file_name(stem: str, fmt: str, when: Optional[datetime] = None) -> str:
+    return f"{stem}_{(when or datetime.now()).strftime('%Y%m%d')}.{FORMATS[fmt][1]}"
@@ -0,0 +1,166 @@
+"""
+Local fake price APIs for offline testing
+Serves every ticker path prices.py knows with a random-walk XRP/USD price, optional errors and 429s
+
+    python fake_prices.py --port 5010 --error-rate 0.2 --per-minute 10
+    XRP_PRICE_BASE_URL=http://127.0.0.1:5010 python collector.py
+"""
+
+import time
+import random
+import asyncio
+import argparse
+import threading
+from aiohttp import web
+from typing import Dict, List, Optional, Tuple
+
+# ============================================================================
+# FAKE SOURCES
+# ============================================================================
+
+class FakePrices:
+    """One XRP/USD random walk answered in each source's own format
+
+    Each source quotes the walk with its own small `spread`, so a median has
+    something to do. `error_rate` of requests are answered with HTTP 503 and,
+    with `per_minute`, each source answers 429 once it had that many requests
+    in the last minute. `down` names sources that always fail.
+    """
+
+    def __init__(self, price: float = 2.5, volatility: float = 0.001, spread: float = 0.002,
+                 error_rate: float = 0.0, per_minute: int = 0, down: Tuple[str, ...] = ()):
+        self.price = price
+        self.open_24h = price
+        self.volatility = volatility
+        self.spread = spread
+        self.error_rate = error_rate
+        self.per_minute = per_minute
+        self.down = set(down)
+        self._lock = threading.Lock()
+        self._moved_at = time.time()
+        self._recent: Dict[str, List[float]] = {}
+        self.requests: Dict[str, int] = {}
+
+    def quote(self, source: str) -> float:
+        """The walk's price now, as `source` would quote it"""
+        with self._lock:
+            now = time.time()
+            steps = int(now - self._moved_at)  # One step per second
+            for _ in range(min(steps, 3600)):
+                self.price *= 1 + random.gauss(0, self.volatility)
+            if steps:
+                self._moved_at = now
+            return self.price * (1 + random.uniform(-self.spread, self.spread))
+
+    def _limited(self, source: str) -> bool:
+        if not self.per_minute:
+            return False
+        with self._lock:
+            now = time.time()
+            recent = [at for at in self._recent.get(source, []) if at > now - 60]
+            limited = len(recent) >= self.per_minute
+            if not limited:
+                recent.append(now)
+            self._recent[source] = recent
+            return limited
+
+    def _answer(self, source: str, body) -> web.Response:
+        self.requests[source] = self.requests.get(source, 0) + 1
+        if source in self.down or random.random() < self.error_rate:
+            return web.Response(status=503, text="Service unavailable")
+        if self._limited(source):
+            return web.Response(status=429, text="Too many requests")
+        return web.json_response(body)
+
+    def _change(self, last: float) -> float:
+        return (last / self.open_24h - 1) * 100
+
+    # ------------------------------------------------------------ handlers
+
+    async def coingecko(self, request: web.Request) -> web.Response:
+        last = self.quote("coingecko")
+        return self._answer("coingecko", {"ripple": {"usd": round(last, 6),
+                                                     "usd_24h_change": self._change(last)}})
+
+    async def binance(self, request: web.Request) -> web.Response:
+        last = self.quote("binance")
+        return self._answer("binance", {"symbol": "XRPUSDT", "lastPrice": f"{last:.8f}",
+                                        "priceChangePercent": f"{self._change(last):.3f}"})
+
+    async def kraken(self, request: web.Request) -> web.Response:
+        last = self.quote("kraken")
+        return self._answer("kraken", {"error": [], "result": {"XXRPZUSD": {
+            "c": [f"{last:.8f}", "100.0"], "o": f"{self.open_24h:.8f}"}}})
+
+    async def coinbase(self, request: web.Request) -> web.Response:
+        last = self.quote("coinbase")
+        return self._answer("coinbase", {"open": f"{self.open_24h:.4f}", "last": f"{last:.4f}"})
+
+    async def bitstamp(self, request: web.Request) -> web.Response:
+        last = self.quote("bitstamp")
+        return self._answer("bitstamp", {"last": f"{last:.5f}", "open_24": f"{self.open_24h:.5f}"})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/api/v3/simple/price", self.coingecko)
+        app.router.add_get("/api/v3/ticker/24hr", self.binance)
+        app.router.add_get("/0/public/Ticker", self.kraken)
+        app.router.add_get("/products/XRP-USD/stats", self.coinbase)
+        app.router.add_get("/api/v2/ticker/xrpusd/", self.bitstamp)
+        return app
+
+    # ------------------------------------------------------------ running
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """Listen on `port` (0 picks a free one) in the running loop; returns the bound port"""
+        runner = web.AppRunner(self.app())
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        return site._server.sockets[0].getsockname()[1]
+
+    def start(self, host: str = "127.0.0.1") -> str:
+        """Serve on a free port from a daemon thread; returns its base URL"""
+        ready = threading.Event()
+        bound: List[Optional[int]] = [None]
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            bound[0] = loop.run_until_complete(self.serve(host))
+            ready.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, name="fake-prices", daemon=True).start()
+        ready.wait()
+        return f"http://{host}:{bound[0]}"
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake XRP price APIs for offline testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5010)
+    parser.add_argument("--price", type=float, default=2.5, help="Starting XRP/USD price")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered 503")
+    parser.add_argument("--per-minute", type=int, default=0,
+                        help="Requests per source and minute before answering 429 (0: unlimited)")
+    parser.add_argument("--down", nargs="*", default=[], help="Sources that always fail")
+    args = parser.parse_args()
+
+    fake = FakePrices(args.price, error_rate=args.error_rate, per_minute=args.per_minute,
+                      down=tuple(args.down))
+
+    async def run():
+        port = await fake.serve(args.host, args.port)
+        print(f"Serving http://{args.host}:{port}")
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+"""
+Local fake rippled for offline benchmarks
+JSON-RPC (ledger, account_info, account_tx, ledger_data, batch) and the `accounts`/`ledger`
+WebSocket streams, with a synthetic history of ledgers before it started for backfills
+
+    python fake_rippled.py --port 5005 --latency 0.02 --error-rate 0.01 --capacity 16
+    python fake_rippled.py --population 1000000     # a million-account ledger for richlist.py
+    XRP_RIPPLED_URLS=http://127.0.0.1:5005 XRP_RIPPLED_WS_URLS=ws://127.0.0.1:5005 streamlit run app.py
+"""
+
+import time
+import bisect
+import random
+import asyncio
+import hashlib
+import argparse
+import threading
+from aiohttp import web, WSMsgType
+from typing import Dict, List, Sequence, Set, Tuple
+from registry import B58_ALPHABET, Registry
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+GENESIS_LEDGER = 90_000_000
+RIPPLE_EPOCH = 946684800  # 2000-01-01T00:00:00Z, rippled's time origin
+MAX_FAKE_DROPS = 2 * 10**15  # Up to 2bn XRP per synthetic account
+EXTERNAL_SHARE = 0.5  # Share of payments with one side outside `accounts`
+EXTERNAL_ACCOUNTS = 1000  # Size of that outside world
+KEY_SPACE = 2 ** 256  # ledger_data keys
+
+
+def make_address(seed) -> str:
+    """Deterministic classic address (valid base58check) for a synthetic account"""
+    payload = b"\x00" + hashlib.sha256(str(seed).encode()).digest()[:20]
+    raw = payload + hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:4]
+    n = int.from_bytes(raw, "big")
+    encoded = ""
+    while n:
+        n, digit = divmod(n, 58)
+        encoded = B58_ALPHABET[digit] + encoded
+    leading_zeros = len(raw) - len(raw.lstrip(b"\x00"))
+    return B58_ALPHABET[0] * leading_zeros + encoded
+
+
+# ============================================================================
+# FAKE NODE
+# ============================================================================
+
+class FakeRippled:
+    """In-memory ledger answering rippled's JSON-RPC and WebSocket APIs
+
+    Every account exists with a balance derived from its address. Each
+    `ledger_interval` the ledger closes: `tx_per_ledger` payments move XRP
+    between subscribed accounts and are pushed to subscribers after a
+    ledgerClosed message, in the order rippled uses. Given `accounts`,
+    payments also run between those and outside accounts without any
+    subscriber, for account_tx. `latency` (+/- `jitter`) delays every HTTP
+    request and `error_rate` of them are answered with HTTP 503. With a `capacity`,
+    each node answers HTTP 429 to requests beyond that many in flight, like a
+    rate-limited public node. One instance can listen on several ports to
+    stand in for a cluster of nodes.
+
+    Ledgers before GENESIS_LEDGER make up a synthetic history: they closed
+    every `ledger_interval` before the node started, with balances derived
+    from the address and ledger.
+
+    For ledger_data, the state of every ledger holds `holders` plus
+    `population` synthetic accounts, spread evenly over the key space and
+    generated from their position, so a ledger of millions of accounts
+    costs no memory.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 ledger_interval: float = 3.5, tx_per_ledger: int = 0, batch: bool = True,
+                 seed: int = 0, capacity: int = 0, accounts: Sequence[str] = (),
+                 population: int = 0, holders: Sequence[str] = ()):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.ledger_interval = ledger_interval
+        self.tx_per_ledger = tx_per_ledger
+        self.batch = batch
+        self.capacity = capacity
+        self.accounts = list(accounts)
+        self.population = population
+        self._key_step = KEY_SPACE // max(1, population)
+        self._holders = sorted((int(hashlib.sha256(address.encode()).hexdigest(), 16), address)
+                               for address in set(holders))
+        self.rng = random.Random(seed)
+        self.ledger_index = GENESIS_LEDGER
+        self.genesis_close = int(time.time()) - RIPPLE_EPOCH
+        self.drops: Dict[str, int] = {}
+        self.tx_log: Dict[str, List[Dict]] = {}  # Address -> its payments, oldest first
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self._in_flight: Dict[int, int] = {}  # Local port -> requests being served
+        self._sockets: List[Tuple[web.WebSocketResponse, Set[str]]] = []
+        self._loop = None
+
+    # ------------------------------------------------------------ ledger
+
+    def balance(self, address: str) -> int:
+        if address not in self.drops:
+            digest = hashlib.sha256(address.encode()).digest()
+            self.drops[address] = int.from_bytes(digest[:8], "big") % MAX_FAKE_DROPS
+        return self.drops[address]
+
+    def past_balance(self, address: str, ledger_index: int) -> int:
+        """Balance in the synthetic history, changing every 1000 ledgers"""
+        digest = hashlib.sha256(f"{address}:{ledger_index // 1000}".encode()).digest()
+        return int.from_bytes(digest[:8], "big") % MAX_FAKE_DROPS
+
+    def synthetic_account(self, position: int) -> Tuple[int, str, int]:
+        """(key, address, drops) of the synthetic account at `position`; a few are whales"""
+        digest = hashlib.sha256(f"holder{position}".encode()).digest()
+        share = int.from_bytes(digest[:8], "big") / 2 ** 64
+        drops = int(10 ** (1 + 8 * share ** 6)) * 1_000_000  # 10 XRP to 1bn XRP
+        return position * self._key_step + self._key_step // 2, make_address(f"holder{position}"), drops
+
+    def _close_time(self, ledger_index=None) -> int:
+        if isinstance(ledger_index, int) and ledger_index < self.ledger_index:
+            return self.genesis_close + int((ledger_index - GENESIS_LEDGER) * self.ledger_interval)
+        return int(time.time()) - RIPPLE_EPOCH
+
+    def call(self, request: Dict) -> Dict:
+        """Answer one JSON-RPC call as {"result": ...}"""
+        method = request.get("method")
+        params = (request.get("params") or [{}])[0]
+        if method == "ledger":
+            ledger_index = params.get("ledger_index")
+            if not isinstance(ledger_index, int):
+                ledger_index = self.ledger_index
+            if not 1 <= ledger_index <= self.ledger_index:
+                return {"result": {"error": "lgrNotFound", "status": "error", "request": params}}
+            return {"result": {"ledger_index": ledger_index, "validated": True,
+                               "ledger": {"ledger_index": str(ledger_index),
+                                          "close_time": self._close_time(ledger_index), "closed": True},
+                               "status": "success"}}
+        if method == "account_info":
+            address = params.get("account", "")
+            if not address.startswith("r"):
+                return {"result": {"error": "actMalformed", "status": "error", "request": params}}
+            ledger_index = params.get("ledger_index")
+            if not isinstance(ledger_index, int):
+                ledger_index = self.ledger_index
+            if ledger_index < GENESIS_LEDGER:
+                balance = self.past_balance(address, ledger_index)
+            else:
+                balance = self.balance(address)
+            return {"result": {"account_data": {"Account": address, "Balance": str(balance)},
+                               "ledger_index": ledger_index, "validated": True,
+                               "status": "success"}}
+        if method == "account_tx":
+            return self._account_tx(params)
+        if method == "ledger_data":
+            return self._ledger_data(params)
+        return {"result": {"error": "unknownCmd", "status": "error", "request": params}}
+
+    def _account_tx(self, params: Dict) -> Dict:
+        """Forward-ordered pages of an account's payments; the marker is a log position"""
+        log = self.tx_log.get(params.get("account"), [])
+        low = params.get("ledger_index_min", -1)
+        high = params.get("ledger_index_max", -1)
+        low = 1 if low in (None, -1) else low
+        high = self.ledger_index if high in (None, -1) else high
+        position = (params.get("marker") or {}).get("seq", 0)
+        limit = params.get("limit") or 200
+        page = []
+        while position < len(log) and len(page) < limit:
+            entry = log[position]
+            position += 1
+            if low <= entry["tx"]["ledger_index"] <= high:
+                page.append(entry)
+        result = {"account": params.get("account"), "ledger_index_min": low,
+                  "ledger_index_max": high, "limit": limit, "transactions": page,
+                  "validated": True, "status": "success"}
+        if any(low <= entry["tx"]["ledger_index"] <= high for entry in log[position:]):
+            result["marker"] = {"ledger": log[position]["tx"]["ledger_index"], "seq": position}
+        return {"result": result}
+
+    def _ledger_data(self, params: Dict) -> Dict:
+        """Pages of AccountRoot objects in key order; the marker is the last key returned"""
+        ledger_index = params.get("ledger_index")
+        if not isinstance(ledger_index, int):
+            ledger_index = self.ledger_index
+        if not 1 <= ledger_index <= self.ledger_index:
+            return {"result": {"error": "lgrNotFound", "status": "error", "request": params}}
+        after = int(params["marker"], 16) if params.get("marker") else -1
+        limit = params.get("limit") or 256
+        position = 0 if after < self._key_step // 2 else (after - self._key_step // 2) // self._key_step + 1
+        holder = bisect.bisect_right(self._holders, (after, "~"))
+        state = []
+        while len(state) < limit and (position < self.population or holder < len(self._holders)):
+            synthetic = self.synthetic_account(position) if position < self.population else None
+            if holder < len(self._holders) and (synthetic is None or self._holders[holder][0] < synthetic[0]):
+                key, address = self._holders[holder]
+                holder += 1
+                drops = (self.past_balance(address, ledger_index) if ledger_index < GENESIS_LEDGER
+                         else self.balance(address))
+            else:
+                key, address, drops = synthetic
+                position += 1
+            state.append({"LedgerEntryType": "AccountRoot", "Account": address, "Balance": str(drops),
+                          "Flags": 0, "index": f"{key:064X}"})
+        result = {"ledger_index": ledger_index, "state": state, "validated": True, "status": "success"}
+        if state and (position < self.population or holder < len(self._holders)):
+            result["marker"] = state[-1]["index"]
+        return {"result": result}
+
+    def _payment(self, source: str, destination: str) -> Dict:
+        before_src, before_dst = self.balance(source), self.balance(destination)
+        amount = self.rng.randint(1, max(1, before_src // 10))
+        fee = 12
+        self.drops[source] = before_src - amount - fee
+        self.drops[destination] = before_dst + amount
+        transaction = {"TransactionType": "Payment", "Account": source,
+                       "Destination": destination, "Amount": str(amount), "Fee": str(fee),
+                       "hash": hashlib.sha256(f"{self.ledger_index}{source}{destination}{amount}"
+                                              .encode()).hexdigest().upper()}
+        message = {
+            "type": "transaction", "validated": True, "ledger_index": self.ledger_index,
+            "engine_result": "tesSUCCESS",
+            "transaction": transaction,
+            "meta": {"TransactionResult": "tesSUCCESS", "delivered_amount": str(amount), "AffectedNodes": [
+                {"ModifiedNode": {"LedgerEntryType": "AccountRoot",
+                                  "FinalFields": {"Account": source, "Balance": str(self.drops[source])},
+                                  "PreviousFields": {"Balance": str(before_src)}}},
+                {"ModifiedNode": {"LedgerEntryType": "AccountRoot",
+                                  "FinalFields": {"Account": destination,
+                                                  "Balance": str(self.drops[destination])},
+                                  "PreviousFields": {"Balance": str(before_dst)}}},
+            ]},
+        }
+        entry = {"tx": dict(transaction, ledger_index=self.ledger_index, date=self._close_time()),
+                 "meta": message["meta"], "validated": True}
+        for address in {source, destination}:
+            self.tx_log.setdefault(address, []).append(entry)
+        return message
+
+    async def _close_ledgers(self):
+        while True:
+            await asyncio.sleep(self.ledger_interval)
+            self.ledger_index += 1
+            subscribed = sorted(set(self.accounts).union(*(accounts for _, accounts in self._sockets)))
+            messages = []
+            if len(subscribed) >= 2:
+                for _ in range(self.tx_per_ledger):
+                    source, destination = self.rng.sample(subscribed, 2)
+                    if self.accounts and self.rng.random() < EXTERNAL_SHARE:
+                        outside = make_address(f"external{self.rng.randrange(EXTERNAL_ACCOUNTS)}")
+                        source, destination = ((outside, destination) if self.rng.random() < 0.5
+                                               else (source, outside))
+                    messages.append(self._payment(source, destination))
+            closed = {"type": "ledgerClosed", "ledger_index": self.ledger_index,
+                      "ledger_time": self._close_time(), "txn_count": len(messages)}
+            for ws, accounts in list(self._sockets):
+                try:  # Like rippled: ledgerClosed first, then the ledger's transactions
+                    await ws.send_json(closed)
+                    for message in messages:
+                        if message["transaction"]["Account"] in accounts \
+                                or message["transaction"]["Destination"] in accounts:
+                            await ws.send_json(message)
+                except ConnectionError:
+                    pass
+
+    # ------------------------------------------------------------ handlers
+
+    async def _delay(self):
+        delay = self.latency + self.rng.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def handle_rpc(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        self.requests += 1
+        port = request.transport.get_extra_info("sockname")[1]
+        if self.capacity and self._in_flight.get(port, 0) >= self.capacity:
+            self.throttled += 1
+            return web.Response(status=429, text="Too many requests")
+        self._in_flight[port] = self._in_flight.get(port, 0) + 1
+        try:
+            await self._delay()
+        finally:
+            self._in_flight[port] -= 1
+        if self.rng.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=503, text="Server is overloaded")
+        if body.get("method") == "batch":
+            if not self.batch:
+                return web.json_response(self.call({"method": "batch"}))
+            return web.json_response([self.call(call) for call in body.get("params", [])])
+        return web.json_response(self.call(body))
+
+    async def handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        accounts: Set[str] = set()
+        entry = (ws, accounts)
+        self._sockets.append(entry)
+        try:
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    break
+                data = message.json()
+                if data.get("command") == "subscribe":
+                    accounts.update(data.get("accounts", []))
+                    await ws.send_json({"id": data.get("id"), "type": "response",
+                                        "status": "success", "result": {}})
+                else:
+                    await ws.send_json(dict(self.call({"method": data.get("command"),
+                                                       "params": [data]}),
+                                            id=data.get("id"), type="response"))
+        finally:
+            self._sockets.remove(entry)
+        return ws
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/", self.handle_rpc)
+        app.router.add_get("/", self.handle_ws)
+        return app
+
+    # ------------------------------------------------------------ running
+
+    async def serve(self, host: str = "127.0.0.1", ports: Tuple[int, ...] = (0,)) -> List[int]:
+        """Listen on `ports` (0 picks a free one) in the running loop; returns the bound ports"""
+        runner = web.AppRunner(self.app())
+        await runner.setup()
+        bound = []
+        for port in ports:
+            site = web.TCPSite(runner, host, port)
+            await site.start()
+            bound.append(site._server.sockets[0].getsockname()[1])
+        asyncio.get_running_loop().create_task(self._close_ledgers())
+        return bound
+
+    def start(self, nodes: int = 1, host: str = "127.0.0.1") -> Tuple[List[str], List[str]]:
+        """Serve on `nodes` free ports from a daemon thread; returns (http URLs, ws URLs)"""
+        ready = threading.Event()
+        bound: List[int] = []
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            bound.extend(self._loop.run_until_complete(self.serve(host, (0,) * nodes)))
+            ready.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=run, name="fake-rippled", daemon=True).start()
+        ready.wait()
+        return ([f"http://{host}:{port}" for port in bound],
+                [f"ws://{host}:{port}" for port in bound])
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake rippled for offline testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, nargs="+", default=[5005],
+                        help="One port per simulated node")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to each request")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered 503")
+    parser.add_argument("--ledger-interval", type=float, default=3.5)
+    parser.add_argument("--tx-per-ledger", type=int, default=5)
+    parser.add_argument("--no-batch", action="store_true", help="Reject the batch method")
+    parser.add_argument("--capacity", type=int, default=0,
+                        help="Requests in flight per node before answering 429 (0: unlimited)")
+    parser.add_argument("--flows", action="store_true",
+                        help="Let the registry's wallets pay each other and outside accounts (account_tx)")
+    parser.add_argument("--population", type=int, default=0,
+                        help="Synthetic accounts in the ledger state next to the registry's (ledger_data)")
+    args = parser.parse_args()
+
+    fake = FakeRippled(args.latency, args.jitter, args.error_rate, args.ledger_interval,
+                       args.tx_per_ledger, batch=not args.no_batch, capacity=args.capacity,
+                       accounts=Registry.from_file().addresses if args.flows else (),
+                       population=args.population,
+                       holders=Registry.from_file().addresses if args.population else ())
+
+    async def run():
+        ports = await fake.serve(args.host, tuple(args.port))
+        print("Serving", ", ".join(f"http://{args.host}:{port}" for port in ports))
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+Exchange inflows and outflows
+Incremental account_tx paging per tracked wallet, payment classification and hourly net flows
+
+    python flows.py                  # read every wallet's new transactions once
+    python flows.py --follow         # keep reading every FLOW_INTERVAL seconds
+"""
+
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+import pandas as pd
+from history import HISTORY_DB
+from holdings import REGISTRY
+from metrics import metrics
+from registry import Registry
+from rippled import (ACCOUNT_ERRORS, DROPS_PER_XRP, RIPPLE_EPOCH, RippledError,
+                     get_validated_ledger_index, rpc)
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+PAGE_SIZE = 400  # Transactions per account_tx page (public nodes cap it there)
+FIRST_LOOKBACK = 22_000  # Ledgers read back on a wallet's first run (~1 day)
+FLOW_WORKERS = 16  # Wallets paged at once; requests still wait for endpoint slots
+FLOW_INTERVAL = 300  # Seconds between passes with --follow
+
+INTERNAL, INTER_EXCHANGE, EXTERNAL = "internal", "inter_exchange", "external"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS flow_cursors (
+    address TEXT PRIMARY KEY,
+    next_ledger INTEGER NOT NULL,
+    range_max INTEGER,
+    marker TEXT
+);
+CREATE TABLE IF NOT EXISTS transfers (
+    hash TEXT PRIMARY KEY,
+    ledger_index INTEGER NOT NULL,
+    close_time REAL NOT NULL,
+    source TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    source_exchange TEXT,
+    destination_exchange TEXT,
+    kind TEXT NOT NULL,
+    drops INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_transfers_close_time ON transfers(close_time);
+"""
+
+
+# ============================================================================
+# CLASSIFICATION
+# ============================================================================
+
+def classify(source_exchange: Optional[str], destination_exchange: Optional[str]) -> str:
+    """internal (same exchange), inter_exchange (two tracked exchanges) or external"""
+    if source_exchange is not None and destination_exchange is not None:
+        return INTERNAL if source_exchange == destination_exchange else INTER_EXCHANGE
+    return EXTERNAL
+
+
+def parse_transfer(entry: Dict, registry: Registry) -> Optional[Dict]:
+    """The XRP moved by one account_tx entry, None for anything but a successful XRP payment
+
+    Uses the delivered amount, so partial payments count what actually
+    arrived. Handles both the API v1 ("tx") and v2 ("tx_json") layouts.
+    """
+    tx = entry.get("tx_json") or entry.get("tx") or {}
+    meta = entry.get("meta") or {}
+    if tx.get("TransactionType") != "Payment" or meta.get("TransactionResult") != "tesSUCCESS":
+        return None
+    delivered = meta.get("delivered_amount", meta.get("DeliveredAmount", tx.get("Amount")))
+    if not isinstance(delivered, str) or not delivered.isdigit():
+        return None  # Issued currency, or "unavailable" on very old ledgers
+    source, destination = tx.get("Account"), tx.get("Destination")
+    source_exchange, destination_exchange = registry.exchange_of(source), registry.exchange_of(destination)
+    if source_exchange is None and destination_exchange is None:
+        return None
+    return {
+        "hash": entry.get("hash") or tx.get("hash"),
+        "ledger_index": int(entry.get("ledger_index") or tx.get("ledger_index")),
+        "close_time": int(tx.get("date", 0)) + RIPPLE_EPOCH,
+        "source": source,
+        "destination": destination,
+        "source_exchange": source_exchange,
+        "destination_exchange": destination_exchange,
+        "kind": classify(source_exchange, destination_exchange),
+        "drops": int(delivered),
+    }
+
+
+# ============================================================================
+# STORE
+# ============================================================================
+
+class FlowStore:
+    """Classified transfers and per-wallet account_tx cursors, next to the balance history
+
+    A transfer between two tracked wallets shows up in both wallets'
+    transactions; the hash key stores it once.
+    """
+
+    def __init__(self, path: str = HISTORY_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def cursor(self, address: str) -> Optional[Dict]:
+        """{"next_ledger", "range_max", "marker"} of a wallet, None before its first page"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT next_ledger, range_max, marker FROM flow_cursors WHERE address = ?",
+                (address,)).fetchone()
+        if row is None:
+            return None
+        return {"next_ledger": row[0], "range_max": row[1],
+                "marker": json.loads(row[2]) if row[2] else None}
+
+    def save_page(self, address: str, transfers: List[Dict], next_ledger: int,
+                  range_max: Optional[int] = None, marker=None) -> int:
+        """Store one page's transfers and move the wallet's cursor past it, atomically
+
+        Returns how many transfers were new.
+        """
+        with self._lock, self._conn:
+            inserted = self._conn.executemany(
+                "INSERT OR IGNORE INTO transfers(hash, ledger_index, close_time, source, destination, "
+                "source_exchange, destination_exchange, kind, drops) "
+                "VALUES (:hash, :ledger_index, :close_time, :source, :destination, "
+                ":source_exchange, :destination_exchange, :kind, :drops)", transfers)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO flow_cursors(address, next_ledger, range_max, marker) "
+                "VALUES (?, ?, ?, ?)",
+                (address, next_ledger, range_max, json.dumps(marker) if marker else None))
+        return inserted.rowcount
+
+    def latest_close_time(self) -> Optional[float]:
+        """Close time of the newest stored transfer, None before the first"""
+        with self._lock:
+            return self._conn.execute("SELECT MAX(close_time) FROM transfers").fetchone()[0]
+
+    def hourly_flows(self, start: datetime, end: datetime) -> pd.DataFrame:
+        """Drops moved per (hour, exchange) between `start` and `end`
+
+        Columns: hour, exchange, external_in/_out, inter_exchange_in/_out,
+        internal (moved between the exchange's own wallets) and net
+        (everything in minus everything out; internal moves cancel out).
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT CAST(close_time / 3600 AS INTEGER) * 3600, destination_exchange, kind, 'in', SUM(drops) "
+                "FROM transfers WHERE close_time BETWEEN ? AND ? AND destination_exchange IS NOT NULL "
+                "GROUP BY 1, 2, 3 "
+                "UNION ALL "
+                "SELECT CAST(close_time / 3600 AS INTEGER) * 3600, source_exchange, kind, 'out', SUM(drops) "
+                "FROM transfers WHERE close_time BETWEEN ? AND ? AND source_exchange IS NOT NULL "
+                "GROUP BY 1, 2, 3",
+                (start.timestamp(), end.timestamp()) * 2).fetchall()
+        columns = [f"{kind}_{direction}" for kind in (EXTERNAL, INTER_EXCHANGE) for direction in ("in", "out")]
+        if not rows:
+            return pd.DataFrame(columns=["hour", "exchange", *columns, INTERNAL, "net"])
+        long = pd.DataFrame(rows, columns=["hour", "exchange", "kind", "direction", "drops"])
+        long["column"] = long["kind"] + "_" + long["direction"]
+        flows = long.pivot_table(index=["hour", "exchange"], columns="column", values="drops",
+                                 aggfunc="sum", fill_value=0)
+        flows = flows.reindex(columns=columns + [f"{INTERNAL}_in"], fill_value=0).astype("int64")
+        flows = flows.rename(columns={f"{INTERNAL}_in": INTERNAL})
+        flows["net"] = flows[f"{EXTERNAL}_in"] + flows[f"{INTER_EXCHANGE}_in"] \
+            - flows[f"{EXTERNAL}_out"] - flows[f"{INTER_EXCHANGE}_out"]
+        flows = flows.reset_index()
+        flows["hour"] = pd.to_datetime(flows["hour"], unit="s", utc=True)
+        return flows.rename_axis(columns=None)
+
+
+def net_flows(flows: pd.DataFrame) -> pd.DataFrame:
+    """Hourly flows summed per exchange, in XRP, largest net inflow first"""
+    totals = flows.drop(columns="hour").groupby("exchange").sum()
+    totals = totals / DROPS_PER_XRP
+    return totals.sort_values("net", ascending=False).reset_index()
+
+
+# ============================================================================
+# PAGING
+# ============================================================================
+
+def sync_account(store: FlowStore, address: str, validated: int,
+                 registry: Registry = REGISTRY) -> Dict:
+    """Read one wallet's transactions since its cursor, up to `validated`
+
+    A cursor is saved with every page, so an interrupted wallet resumes
+    from its last page on the next run. A wallet seen for the first time
+    starts FIRST_LOOKBACK ledgers back instead of at its full history.
+    """
+    cursor = store.cursor(address) or {"next_ledger": max(1, validated - FIRST_LOOKBACK),
+                                       "range_max": None, "marker": None}
+    low, marker = cursor["next_ledger"], cursor["marker"]
+    high = cursor["range_max"] if marker else validated  # A marker only holds within its range
+    result = {"address": address, "pages": 0, "transfers": 0}
+    if low > high:
+        return result
+    while True:
+        params = {"account": address, "ledger_index_min": low, "ledger_index_max": high,
+                  "forward": True, "limit": PAGE_SIZE}
+        if marker:
+            params["marker"] = marker
+        page = rpc({"method": "account_tx", "params": [params]})
+        if page.get("error") in ACCOUNT_ERRORS:  # Not funded yet: nothing to read
+            store.save_page(address, [], high + 1)
+            return result
+        if page.get("error"):
+            raise RippledError(f"account_tx for {address}: {page['error']}")
+        transfers = [t for t in (parse_transfer(entry, registry) for entry in page.get("transactions", []))
+                     if t is not None]
+        marker = page.get("marker")
+        if marker:
+            result["transfers"] += store.save_page(address, transfers, low, high, marker)
+        else:
+            result["transfers"] += store.save_page(address, transfers, high + 1)
+        result["pages"] += 1
+        metrics.inc("flow_pages_total")
+        for transfer in transfers:
+            metrics.inc("flow_transfers_total", kind=transfer["kind"])
+        if not marker:
+            return result
+
+
+def sync_flows(store: FlowStore, registry: Registry = REGISTRY,
+               workers: int = FLOW_WORKERS) -> Dict:
+    """One incremental pass over every tracked wallet; returns pages, transfers and failures"""
+    validated = get_validated_ledger_index()
+    if validated is None:
+        raise RippledError("No node reported a validated ledger")
+    totals = {"ledger_index": validated, "accounts": len(registry.addresses),
+              "pages": 0, "transfers": 0, "failed": 0}
+
+    def run(address: str) -> Optional[Dict]:
+        try:
+            return sync_account(store, address, validated, registry)
+        except Exception as e:
+            logger.warning("Reading transactions of %s failed: %s", address, e)
+            return None
+
+    with metrics.timed("phase_seconds", phase="flows"):
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="flows") as executor:
+            for result in executor.map(run, registry.addresses):
+                if result is None:
+                    totals["failed"] += 1
+                else:
+                    totals["pages"] += result["pages"]
+                    totals["transfers"] += result["transfers"]
+    return totals
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Track XRP flows into and out of exchange wallets")
+    parser.add_argument("--follow", action="store_true", help="Keep reading new transactions")
+    parser.add_argument("--interval", type=float, default=FLOW_INTERVAL)
+    parser.add_argument("--workers", type=int, default=FLOW_WORKERS)
+    parser.add_argument("--hours", type=int, default=24, help="Net flow window to print")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    store = FlowStore()
+    while True:
+        started = time.monotonic()
+        try:
+            totals = sync_flows(store, workers=args.workers)
+        except RippledError as e:
+            logger.warning("Flow pass failed: %s", e)
+        else:
+            logger.info("Read up to ledger #%s: %d pages, %d new transfers, %d wallets failed",
+                        f"{totals['ledger_index']:,}", totals["pages"], totals["transfers"], totals["failed"])
+            end = datetime.now(timezone.utc)
+            flows = store.hourly_flows(end - timedelta(hours=args.hours), end)
+            if len(flows):
+                print(net_flows(flows).to_string(index=False, float_format=lambda x: f"{x:,.0f}"))
+        if not args.follow:
+            return
+        time.sleep(max(1.0, args.interval - (time.monotonic() - started)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Persistent balance history
+SQLite store of balance snapshots keyed by ledger index and timestamp, plus the XRP/USD price over time
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+from rippled import DROPS_PER_XRP
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+HISTORY_DB = os.environ.get("XRP_HISTORY_DB", "xrp_history.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    id INTEGER PRIMARY KEY,
+    address TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    ledger_index INTEGER UNIQUE,
+    taken_at REAL NOT NULL,
+    label TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_taken_at ON snapshots(taken_at);
+CREATE TABLE IF NOT EXISTS balances (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots(id),
+    account_id INTEGER NOT NULL REFERENCES accounts(id),
+    drops INTEGER NOT NULL,
+    PRIMARY KEY (snapshot_id, account_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_balances_account ON balances(account_id, snapshot_id);
+CREATE TABLE IF NOT EXISTS prices (
+    taken_at REAL PRIMARY KEY,
+    usd REAL NOT NULL,
+    change_24h REAL,
+    sources TEXT
+);
+"""
+
+
+def to_drops(xrp: float) -> int:
+    return int(round(xrp * DROPS_PER_XRP))
+
+
+def _snapshot_row(row) -> Dict:
+    return {"id": row[0], "ledger_index": row[1], "taken_at": row[2], "label": row[3]}
+
+
+def _price_row(row) -> Dict:
+    return {"taken_at": row[0], "price": row[1], "change_24h": row[2],
+            "sources": json.loads(row[3]) if row[3] else {}}
+
+
+# ============================================================================
+# STORE
+# ============================================================================
+
+class HistoryStore:
+    """Append-only store of balance snapshots
+
+    Balances are kept as integer drops, one row per (snapshot, account), with
+    addresses interned in their own table. Snapshot lookups by time or ledger
+    index go through indexes, so the store can grow to years of 5-minute
+    snapshots without slowing the dashboard.
+    """
+
+    def __init__(self, path: str = HISTORY_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def _account_ids(self, addresses: List[str]) -> Dict[str, int]:
+        self._conn.executemany("INSERT OR IGNORE INTO accounts(address) VALUES (?)",
+                               [(addr,) for addr in addresses])
+        ids = {}
+        for start in range(0, len(addresses), 500):
+            chunk = addresses[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            ids.update(self._conn.execute(
+                f"SELECT address, id FROM accounts WHERE address IN ({marks})", chunk))
+        return ids
+
+    def record_snapshot(self, balances: Dict[str, float], ledger_index: Optional[int] = None,
+                        taken_at: Optional[datetime] = None, label: Optional[str] = None) -> int:
+        """Store {address: XRP balance}; returns the snapshot id"""
+        return self.record_drops({addr: to_drops(xrp) for addr, xrp in balances.items()},
+                                 ledger_index, taken_at, label)
+
+    def record_drops(self, drops: Dict[str, int], ledger_index: Optional[int] = None,
+                     taken_at: Optional[datetime] = None, label: Optional[str] = None) -> int:
+        """Store {address: drops}; returns the snapshot id
+
+        A snapshot for a ledger index that is already stored is not written
+        twice: only accounts it does not hold yet are added to it, and its
+        id is returned.
+        """
+        taken_at = taken_at or datetime.now(timezone.utc)
+        with self._lock, self._conn:
+            row = None
+            if ledger_index is not None:
+                row = self._conn.execute("SELECT id FROM snapshots WHERE ledger_index = ?",
+                                         (ledger_index,)).fetchone()
+            if row:
+                snapshot_id = row[0]
+            else:
+                cursor = self._conn.execute(
+                    "INSERT INTO snapshots(ledger_index, taken_at, label) VALUES (?, ?, ?)",
+                    (ledger_index, taken_at.timestamp(), label))
+                snapshot_id = cursor.lastrowid
+            ids = self._account_ids(list(drops))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO balances(snapshot_id, account_id, drops) VALUES (?, ?, ?)",
+                [(snapshot_id, ids[addr], amount) for addr, amount in drops.items()])
+        return snapshot_id
+
+    def ensure_snapshot(self, label: str, balances: Dict[str, float],
+                        taken_at: datetime, ledger_index: Optional[int] = None) -> int:
+        """Store a labelled benchmark snapshot once; returns its id"""
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM snapshots WHERE label = ?",
+                                     (label,)).fetchone()
+        if row:
+            return row[0]
+        return self.record_snapshot(balances, ledger_index, taken_at, label)
+
+    def list_snapshots(self, limit: int = 100) -> List[Dict]:
+        """Most recent snapshots first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, ledger_index, taken_at, label FROM snapshots "
+                "ORDER BY taken_at DESC LIMIT ?", (limit,)).fetchall()
+        return [_snapshot_row(row) for row in rows]
+
+    def get_snapshot(self, snapshot_id: int) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, ledger_index, taken_at, label FROM snapshots WHERE id = ?",
+                (snapshot_id,)).fetchone()
+        return _snapshot_row(row) if row else None
+
+    def snapshot_for_ledger(self, ledger_index: int) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, ledger_index, taken_at, label FROM snapshots WHERE ledger_index = ?",
+                (ledger_index,)).fetchone()
+        return _snapshot_row(row) if row else None
+
+    def snapshot_at(self, when: datetime) -> Optional[Dict]:
+        """Latest snapshot taken at or before `when`"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, ledger_index, taken_at, label FROM snapshots "
+                "WHERE taken_at <= ? ORDER BY taken_at DESC LIMIT 1",
+                (when.timestamp(),)).fetchone()
+        return _snapshot_row(row) if row else None
+
+    def get_balances(self, snapshot_id: int) -> Dict[str, float]:
+        """{address: XRP balance} for one snapshot"""
+        return {address: drops / DROPS_PER_XRP for address, drops in self.get_drops(snapshot_id).items()}
+
+    def get_drops(self, snapshot_id: int) -> Dict[str, int]:
+        """{address: drops} for one snapshot"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT a.address, b.drops FROM balances b JOIN accounts a ON a.id = b.account_id "
+                "WHERE b.snapshot_id = ?", (snapshot_id,)).fetchall()
+        return dict(rows)
+
+    def latest_balances(self) -> Dict[str, Tuple[int, float]]:
+        """{address: (drops, taken_at)} from each account's newest snapshot"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT a.address, b.drops, MAX(s.taken_at) FROM balances b "
+                "JOIN accounts a ON a.id = b.account_id JOIN snapshots s ON s.id = b.snapshot_id "
+                "GROUP BY b.account_id").fetchall()
+        return {address: (drops, taken_at) for address, drops, taken_at in rows}
+
+    def iter_balances(self, start: datetime, end: datetime,
+                      chunk_rows: int = 50_000) -> Iterator[List[Tuple[float, Optional[int], str, int]]]:
+        """(taken_at, ledger_index, address, drops) rows taken in [start, end], in chunks
+
+        Pages by keyset and takes the lock once per chunk, so a long export
+        neither holds the whole range in memory nor blocks new snapshots.
+        """
+        last = (start.timestamp(), -1, -1)  # Row ids start at 1, so rows at `start` are included
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT s.taken_at, s.id, b.account_id, s.ledger_index, a.address, b.drops "
+                    "FROM snapshots s JOIN balances b ON b.snapshot_id = s.id "
+                    "JOIN accounts a ON a.id = b.account_id "
+                    "WHERE s.taken_at BETWEEN ? AND ? AND (s.taken_at, s.id, b.account_id) > (?, ?, ?) "
+                    "ORDER BY s.taken_at, s.id, b.account_id LIMIT ?",
+                    (last[0], end.timestamp(), *last, chunk_rows)).fetchall()
+            if not rows:
+                return
+            yield [(taken_at, ledger_index, address, drops)
+                   for taken_at, _, _, ledger_index, address, drops in rows]
+            last = rows[-1][:3]
+
+    def account_history(self, address: str) -> List[Dict]:
+        """Balance of one address across every snapshot, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT s.taken_at, s.ledger_index, b.drops FROM balances b "
+                "JOIN accounts a ON a.id = b.account_id JOIN snapshots s ON s.id = b.snapshot_id "
+                "WHERE a.address = ? ORDER BY s.taken_at", (address,)).fetchall()
+        return [{"taken_at": taken_at, "ledger_index": ledger_index, "balance": drops / DROPS_PER_XRP}
+                for taken_at, ledger_index, drops in rows]
+
+    # ------------------------------------------------------------------ prices
+
+    def record_price(self, price: Dict, taken_at: Optional[float] = None):
+        """Store one aggregated price ({"price", "change_24h", "sources"}) at Unix time `taken_at`"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO prices(taken_at, usd, change_24h, sources) VALUES (?, ?, ?, ?)",
+                (taken_at or datetime.now(timezone.utc).timestamp(), price["price"],
+                 price.get("change_24h"), json.dumps(dict(price.get("sources") or {}))))
+
+    def latest_price(self) -> Optional[Dict]:
+        """Newest stored price with its `taken_at`, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT taken_at, usd, change_24h, sources FROM prices "
+                "ORDER BY taken_at DESC LIMIT 1").fetchone()
+        return _price_row(row) if row else None
+
+    def price_at(self, when: datetime, max_age: float) -> Optional[float]:
+        """USD price stored at or at most `max_age` seconds before `when`"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT usd FROM prices WHERE taken_at BETWEEN ? AND ? "
+                "ORDER BY taken_at DESC LIMIT 1",
+                (when.timestamp() - max_age, when.timestamp())).fetchone()
+        return row[0] if row else None
+
+    def price_history(self, start: datetime, end: datetime) -> List[Dict]:
+        """Stored prices taken in [start, end], oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT taken_at, usd, change_24h, sources FROM prices "
+                "WHERE taken_at BETWEEN ? AND ? ORDER BY taken_at",
+                (start.timestamp(), end.timestamp())).fetchall()
+        return [_price_row(row) for row in rows]
+
+
+def snapshot_label(snapshot: Dict) -> str:
+    """Human readable name of a snapshot"""
+    if snapshot.get("label"):
+        return snapshot["label"]
+    when = datetime.fromtimestamp(snapshot["taken_at"], timezone.utc)
+    text = when.strftime("%b %d, %Y %H:%M UTC")
+    if snapshot.get("ledger_index"):
+        text += f" (ledger #{snapshot['ledger_index']:,})"
+    return text
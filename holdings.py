@@ -0,0 +1,199 @@
+"""
+Exchange wallet registry and balance aggregation
+Streamlit-free so the dashboard, the background collector and scripts share it
+"""
+
+import numpy as np
+import pandas as pd
+from datetime import datetime, time as dt_time, timezone
+from typing import Dict, Mapping, Optional, Tuple
+from history import HISTORY_DB, HistoryStore
+from metrics import metrics
+from registry import Registry
+from rippled import DROPS_PER_XRP, FETCH_MODE, fetch_balances, get_ledger
+from stream import BalanceStream
+from wallets import WalletTable
+
+# ============================================================================
+# HISTORICAL DATA - February 24, 2025 Benchmark
+# ============================================================================
+
+HISTORICAL_BALANCES_20250224 = {
+    "r38a3PtqW3M7LRESgaR4dyHjg3AxAmiZCt": 500000022.920354,
+    "r4G689g4KePYLKkyyumM1iUppTP4nhZwVC": 500000023.954709,
+    "rDxJNbV23mu9xsWoQHoBqZQvc77YcbJXwb": 980472688.335846,
+    "rHHQeqjz2QyNj1DVoAbcvfaKLv7RxpHMNE": 427.863089,
+    "rJWbw1u3oDDRcYLFqiWFjhGWRKVcBAWdgp": 500000022.940415,
+    "rJo4m69u9Wd1F8fN2RbgAsJEF6a4hW1nSi": 500000022.974330,
+    "rLgn612WAgRoZ285YmsQ4t7kb8Ui3csdoU": 500000022.970497,
+    "rMNUAfSz2spLEbaBwPnGtxTzZCajJifnzH": 500000022.930304,
+    "rNcAdhSLXBrJ3aZUq22HaNtNEPpB5fR8Ri": 500000070.927547,
+    "raQwCVAJVqjrVm1Nj5SFRcX8i22BhdC9WA": 5380330.943804,
+    "rfL1mn4VTCoHdhHhHMwqpShCFUaDBRk6Z5": 500000113.144652,
+    "rs48xReB6gjKtTnTfii93iwUhjhTJsW78B": 500000022.951598,
+    "rwa7YXssGVAL9yPKw6QJtCen2UqZbRQqpM": 500000111.032735,
+    "r3ZVNKgkkT3A7hbEZ8HxnNnLDCCmZiZECV": 4319156.176484,
+    "rEb8TK3gBgk5auZkwc6sHnwrGVJH8DuaLh": 7375.223257,
+    "rEeEWeP88cpKUddKk37B2EZeiHBGiBXY3": 122.800031,
+    "rMvYS27SYs5dXdFsUgpvv1CSrPsCz7ePF5": 219728.667554,
+    "rNU4eAowPuixS5ZCWaRL72UUeKgxcKExpK": 6152514.319652,
+    "rNxp4h8apvRis6mJf9Sh8C6iRxfrDWN7AV": 268204.837425,
+    "rPCpZwPKogNodbjRxGDnefVXu9Q9R4PN4Q": 593.363378,
+    "rPJ5GFpyDLv7gqeB1uZVUBwDwi41kaXN5A": 109917943.727643,
+    "rPz2qA93PeRCyHyFCqyNggnyycJR1N4iNf": 661827727.919798,
+    "rhWj9gaovwu2hZxYW7p388P8GRbuXFLQkK": 4831865.223177,
+    "rGZjPjMkfhAqmc1ssEiT753uAgyftHRo2m": 20.251542,
+    "rLHzPsX6oXkzU2qL12kHCH8G8cnZv1rBJh": 25860812.904039,
+    "rUeDDFNp2q7Ymvyv75hFGC8DAcygVyJbNF": 265582363.149146,
+    "rp7TCczQuQo61dUo1oAgwdpRxLrA8vDaNV": 290523350.512168,
+    "rJn2zAPdFA193sixJwuFixRkYDUtx3apQh": 4653377.535326,
+    "rMrgNBrkE6FdCjWih5VAWkGMrmerrWpiZt": 9.757080,
+    "rMvCasZ9cohYrSZRNYPTZfoaaSUQMfgQ8G": 116576792.538589,
+    "rNFKfGBzMspdKfaZdpnEyhkFyw7C1mtQ8x": 20.965423,
+    "raQxZLtqurEXvH5sgijrif7yXMNwvFRkJN": 147378587.843680,
+    "rwBHqnCgNRnk3Kyoc6zon6Wt4Wujj3HNGe": 57941994.752545,
+    "r39uEuRjzLaSgvkjTfcejodbSrXLM3cYnX": 293.297424,
+    "rDDyH5nfvozKZQCwiBrWfcE528sWsBPWET": 2639.366730,
+    "rKcVYzVK1f4PhRFjLhWP7QmteG5FpPgRub": 36.929646,
+    "rNRc2S2GSefSkTkAiyjE6LDzMonpeHp6jS": 318277941.998112,
+    "rUaESVd1yLMy5VyoJvwwuqE8ZiCb2PEqBR": 1123.897979,
+    "raSZXZApFg7Nj1B5G6BnhoL6HcTqVMopJ3": 79576.400141,
+}
+
+HISTORICAL_DATE = "Feb 24, 2025"
+HISTORICAL_TAKEN_AT = datetime(2025, 2, 24, tzinfo=timezone.utc)
+
+
+def open_history_store(path: str = HISTORY_DB) -> HistoryStore:
+    """History store seeded with the Feb 24, 2025 benchmark"""
+    store = HistoryStore(path)
+    store.ensure_snapshot(HISTORICAL_DATE, HISTORICAL_BALANCES_20250224, HISTORICAL_TAKEN_AT)
+    return store
+
+
+def benchmark_snapshot(store: HistoryStore, on_date) -> Dict:
+    """Latest stored snapshot on or before `on_date`, else the seeded benchmark"""
+    end_of_day = datetime.combine(on_date, dt_time.max, tzinfo=timezone.utc)
+    snapshot = store.snapshot_at(end_of_day)
+    if snapshot is None:
+        snapshot = store.get_snapshot(
+            store.ensure_snapshot(HISTORICAL_DATE, HISTORICAL_BALANCES_20250224, HISTORICAL_TAKEN_AT)
+        )
+    return snapshot
+
+
+# ============================================================================
+# EXCHANGE DEFINITIONS - loaded once from exchanges.json
+# ============================================================================
+
+REGISTRY = Registry.from_file()
+EXCHANGES = REGISTRY.exchanges
+
+
+# ============================================================================
+# AGGREGATION
+# ============================================================================
+
+def fetch_all_balances_parallel(stream: Optional[BalanceStream] = None,
+                                last_known: Optional[Dict[str, Tuple[int, float]]] = None,
+                                registry: Optional[Registry] = None,
+                                mode: str = FETCH_MODE) -> WalletTable:
+    """Fetch all balances in batches pinned to one validated ledger
+
+    Reads the incremental tracker instead when one is given and in sync.
+    `last_known` maps address -> (drops, as_of timestamp); a wallet that
+    could not be fetched keeps that balance and is flagged stale instead of
+    counting as zero. Accounts the ledger reports as missing or malformed
+    are flagged unfunded with a zero balance rather than counted as errors.
+    `registry` defaults to the one loaded from exchanges.json and `mode`
+    picks the rippled fetch engine. The table is stamped with the ledger's
+    index and close time.
+    """
+    registry = REGISTRY if registry is None else registry
+    
+    # Streamed state when the tracker is in sync, otherwise a full batched
+    # fetch with every balance pinned to the same validated ledger
+    if stream is not None and stream.ready:
+        balances, ledger_index, close_time = stream.published()
+    else:
+        balances, ledger_index = fetch_balances(registry.addresses, mode)
+        close_time = None
+    if close_time is None and ledger_index is not None:
+        ledger = get_ledger(ledger_index)  # Usually remembered from the fetch itself
+        close_time = ledger["close_time"] if ledger else None
+    
+    with metrics.timed("phase_seconds", phase="aggregate"):
+        return WalletTable.build(registry, balances, ledger_index, last_known, close_time)
+
+
+def apply_benchmark(table: WalletTable, historical: Mapping[str, int]) -> WalletTable:
+    """Add benchmark balances ({address: drops}) to a copy of the fetched table"""
+    return table.with_benchmark(historical)
+
+
+# ============================================================================
+# SUMMARY
+# ============================================================================
+
+def create_summary_dataframe(table: WalletTable, benchmark_label: str = HISTORICAL_DATE) -> pd.DataFrame:
+    """Create summary DataFrame"""
+    with metrics.timed("phase_seconds", phase="dataframe"):
+        return _summary_dataframe(table, benchmark_label)
+
+
+def _summary_dataframe(table: WalletTable, benchmark_label: str) -> pd.DataFrame:
+    totals = table.totals()
+    df = pd.DataFrame({
+        "Exchange": [name.title() for name in totals.index],
+        "Balance (XRP)": totals["drops"].to_numpy() / DROPS_PER_XRP,
+        "Wallet Count": totals["wallet_count"].to_numpy(),
+        "Errors": totals["errors"].to_numpy(),
+        "Stale Wallets": totals["stale"].to_numpy(),
+        "Unfunded": totals["unfunded"].to_numpy(),
+    })
+    if "historical" in totals:
+        has_historical = totals["has_historical"].to_numpy(dtype=bool)
+        historical = totals["historical"].to_numpy(dtype="float64", na_value=0)
+        # Differences are taken in drops, before the one conversion to XRP
+        change = (totals["drops"] - totals["historical"]).to_numpy(dtype="float64", na_value=0)
+        positive = has_historical & (historical > 0)
+        df[f"Balance ({benchmark_label})"] = np.where(has_historical, historical / DROPS_PER_XRP, np.nan)
+        df["Change (XRP)"] = np.where(positive, change / DROPS_PER_XRP,
+                                      np.where(has_historical, 0.0, np.nan))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            df["Change (%)"] = np.where(positive, change / historical * 100,
+                                        np.where(has_historical, 0.0, np.nan))
+    else:
+        df[f"Balance ({benchmark_label})"] = np.nan
+        df["Change (XRP)"] = np.nan
+        df["Change (%)"] = np.nan
+    
+    df = df.sort_values("Balance (XRP)", ascending=False, kind="stable").reset_index(drop=True)
+    total = df["Balance (XRP)"].sum()
+    df["Market Share (%)"] = (df["Balance (XRP)"] / total * 100) if total > 0 else 0
+    df.index = df.index + 1
+    df.index.name = "Rank"
+    return df
+
+
+# ============================================================================
+# USD VALUES
+# ============================================================================
+
+BENCHMARK_PRICE_AGE = 3600  # Seconds a stored price may predate a benchmark snapshot and still value it
+
+
+def with_usd_values(df: pd.DataFrame, price: Optional[float], benchmark_price: Optional[float],
+                    benchmark_label: str = HISTORICAL_DATE) -> pd.DataFrame:
+    """Copy of a summary frame with "Value (USD)" and "Change (USD)" for every exchange
+
+    The change compares today's value with the benchmark balance at the
+    benchmark's own price, so it covers balance and price moves together.
+    Either column is NaN where its price or balance is unknown.
+    """
+    df = df.copy()
+    value = df["Balance (XRP)"].to_numpy(dtype="float64") * (price or np.nan)
+    historical = df[f"Balance ({benchmark_label})"].to_numpy(dtype="float64")
+    df["Value (USD)"] = value
+    df["Change (USD)"] = value - historical * (benchmark_price or np.nan)
+    return df
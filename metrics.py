@@ -0,0 +1,220 @@
+"""
+Pipeline timing metrics
+Per-phase latency histograms and counters, exposed as Prometheus text or JSON
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+METRICS_PORT = int(os.environ.get("XRP_METRICS_PORT", "0"))  # 0 disables the endpoint
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)  # Seconds
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+# ============================================================================
+# REGISTRY
+# ============================================================================
+
+class Histogram:
+    """Cumulative bucket counts plus sum, count and the last observation"""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.last = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        self.last = value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bucket bound holding the q-quantile (None past the last bucket)"""
+        if not self.count:
+            return None
+        target = q * self.count
+        for bound, count in zip(BUCKETS, self.counts):
+            if count >= target:
+                return bound
+        return None
+
+
+class Metrics:
+    """Thread-safe registry of histograms, counters and gauges keyed by name and labels"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._gauges: Dict[str, Dict[Labels, float]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, text: str):
+        self._help[name] = text
+
+    def observe(self, name: str, value: float, **labels):
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            key = _labels(labels)
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _labels(labels)
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_labels(labels)] = value
+
+    @contextmanager
+    def timed(self, name: str, **labels):
+        """Observe the wall time of the block, also when it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    def to_dict(self) -> Dict:
+        """JSON-friendly view with count, mean, last and approximate p50/p95"""
+        with self._lock:
+            histograms = [{
+                "name": name,
+                "labels": dict(key),
+                "count": h.count,
+                "sum": h.sum,
+                "mean": h.sum / h.count if h.count else None,
+                "last": h.last,
+                "p50": h.quantile(0.5),
+                "p95": h.quantile(0.95),
+            } for name, series in self._histograms.items() for key, h in series.items()]
+            counters = [{"name": name, "labels": dict(key), "value": value}
+                        for name, series in self._counters.items() for key, value in series.items()]
+            gauges = [{"name": name, "labels": dict(key), "value": value}
+                      for name, series in self._gauges.items() for key, value in series.items()]
+        return {"histograms": histograms, "counters": counters, "gauges": gauges}
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, h in series.items():
+                    for bound, count in zip(BUCKETS, h.counts):
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', str(bound)))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {h.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {h.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {h.count}")
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self._gauges.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} gauge")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry shared by the fetch pipeline, collector and dashboard
+metrics = Metrics()
+metrics.describe("rippled_request_seconds", "Latency of one JSON-RPC request per endpoint")
+metrics.describe("rippled_requests_total", "JSON-RPC requests per endpoint and outcome")
+metrics.describe("rippled_hedges_total", "Hedged duplicate requests sent and won")
+metrics.describe("rippled_concurrency_limit", "Adaptive in-flight request limit per endpoint")
+metrics.describe("rippled_in_flight", "Requests in flight per endpoint")
+metrics.describe("rippled_limit_changes_total", "Adaptive limit raises and cuts per endpoint and reason")
+metrics.describe("fetch_retries_total", "Addresses re-fetched by retry passes")
+metrics.describe("fetch_fallbacks_total", "Addresses the batch path handed to single requests")
+metrics.describe("negative_cache_hits_total", "Unfunded or malformed accounts served from the negative cache")
+metrics.describe("phase_seconds", "Wall time of one pipeline phase")
+metrics.describe("ledger_refreshes_total", "Closed ledgers by refresh decision (refreshed, deferred, quiet)")
+metrics.describe("backfill_points_total", "Backfilled ledgers by result")
+metrics.describe("flow_pages_total", "account_tx pages read for flows")
+metrics.describe("flow_transfers_total", "Exchange payments read per kind (both sides of a transfer between tracked wallets)")
+metrics.describe("backfill_balances_total", "Backfilled balances stored, already stored or failed")
+metrics.describe("richlist_pages_total", "ledger_data pages read by rich list scans")
+metrics.describe("richlist_accounts_total", "Accounts read by rich list scans")
+metrics.describe("price_requests_total", "Price source requests by outcome (ok, error, limited by the token bucket)")
+metrics.describe("price_request_seconds", "Latency of one price source request")
+
+
+# ============================================================================
+# HTTP ENDPOINT
+# ============================================================================
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """GET /metrics (Prometheus text) and /metrics.json"""
+
+    def do_GET(self):
+        if self.path.split("?")[0] == "/metrics":
+            body = metrics.render_prometheus().encode()
+            content_type = "text/plain; version=0.0.4"
+        elif self.path.split("?")[0] == "/metrics.json":
+            body = json.dumps(metrics.to_dict()).encode()
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would flood the log
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = "0.0.0.0") -> Optional[ThreadingHTTPServer]:
+    """Serve metrics on a daemon thread; None when disabled or the port is taken"""
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError:
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,215 @@
+"""
+XRP/USD price service
+Several public price sources behind token-bucket rate limits, shared between replicas, aggregated by median
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+import requests
+from statistics import median
+from typing import Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+PRICE_TIMEOUT = 5  # Seconds per source request
+PRICE_SOURCES = [name.strip() for name in os.environ.get(
+    "XRP_PRICE_SOURCES", "coingecko,binance,kraken,coinbase,bitstamp").split(",") if name.strip()]
+PRICE_BASE_URL = os.environ.get("XRP_PRICE_BASE_URL", "")  # Serve every source from here, e.g. fake_prices.py
+BUCKET_LEASE = 5  # Seconds a shared bucket's lock is held at most
+BUCKET_WAIT = 0.5  # Seconds to wait for a shared bucket's lock before counting the request as limited
+
+Quote = Tuple[float, Optional[float]]  # (USD price, 24h change in % or None)
+
+
+class PriceUnavailable(Exception):
+    """No source returned a price"""
+
+
+# ============================================================================
+# SOURCES - one parser per public ticker API
+# ============================================================================
+
+def _coingecko(data: Dict) -> Quote:
+    return float(data["ripple"]["usd"]), data["ripple"].get("usd_24h_change")
+
+
+def _binance(data: Dict) -> Quote:
+    return float(data["lastPrice"]), float(data["priceChangePercent"])
+
+
+def _kraken(data: Dict) -> Quote:
+    if data.get("error"):
+        raise ValueError("; ".join(data["error"]))
+    ticker = next(iter(data["result"].values()))
+    return float(ticker["c"][0]), None  # "o" is today's UTC open, not 24h ago
+
+
+def _from_open(last, open_24h) -> Quote:
+    last, open_24h = float(last), float(open_24h)
+    return last, (last / open_24h - 1) * 100 if open_24h else None
+
+
+def _coinbase(data: Dict) -> Quote:
+    return _from_open(data["last"], data["open"])
+
+
+def _bitstamp(data: Dict) -> Quote:
+    return _from_open(data["last"], data["open_24"])
+
+
+class PriceSource:
+    """One ticker endpoint: where to ask, how to read the answer and how often we may ask"""
+
+    def __init__(self, name: str, base_url: str, path: str, params: Dict,
+                 parse: Callable[[Dict], Quote], per_minute: float, burst: int):
+        self.name = name
+        self.base_url = base_url
+        self.path = path
+        self.params = params
+        self.parse = parse
+        self.per_minute = per_minute
+        self.burst = burst
+
+    def url(self) -> str:
+        return (PRICE_BASE_URL or self.base_url).rstrip("/") + self.path
+
+
+# Quotas are kept well under each API's published public limit
+SOURCES = {source.name: source for source in [
+    PriceSource("coingecko", "https://api.coingecko.com", "/api/v3/simple/price",
+                {"ids": "ripple", "vs_currencies": "usd", "include_24hr_change": "true"},
+                _coingecko, per_minute=5, burst=2),
+    PriceSource("binance", "https://api.binance.com", "/api/v3/ticker/24hr",
+                {"symbol": "XRPUSDT"}, _binance, per_minute=30, burst=5),
+    PriceSource("kraken", "https://api.kraken.com", "/0/public/Ticker",
+                {"pair": "XRPUSD"}, _kraken, per_minute=20, burst=3),
+    PriceSource("coinbase", "https://api.exchange.coinbase.com", "/products/XRP-USD/stats",
+                {}, _coinbase, per_minute=30, burst=5),
+    PriceSource("bitstamp", "https://www.bitstamp.net", "/api/v2/ticker/xrpusd/",
+                {}, _bitstamp, per_minute=30, burst=5),
+]}
+
+
+# ============================================================================
+# RATE LIMITING
+# ============================================================================
+
+class TokenBucket:
+    """`per_minute` requests on average, up to `burst` at once
+
+    Without a backend the bucket lives in this process. With a shared-cache
+    backend (shared_cache.FileBackend, SQLiteBackend or RedisBackend) its
+    state is read and written under the backend's lock, so every replica
+    draws from one quota. A lock that cannot be taken within `lock_wait`
+    counts as no token: the request is skipped rather than queued.
+    """
+
+    def __init__(self, name: str, per_minute: float, burst: int, backend=None,
+                 lock_wait: float = BUCKET_WAIT):
+        self.key = f"ratelimit:{name}"
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.backend = backend
+        self.lock_wait = lock_wait
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = time.time()
+
+    def _spend(self, tokens: float, updated: float, now: float) -> Tuple[bool, float]:
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            return False, tokens
+        return True, tokens - 1
+
+    def take(self) -> bool:
+        """Spend one token if there is one"""
+        if self.backend is None:
+            with self._lock:
+                now = time.time()
+                allowed, self._tokens = self._spend(self._tokens, self._updated, now)
+                self._updated = now
+                return allowed
+        token = self.backend.acquire(self.key, BUCKET_LEASE)
+        deadline = time.time() + self.lock_wait
+        while token is None and time.time() < deadline:
+            time.sleep(0.01)
+            token = self.backend.acquire(self.key, BUCKET_LEASE)
+        if token is None:
+            return False
+        try:
+            now = time.time()
+            entry = self.backend.get(self.key)
+            tokens, updated = (json.loads(entry[0])["tokens"], entry[1]) if entry else (self.burst, now)
+            allowed, tokens = self._spend(tokens, updated, now)
+            self.backend.set(self.key, json.dumps({"tokens": tokens}).encode(), now)
+            return allowed
+        finally:
+            self.backend.release(self.key, token)
+
+
+# ============================================================================
+# PRICE SERVICE
+# ============================================================================
+
+class PriceService:
+    """Median XRP/USD price of every source that answered
+
+    Sources are asked concurrently, each only when its token bucket allows,
+    so neither several replicas nor a burst of refreshes can exceed a public
+    quota. A source that fails, times out or is limited is left out of the
+    median; only when none answered does fetch() raise. Keeping the last good
+    price is up to the caller (the collector's stale-while-revalidate entry).
+    """
+
+    def __init__(self, sources: Optional[List[str]] = None, shared=None,
+                 timeout: float = PRICE_TIMEOUT):
+        names = sources if sources is not None else PRICE_SOURCES
+        unknown = [name for name in names if name not in SOURCES]
+        if unknown:
+            raise ValueError(f"Unknown price sources: {', '.join(unknown)}")
+        self.sources = [SOURCES[name] for name in names]
+        backend = shared.backend if shared is not None else None
+        self.buckets = {source.name: TokenBucket(source.name, source.per_minute, source.burst, backend)
+                        for source in self.sources}
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(self.sources)),
+                                        thread_name_prefix="price")
+
+    def _quote(self, source: PriceSource) -> Optional[Quote]:
+        if not self.buckets[source.name].take():
+            metrics.inc("price_requests_total", source=source.name, result="limited")
+            return None
+        try:
+            with metrics.timed("price_request_seconds", source=source.name):
+                response = requests.get(source.url(), params=source.params, timeout=self.timeout)
+            response.raise_for_status()
+            quote = source.parse(response.json())
+        except (requests.RequestException, ValueError, KeyError, TypeError, StopIteration) as e:
+            logger.info("Price source %s failed: %s", source.name, e)
+            metrics.inc("price_requests_total", source=source.name, result="error")
+            return None
+        metrics.inc("price_requests_total", source=source.name, result="ok")
+        return quote
+
+    def fetch(self) -> Dict:
+        """{"price", "change_24h", "sources": {name: price}}; raises PriceUnavailable"""
+        futures = {self._pool.submit(self._quote, source): source.name for source in self.sources}
+        done, _ = wait(futures, timeout=self.timeout + 1)
+        quotes = {futures[future]: future.result() for future in done if future.result()}
+        if not quotes:
+            raise PriceUnavailable("No price source answered")
+        changes = [change for _, change in quotes.values() if change is not None]
+        return {
+            "price": median(price for price, _ in quotes.values()),
+            "change_24h": median(changes) if changes else None,
+            "sources": {name: price for name, (price, _) in sorted(quotes.items())},
+        }
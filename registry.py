@@ -0,0 +1,126 @@
+"""
+Exchange wallet registry
+Loads exchanges.json once into an indexed, validated structure
+"""
+
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+REGISTRY_FILE = os.environ.get(
+    "XRP_REGISTRY_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "exchanges.json")
+)
+B58_ALPHABET = "rpshnaf39wBUDNEGHJKLM4PQRST7VWXYZ2bcdeCg65jkm8oFqi1tuvAxyz"
+_B58_INDEX = {char: i for i, char in enumerate(B58_ALPHABET)}
+ACCOUNT_ID_VERSION = 0x00  # Version byte of classic addresses
+
+
+# ============================================================================
+# ADDRESS VALIDATION
+# ============================================================================
+
+def address_error(address: str) -> Optional[str]:
+    """Why `address` is not a valid classic XRPL address, None if it is"""
+    if not 25 <= len(address) <= 35:
+        return f"length {len(address)}"
+    n = 0
+    for char in address:
+        if char not in _B58_INDEX:
+            return f"invalid character {char!r}"
+        n = n * 58 + _B58_INDEX[char]
+    leading = len(address) - len(address.lstrip(B58_ALPHABET[0]))
+    try:
+        body = n.to_bytes((n.bit_length() + 7) // 8, "big") if n else b""
+    except OverflowError:
+        return "does not decode"
+    raw = b"\x00" * leading + body
+    if len(raw) != 25 or raw[0] != ACCOUNT_ID_VERSION:
+        return "not an account address"
+    if hashlib.sha256(hashlib.sha256(raw[:21]).digest()).digest()[:4] != raw[21:]:
+        return "bad checksum"
+    return None
+
+
+def is_valid_address(address: str) -> bool:
+    return address_error(address) is None
+
+
+# ============================================================================
+# REGISTRY
+# ============================================================================
+
+def _keep_pairs(pairs: List[Tuple[str, object]]) -> Dict:
+    """json object hook keeping repeated keys, which a plain dict would silently drop"""
+    return {"__pairs__": pairs}
+
+
+class Registry:
+    """Validated exchange -> {address: label} mapping with reverse lookups
+
+    Invalid addresses and addresses listed under more than one exchange are
+    dropped at load (the first listing wins) and kept in `invalid` and
+    `duplicates` for reporting, so a bad entry costs nothing per refresh.
+    """
+
+    def __init__(self, entries: List[Tuple[str, str, str]]):
+        self.exchanges: Dict[str, Dict[str, str]] = {}
+        self.addresses: List[str] = []
+        self._exchange_of: Dict[str, str] = {}
+        self._label_of: Dict[str, str] = {}
+        self.invalid: List[Dict] = []
+        self.duplicates: List[Dict] = []
+        for exchange, address, label in entries:
+            wallets = self.exchanges.setdefault(exchange, {})
+            error = address_error(address)
+            if error:
+                self.invalid.append({"exchange": exchange, "address": address, "label": label,
+                                     "reason": error})
+                continue
+            if address in self._exchange_of:
+                self.duplicates.append({"address": address, "label": label,
+                                        "exchanges": [self._exchange_of[address], exchange]})
+                continue
+            wallets[address] = label
+            self.addresses.append(address)
+            self._exchange_of[address] = exchange
+            self._label_of[address] = label
+        for problem in self.invalid:
+            logger.warning("Skipping invalid address %(address)s under %(exchange)s: %(reason)s",
+                           problem)
+        for problem in self.duplicates:
+            logger.warning("Skipping %s: already listed under %s", problem["address"],
+                           problem["exchanges"][0])
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Dict[str, str]]) -> "Registry":
+        return cls([(exchange, address, label)
+                    for exchange, wallets in data.items() for address, label in wallets.items()])
+
+    @classmethod
+    def from_file(cls, path: str = REGISTRY_FILE) -> "Registry":
+        """Load a {exchange: {address: label}} JSON file, keeping repeated keys"""
+        with open(path) as f:
+            data = json.load(f, object_pairs_hook=_keep_pairs)
+        return cls([(exchange, address, label)
+                    for exchange, wallets in data["__pairs__"]
+                    for address, label in wallets["__pairs__"]])
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    def __contains__(self, address: str) -> bool:
+        return address in self._exchange_of
+
+    def exchange_of(self, address: str) -> Optional[str]:
+        return self._exchange_of.get(address)
+
+    def label_of(self, address: str) -> Optional[str]:
+        return self._label_of.get(address)
@@ -0,0 +1,317 @@
+"""
+XRP rich list
+Streams every account of one validated ledger through ledger_data, keeping only a top-K heap,
+a balance histogram and the tracked wallets' ranks; resumable from a small checkpoint
+
+    python richlist.py                   # scan the latest validated ledger, or resume the last scan
+    python richlist.py --top 1000 --shards 16
+"""
+
+import os
+import json
+import time
+import heapq
+import logging
+import argparse
+import threading
+from bisect import bisect_left, bisect_right
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+from holdings import REGISTRY
+from metrics import metrics
+from registry import Registry
+from rippled import (ACCOUNT_ERRORS, DROPS_PER_XRP, FETCH_MODE, FETCH_MODES, RippledError,
+                     fetch_balances, get_ledger, get_validated_ledger_index, rpc)
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+RICHLIST_FILE = os.environ.get("XRP_RICHLIST_FILE", "xrp_richlist.json")  # Last finished scan
+CHECKPOINT_FILE = os.environ.get("XRP_RICHLIST_CHECKPOINT", "xrp_richlist.checkpoint.json")
+PAGE_LIMIT = 256  # Accounts per ledger_data page (rippled's cap for JSON pages)
+TOP_K = 1000  # Richest accounts kept
+SHARDS = 8  # Key-space ranges paged at once, each with its own marker
+CHECKPOINT_SECONDS = 15  # Progress written at most this often
+KEY_SPACE = 2 ** 256  # Ledger object keys are 256-bit hashes
+# Histogram bucket floors in drops: under 1 XRP, then one bucket per power of ten up to 10bn XRP
+HISTOGRAM_EDGES = [0] + [10 ** power * DROPS_PER_XRP for power in range(11)]
+
+
+def key_hex(key: int) -> str:
+    """A ledger object key as rippled writes it"""
+    return f"{key:064X}"
+
+
+# ============================================================================
+# SCAN STATE
+# ============================================================================
+
+class RichListScan:
+    """Running totals of one ledger_data scan, small enough to checkpoint whole
+
+    Memory is bounded by the top-K heap, the histogram and the tracked
+    wallets, however many accounts the ledger holds. The key space is split
+    into `shards` ranges, each paged from its own marker, so ranges can be
+    read in parallel and each resumes where it stopped.
+
+    Tracked wallets are ranked exactly without keeping other accounts: their
+    balances are known up front, and every scanned account bumps a count
+    for the tracked balances below its own.
+    """
+
+    def __init__(self, ledger_index: int, close_time: int, tracked: Dict[str, int],
+                 top_k: int = TOP_K, shards: int = SHARDS):
+        self.ledger_index = ledger_index
+        self.close_time = close_time
+        self.top_k = top_k
+        self.tracked = tracked
+        self.thresholds = sorted(set(tracked.values()))
+        self.above = [0] * (len(self.thresholds) + 1)  # Accounts by how many thresholds they exceed
+        width = KEY_SPACE // shards
+        # A marker resumes after its key, so each range starts one key before its first
+        self.shards = [{"marker": key_hex(i * width - 1) if i else None,
+                        "end": key_hex((i + 1) * width) if i < shards - 1 else None,
+                        "done": False} for i in range(shards)]
+        self.heap: List[Tuple[int, str]] = []  # Min-heap of the richest (drops, address)
+        self.histogram = [[0, 0] for _ in HISTOGRAM_EDGES]  # [accounts, drops] per bucket
+        self.accounts = 0
+        self.total_drops = 0
+        self.pages = 0
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        return all(shard["done"] for shard in self.shards)
+
+    def marker(self, shard: int) -> Optional[str]:
+        with self._lock:
+            return self.shards[shard]["marker"]
+
+    def add_page(self, shard: int, state: List[Dict], marker: Optional[str]):
+        """Count one ledger_data page and move the shard's marker past it"""
+        with self._lock:
+            end = self.shards[shard]["end"]
+            for entry in state:
+                if end is not None and entry["index"].upper() >= end:
+                    marker = None  # Into the next shard's range
+                    break
+                if entry.get("LedgerEntryType") == "AccountRoot":
+                    self._add(entry["Account"], int(entry["Balance"]))
+            self.pages += 1
+            self.shards[shard]["marker"] = marker
+            self.shards[shard]["done"] = marker is None or (end is not None and marker.upper() >= end)
+
+    def _add(self, address: str, drops: int):
+        self.accounts += 1
+        self.total_drops += drops
+        bucket = self.histogram[bisect_right(HISTOGRAM_EDGES, drops) - 1]
+        bucket[0] += 1
+        bucket[1] += drops
+        self.above[bisect_left(self.thresholds, drops)] += 1
+        if len(self.heap) < self.top_k:
+            heapq.heappush(self.heap, (drops, address))
+        elif drops > self.heap[0][0]:
+            heapq.heapreplace(self.heap, (drops, address))
+
+    def ranks(self) -> Dict[str, int]:
+        """Rank of each tracked wallet among all scanned accounts (1 = richest; ties share a rank)"""
+        richer, running = {}, 0
+        for position in range(len(self.thresholds), 0, -1):
+            running += self.above[position]
+            richer[self.thresholds[position - 1]] = running
+        return {address: richer[drops] + 1 for address, drops in self.tracked.items()}
+
+    def result(self, registry: Registry = REGISTRY) -> Dict:
+        """The finished rich list: totals, top accounts, histogram and tracked wallet ranks"""
+        exchanges: Dict[str, int] = {}
+        for address, drops in self.tracked.items():
+            exchange = registry.exchange_of(address)
+            if exchange is not None:
+                exchanges[exchange] = exchanges.get(exchange, 0) + drops
+        top = sorted(self.heap, reverse=True)
+        return {
+            "ledger_index": self.ledger_index,
+            "close_time": self.close_time,
+            "accounts": self.accounts,
+            "total_drops": self.total_drops,
+            "tracked_drops": sum(exchanges.values()),
+            "exchanges": exchanges,
+            "ranks": self.ranks(),
+            "top": [{"rank": rank, "address": address, "drops": drops,
+                     "exchange": registry.exchange_of(address)}
+                    for rank, (drops, address) in enumerate(top, 1)],
+            "histogram": [{"min_drops": low, "max_drops": high, "accounts": accounts, "drops": drops}
+                          for low, high, (accounts, drops)
+                          in zip(HISTOGRAM_EDGES, HISTOGRAM_EDGES[1:] + [None], self.histogram)],
+            "pages": self.pages,
+            "seconds": time.time() - self.started_at,
+        }
+
+    def to_dict(self) -> Dict:
+        """A consistent copy of the state, taken between pages"""
+        with self._lock:
+            return {"ledger_index": self.ledger_index, "close_time": self.close_time,
+                    "top_k": self.top_k, "tracked": self.tracked, "above": list(self.above),
+                    "shards": [dict(shard) for shard in self.shards], "heap": list(self.heap),
+                    "histogram": [list(bucket) for bucket in self.histogram],
+                    "accounts": self.accounts, "total_drops": self.total_drops,
+                    "pages": self.pages, "started_at": self.started_at}
+
+    @classmethod
+    def from_dict(cls, raw: Dict) -> "RichListScan":
+        scan = cls(raw["ledger_index"], raw["close_time"], raw["tracked"], raw["top_k"], len(raw["shards"]))
+        scan.above = raw["above"]
+        scan.shards = raw["shards"]
+        scan.heap = [tuple(item) for item in raw["heap"]]  # Stored in heap order
+        scan.histogram = raw["histogram"]
+        scan.accounts = raw["accounts"]
+        scan.total_drops = raw["total_drops"]
+        scan.pages = raw["pages"]
+        scan.started_at = raw["started_at"]
+        return scan
+
+
+# ============================================================================
+# FILES
+# ============================================================================
+
+def write_json(payload: Dict, path: str):
+    """Atomically replace a JSON file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str = CHECKPOINT_FILE) -> Optional[RichListScan]:
+    """The interrupted scan in `path`, None if there is none"""
+    try:
+        with open(path) as f:
+            return RichListScan.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def read_richlist(path: str = RICHLIST_FILE) -> Optional[Dict]:
+    """The last finished rich list, None before the first"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# ============================================================================
+# SCANNING
+# ============================================================================
+
+def start_scan(registry: Registry = REGISTRY, mode: str = FETCH_MODE,
+               top_k: int = TOP_K, shards: int = SHARDS) -> RichListScan:
+    """A new scan of the latest validated ledger, with the tracked wallets' balances at it"""
+    ledger_index = get_validated_ledger_index()
+    ledger = get_ledger(ledger_index) if ledger_index is not None else None
+    if ledger is None:
+        raise RippledError("No node reported a validated ledger")
+    balances, _ = fetch_balances(registry.addresses, mode, ledger_index)
+    tracked = {address: drops for address, (drops, error) in balances.items()
+               if error is None or error in ACCOUNT_ERRORS}
+    if len(tracked) < len(balances):
+        logger.warning("%d tracked wallets failed and will not be ranked", len(balances) - len(tracked))
+    return RichListScan(ledger_index, ledger["close_time"], tracked, top_k, shards)
+
+
+def scan_shard(scan: RichListScan, shard: int, stop: threading.Event, limit: int = PAGE_LIMIT):
+    """Page one key range of the scan's ledger until it is done or `stop` is set"""
+    while not scan.shards[shard]["done"] and not stop.is_set():
+        params = {"ledger_index": scan.ledger_index, "type": "account", "binary": False, "limit": limit}
+        marker = scan.marker(shard)
+        if marker:
+            params["marker"] = marker
+        page = rpc({"method": "ledger_data", "params": [params]})
+        if page.get("error"):
+            raise RippledError(f"ledger_data at #{scan.ledger_index}: {page['error']}")
+        state = page.get("state", [])
+        scan.add_page(shard, state, page.get("marker"))
+        metrics.inc("richlist_pages_total")
+        metrics.inc("richlist_accounts_total", len(state))
+
+
+def run_scan(scan: RichListScan, checkpoint: str = CHECKPOINT_FILE,
+             interval: float = CHECKPOINT_SECONDS) -> bool:
+    """Page every unfinished range in parallel, checkpointing as it goes; True once complete
+
+    A failed range stops the others after their current page. The
+    checkpoint keeps every page counted so far, and a rerun resumes each
+    range from its marker.
+    """
+    pending = [i for i, shard in enumerate(scan.shards) if not shard["done"]]
+    stop = threading.Event()
+    with metrics.timed("phase_seconds", phase="richlist"):
+        with ThreadPoolExecutor(max_workers=max(1, len(pending)), thread_name_prefix="richlist") as executor:
+            futures = [executor.submit(scan_shard, scan, shard, stop) for shard in pending]
+            running = futures
+            while running:
+                finished, running = wait(running, timeout=interval, return_when=FIRST_EXCEPTION)
+                if any(future.exception() for future in finished):
+                    stop.set()
+                    wait(running)
+                    running = ()
+                write_json(scan.to_dict(), checkpoint)
+                logger.info("%s accounts in %s pages, %d/%d ranges done", f"{scan.accounts:,}",
+                            f"{scan.pages:,}", sum(shard["done"] for shard in scan.shards), len(scan.shards))
+    for future in futures:
+        if future.exception():
+            raise future.exception()
+    return scan.done
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan every XRP account for a rich list and wallet ranks")
+    parser.add_argument("--top", type=int, default=TOP_K, help="Richest accounts to keep")
+    parser.add_argument("--shards", type=int, default=SHARDS, help="Key ranges paged at once")
+    parser.add_argument("--mode", choices=FETCH_MODES, default=FETCH_MODE,
+                        help="Engine for the tracked wallets' balances")
+    parser.add_argument("--fresh", action="store_true", help="Ignore an interrupted scan and start over")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE)
+    parser.add_argument("--output", default=RICHLIST_FILE)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    scan = None if args.fresh else load_checkpoint(args.checkpoint)
+    if scan is None:
+        scan = start_scan(mode=args.mode, top_k=args.top, shards=args.shards)
+        logger.info("Scanning ledger #%s", f"{scan.ledger_index:,}")
+    else:
+        logger.info("Resuming the scan of ledger #%s at %s accounts (--fresh starts over)",
+                    f"{scan.ledger_index:,}", f"{scan.accounts:,}")
+    try:
+        run_scan(scan, args.checkpoint)
+    except Exception as e:
+        logger.error("Scan stopped: %s. Rerun to resume; if no node still has ledger #%s, "
+                     "use --fresh", e, f"{scan.ledger_index:,}")
+        raise SystemExit(1)
+
+    result = scan.result()
+    write_json(result, args.output)
+    if os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    total = result["total_drops"] / DROPS_PER_XRP
+    logger.info("Ledger #%s: %s accounts hold %s XRP; tracked exchanges hold %.2f%%, in %.0fs",
+                f"{result['ledger_index']:,}", f"{result['accounts']:,}", f"{total:,.0f}",
+                result["tracked_drops"] / result["total_drops"] * 100 if result["total_drops"] else 0,
+                result["seconds"])
+    for row in result["top"][:20]:
+        print(f"{row['rank']:>5}  {row['address']:<35} {row['drops'] / DROPS_PER_XRP:>20,.0f}  "
+              f"{row['exchange'] or ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+"""
+XRP Ledger JSON-RPC client
+Batched, threaded and asyncio account_info engines pinned to one validated ledger
+"""
+
+import os
+import time
+import asyncio
+import threading
+import aiohttp
+import requests
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from cache import NegativeCache
+from endpoints import (MAX_LIMIT, EndpointError, EndpointManager, EndpointOverloaded,
+                       EndpointSkipped, hedged_call, hedged_call_async)
+from metrics import metrics
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+RIPPLED_URLS = [
+    "https://s1.ripple.com:51234",
+    "https://s2.ripple.com:51234",
+    "https://xrplcluster.com",
+]
+if os.environ.get("XRP_RIPPLED_URLS"):  # e.g. point at a local stub rippled
+    RIPPLED_URLS = [url.strip() for url in os.environ["XRP_RIPPLED_URLS"].split(",") if url.strip()]
+MAX_RETRIES = 2  # Extra passes over failed addresses
+RETRY_BACKOFF = 0.5  # Seconds before the first retry pass, doubled per pass
+REQUEST_TIMEOUT = 8
+BATCH_SIZE = 50  # account_info calls per rippled "batch" request
+FETCH_MODE = os.environ.get("XRP_FETCH_MODE", "batch")  # "batch", "threads" or "async"
+FETCH_MODES = ("batch", "threads", "async")
+
+DROPS_PER_XRP = 1_000_000
+RIPPLE_EPOCH = 946684800  # 2000-01-01T00:00:00Z, origin of rippled's close times
+LEDGER_SECONDS = 3.9  # Typical close interval
+CLOSE_TIMES_KEPT = 256  # Ledger close times remembered from `ledger` replies
+
+# rippled error codes that say something about the node rather than the account
+NODE_ERRORS = {"tooBusy", "slowDown", "noNetwork", "noCurrent", "noClosed",
+               "notReady", "notSynced", "amendmentBlocked", "failedToForward", "internal"}
+OVERLOAD_ERRORS = {"tooBusy", "slowDown"}  # Node errors that cut the endpoint's concurrency limit
+OVERLOAD_STATUSES = {429, 503}  # Rate limited or shedding load
+SKIP_ERRORS = {"lgrNotFound", "unknownCmd"}  # Healthy node that cannot serve this request
+# Ledger-level answers about the account itself; asking another node will not help
+ACCOUNT_ERRORS = {"actNotFound", "actMalformed"}
+NEGATIVE_TTL = 3600  # Seconds before an unfunded or malformed account is re-checked
+
+
+# ============================================================================
+# JSON-RPC HELPERS
+# ============================================================================
+
+class RippledError(Exception):
+    """Transport or node-level failure of a rippled request"""
+
+
+class RippledOverloaded(RippledError, EndpointOverloaded):
+    """The node rate limited us, timed out or asked us to slow down"""
+
+
+# Shared across refreshes so node health and concurrency limits carry over between them
+endpoint_manager = EndpointManager(RIPPLED_URLS)
+# Every attempt holds one of the endpoints' slots, so this never queues
+_attempt_pool = ThreadPoolExecutor(max_workers=endpoint_manager.capacity(),
+                                   thread_name_prefix="rippled")
+_local = threading.local()
+# Accounts rippled reported as actNotFound/actMalformed -> error code
+dead_accounts = NegativeCache(NEGATIVE_TTL)
+# Ledger index -> close time (Unix seconds) of recently seen validated ledgers
+_close_times: "OrderedDict[int, int]" = OrderedDict()
+_close_times_lock = threading.Lock()
+
+
+def account_info_request(address: str, ledger_index) -> Dict:
+    """Build an account_info request for one address"""
+    return {
+        "method": "account_info",
+        "params": [{"account": address, "ledger_index": ledger_index, "strict": True}]
+    }
+
+
+def parse_account_info(result: Dict) -> Optional[int]:
+    """Extract the balance in drops from an account_info result, None if absent
+
+    Kept as integer drops all the way to display so sums stay exact.
+    """
+    if "account_data" in result:
+        return int(result["account_data"]["Balance"])
+    return None
+
+
+def account_error(result: Dict) -> Optional[str]:
+    """The ledger-level error code of an account_info result, if it has one"""
+    error = result.get("error")
+    return error if error in ACCOUNT_ERRORS else None
+
+
+def is_transport_error(error: Optional[str]) -> bool:
+    """True for failures worth retrying, False for success and ledger-level answers"""
+    return bool(error) and error not in ACCOUNT_ERRORS
+
+
+def check_reply(reply: Dict) -> Dict:
+    """Return the result of a JSON-RPC reply, raising on node-level errors"""
+    result = reply.get("result", reply)
+    error = result.get("error")
+    if error in SKIP_ERRORS:
+        raise EndpointSkipped(error)
+    if error in OVERLOAD_ERRORS:
+        raise RippledOverloaded(error)
+    if error in NODE_ERRORS:
+        raise RippledError(error)
+    return result
+
+
+def thread_session() -> requests.Session:
+    """Return this thread's session; requests.Session is not thread-safe"""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+
+def post_json(url: str, data: Dict):
+    """POST a JSON-RPC body and return the decoded reply"""
+    try:
+        response = thread_session().post(url, json=data, timeout=REQUEST_TIMEOUT)
+    except requests.Timeout as e:
+        raise RippledOverloaded(f"Timeout from {url}") from e
+    if response.status_code in OVERLOAD_STATUSES:
+        raise RippledOverloaded(f"HTTP {response.status_code} from {url}")
+    if response.status_code != 200:
+        raise RippledError(f"HTTP {response.status_code} from {url}")
+    return response.json()
+
+
+def rpc(data: Dict) -> Dict:
+    """Send one JSON-RPC request to the healthiest node, hedging slow ones"""
+    return hedged_call(endpoint_manager, lambda url: check_reply(post_json(url, data)),
+                       _attempt_pool, kind=data["method"])
+
+
+def remember_close_time(ledger_index: int, close_time: int):
+    """Keep a validated ledger's close time (Unix seconds) for get_ledger"""
+    with _close_times_lock:
+        _close_times[ledger_index] = close_time
+        while len(_close_times) > CLOSE_TIMES_KEPT:
+            _close_times.popitem(last=False)
+
+
+def get_validated_ledger_index() -> Optional[int]:
+    """Return the latest validated ledger index"""
+    try:
+        result = rpc({"method": "ledger", "params": [{"ledger_index": "validated"}]})
+    except EndpointError:
+        return None
+    if result.get("validated") and "ledger_index" in result:
+        ledger = result.get("ledger") or {}
+        if "close_time" in ledger:
+            remember_close_time(int(result["ledger_index"]), int(ledger["close_time"]) + RIPPLE_EPOCH)
+        return int(result["ledger_index"])
+    return None
+
+
+def get_ledger(ledger_index) -> Optional[Dict]:
+    """{"ledger_index", "close_time" (Unix seconds)} of a validated ledger, None if no node has it"""
+    if isinstance(ledger_index, int):
+        with _close_times_lock:
+            close_time = _close_times.get(ledger_index)
+        if close_time is not None:
+            return {"ledger_index": ledger_index, "close_time": close_time}
+    try:
+        result = rpc({"method": "ledger", "params": [{"ledger_index": ledger_index}]})
+    except EndpointError:
+        return None
+    ledger = result.get("ledger") or {}
+    if not result.get("validated") or "close_time" not in ledger:
+        return None
+    close = {"ledger_index": int(ledger["ledger_index"]),
+             "close_time": int(ledger["close_time"]) + RIPPLE_EPOCH}
+    remember_close_time(close["ledger_index"], close["close_time"])
+    return close
+
+
+# ============================================================================
+# PER-ADDRESS FETCHING
+# ============================================================================
+
+def fetch_single_balance(address: str, ledger_index="validated") -> tuple:
+    """Fetch balance for a single address from the healthiest node"""
+    try:
+        result = rpc(account_info_request(address, ledger_index))
+    except EndpointError:
+        return (address, 0, "Failed to fetch")
+    drops = parse_account_info(result)
+    if drops is None:
+        return (address, 0, account_error(result) or "Failed to fetch")
+    return (address, drops, None)
+
+
+def fetch_balances_threaded(addresses: List[str],
+                            ledger_index="validated") -> Dict[str, Tuple[int, Optional[str]]]:
+    """Fetch balances with one request per address on a thread pool
+
+    The pool only bounds threads; how many requests are in flight is up to
+    each endpoint's adaptive limit.
+    """
+    balances = {}
+    with ThreadPoolExecutor(max_workers=min(endpoint_manager.capacity(), len(addresses) or 1)) as executor:
+        futures = [executor.submit(fetch_single_balance, addr, ledger_index)
+                   for addr in addresses]
+        for future in as_completed(futures):
+            address, drops, error = future.result()
+            balances[address] = (drops, error)
+    return balances
+
+
+# ============================================================================
+# BATCHED FETCHING
+# ============================================================================
+
+def fetch_batch(addresses: List[str], ledger_index) -> Dict[str, Tuple[int, Optional[str]]]:
+    """Fetch a chunk of balances with a single rippled "batch" request
+
+    rippled answers a batch with a JSON array holding one reply per call, in
+    request order. Accounts the ledger does not know come back with their
+    error code; addresses missing from the returned mapping were not
+    resolved and need a per-address retry.
+    """
+    data = {
+        "method": "batch",
+        "params": [account_info_request(addr, ledger_index) for addr in addresses]
+    }
+
+    def attempt(url: str) -> list:
+        replies = post_json(url, data)
+        if not isinstance(replies, list) or len(replies) != len(addresses):
+            raise EndpointSkipped(f"{url} does not support batch requests")
+        return replies
+
+    try:
+        replies = hedged_call(endpoint_manager, attempt, _attempt_pool, kind="batch")
+    except EndpointError:
+        return {}
+    balances = {}
+    for address, reply in zip(addresses, replies):
+        result = reply.get("result", reply)
+        drops = parse_account_info(result)
+        if drops is not None:
+            balances[address] = (drops, None)
+        elif account_error(result):
+            balances[address] = (0, account_error(result))
+    return balances
+
+
+def fetch_balances_batched(addresses: List[str],
+                           ledger_index) -> Dict[str, Tuple[int, Optional[str]]]:
+    """Fetch balances in BATCH_SIZE chunks over keep-alive sessions, as many at once as the limits allow"""
+    balances = {}
+    chunks = [addresses[start:start + BATCH_SIZE] for start in range(0, len(addresses), BATCH_SIZE)]
+    if chunks:
+        with ThreadPoolExecutor(max_workers=min(endpoint_manager.capacity(), len(chunks))) as executor:
+            for result in executor.map(lambda chunk: fetch_batch(chunk, ledger_index), chunks):
+                balances.update(result)
+
+    # Anything the batch path could not resolve falls back to single requests
+    missing = [addr for addr in addresses if addr not in balances]
+    if missing:
+        metrics.inc("fetch_fallbacks_total", len(missing))
+        balances.update(fetch_balances_threaded(missing, ledger_index))
+    return balances
+
+
+# ============================================================================
+# ASYNC FETCHING - asyncio/aiohttp
+# ============================================================================
+
+async def rpc_async(session: aiohttp.ClientSession, data: Dict) -> Dict:
+    """Async counterpart of rpc"""
+    async def attempt(url: str) -> Dict:
+        try:
+            async with session.post(url, json=data) as response:
+                if response.status in OVERLOAD_STATUSES:
+                    raise RippledOverloaded(f"HTTP {response.status} from {url}")
+                if response.status != 200:
+                    raise RippledError(f"HTTP {response.status} from {url}")
+                return check_reply(await response.json(content_type=None))
+        except asyncio.TimeoutError as e:
+            raise RippledOverloaded(f"Timeout from {url}") from e
+
+    return await hedged_call_async(endpoint_manager, attempt, kind=data["method"])
+
+
+async def get_validated_ledger_index_async(session: aiohttp.ClientSession) -> Optional[int]:
+    """Async counterpart of get_validated_ledger_index"""
+    try:
+        result = await rpc_async(session, {"method": "ledger", "params": [{"ledger_index": "validated"}]})
+    except EndpointError:
+        return None
+    if result.get("validated") and "ledger_index" in result:
+        ledger = result.get("ledger") or {}
+        if "close_time" in ledger:
+            remember_close_time(int(result["ledger_index"]), int(ledger["close_time"]) + RIPPLE_EPOCH)
+        return int(result["ledger_index"])
+    return None
+
+
+async def fetch_single_balance_async(address: str, session: aiohttp.ClientSession,
+                                     ledger_index="validated") -> tuple:
+    """Fetch balance for a single address from the healthiest node, without blocking"""
+    try:
+        result = await rpc_async(session, account_info_request(address, ledger_index))
+    except EndpointError:
+        return (address, 0, "Failed to fetch")
+    drops = parse_account_info(result)
+    if drops is None:
+        return (address, 0, account_error(result) or "Failed to fetch")
+    return (address, drops, None)
+
+
+async def _fetch_balances_async(addresses: List[str],
+                                ledger_index: Optional[int] = None) -> Tuple[Dict, Optional[int]]:
+    """Run every account_info call on one aiohttp session, bounded by the endpoints' limits"""
+    connector = aiohttp.TCPConnector(limit=endpoint_manager.capacity(), limit_per_host=MAX_LIMIT)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        if ledger_index is None:
+            ledger_index = await get_validated_ledger_index_async(session)
+        pinned = ledger_index if ledger_index is not None else "validated"
+        replies = await asyncio.gather(
+            *(fetch_single_balance_async(addr, session, pinned) for addr in addresses)
+        )
+    return {address: (drops, error) for address, drops, error in replies}, ledger_index
+
+
+def fetch_balances_async(addresses: List[str],
+                         ledger_index: Optional[int] = None) -> Tuple[Dict, Optional[int]]:
+    """Fetch balances on the asyncio engine from synchronous code
+
+    Streamlit runs scripts in a worker thread without an event loop, so a
+    fresh loop is started for each refresh.
+    """
+    return asyncio.run(_fetch_balances_async(addresses, ledger_index))
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+def retry_failed(balances: Dict[str, Tuple[int, Optional[str]]],
+                 ledger_index="validated") -> Dict[str, Tuple[int, Optional[str]]]:
+    """Re-fetch only the addresses that failed in transport, backing off between passes"""
+    for attempt in range(MAX_RETRIES):
+        failed = [addr for addr, (_, error) in balances.items() if is_transport_error(error)]
+        if not failed:
+            break
+        metrics.inc("fetch_retries_total", len(failed))
+        time.sleep(RETRY_BACKOFF * 2 ** attempt)
+        balances.update(fetch_balances_threaded(failed, ledger_index))
+    return balances
+
+
+def fetch_balances(addresses: List[str], mode: str = FETCH_MODE,
+                   ledger_index: Optional[int] = None) -> Tuple[Dict, Optional[int]]:
+    """Fetch balances for all addresses pinned to one validated ledger
+
+    Returns ({address: (drops, error)}, ledger_index). The ledger index is
+    None when no node reported a validated ledger; balances then come from
+    each node's own latest validated ledger. `mode` picks the engine: "batch"
+    (rippled batch requests), "threads" (one request per address on a thread
+    pool) or "async" (one request per address on asyncio/aiohttp). Every
+    engine routes through endpoint_manager, and addresses that still failed
+    get up to MAX_RETRIES targeted retry passes.
+
+    Accounts answered with an ACCOUNT_ERRORS code keep that code as their
+    error and are not retried; they are served from dead_accounts for
+    NEGATIVE_TTL seconds instead of being asked for again.
+
+    With a `ledger_index`, balances are read at that past ledger instead and
+    dead_accounts is neither consulted nor updated: an account unfunded
+    today may have held XRP back then.
+    """
+    if mode not in FETCH_MODES:
+        raise ValueError(f"Unknown fetch mode {mode!r}, expected one of {FETCH_MODES}")
+    historical = ledger_index is not None
+    dead = {}
+    if not historical:
+        for address in addresses:
+            error = dead_accounts.get(address)
+            if error:
+                dead[address] = (0, error)
+    live = [addr for addr in addresses if addr not in dead]
+    metrics.inc("negative_cache_hits_total", len(dead))
+    with metrics.timed("phase_seconds", phase="fetch", mode=mode):
+        if mode == "async":
+            balances, ledger_index = fetch_balances_async(live, ledger_index)
+        else:
+            if not historical:
+                ledger_index = get_validated_ledger_index()
+            pinned = ledger_index if ledger_index is not None else "validated"
+            if mode == "batch":
+                balances = fetch_balances_batched(live, pinned)
+            else:
+                balances = fetch_balances_threaded(live, pinned)
+    with metrics.timed("phase_seconds", phase="retry"):
+        retry_failed(balances, ledger_index if ledger_index is not None else "validated")
+    for address, (_, error) in balances.items():
+        if error in ACCOUNT_ERRORS and not historical:
+            dead_accounts.add(address, error)
+    balances.update(dead)
+    return balances, ledger_index
@@ -0,0 +1,251 @@
+"""
+Cross-process shared cache
+Lets several dashboard replicas share one fetch per interval through a file, SQLite or Redis backend
+"""
+
+import os
+import time
+import uuid
+import fcntl
+import sqlite3
+import hashlib
+import threading
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+from metrics import metrics
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# "" disables sharing; file:///dir, sqlite:///path.db or redis://host:6379/0
+SHARED_CACHE_URL = os.environ.get("XRP_SHARED_CACHE", "")
+LOCK_TTL = 300  # Seconds a refresh lock is held at most (a crashed holder's lock expires)
+POLL_INTERVAL = 1.0  # Seconds between checks while another process refreshes
+
+Entry = Tuple[bytes, float]  # (encoded value, fetched_at)
+
+
+# ============================================================================
+# BACKENDS - get/set plus a leased lock per key
+# ============================================================================
+
+class FileBackend:
+    """One file per key in `directory`, replaced atomically; flock-based locks
+
+    The lock is an open file descriptor, so it disappears with a crashed
+    holder without waiting for a lease to run out. Replicas must share the
+    directory (same host or a shared volume with working flock).
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._held: Dict[str, int] = {}
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest()[:16] + suffix)
+
+    def get(self, key: str) -> Optional[Entry]:
+        try:
+            with open(self._path(key, ".bin"), "rb") as f:
+                header = f.readline()
+                return f.read(), float(header)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key: str, value: bytes, fetched_at: float):
+        path = self._path(key, ".bin")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(repr(fetched_at).encode() + b"\n")
+            f.write(value)
+        os.replace(tmp_path, path)
+
+    def acquire(self, key: str, lease: float) -> Optional[str]:
+        fd = os.open(self._path(key, ".lock"), os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return None
+        token = uuid.uuid4().hex
+        self._held[token] = fd
+        return token
+
+    def release(self, key: str, token: str):
+        fd = self._held.pop(token, None)
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def is_locked(self, key: str) -> bool:
+        token = self.acquire(key, 0)
+        if token is None:
+            return True
+        self.release(key, token)
+        return False
+
+
+class SQLiteBackend:
+    """Values and lock leases in one SQLite file shared by the replicas"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, fetched_at REAL NOT NULL);
+    CREATE TABLE IF NOT EXISTS locks (key TEXT PRIMARY KEY, token TEXT NOT NULL, expires_at REAL NOT NULL);
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30,
+                                     isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(self.SCHEMA)
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            row = self._conn.execute("SELECT value, fetched_at FROM entries WHERE key = ?",
+                                     (key,)).fetchone()
+        return (bytes(row[0]), row[1]) if row else None
+
+    def set(self, key: str, value: bytes, fetched_at: float):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO entries(key, value, fetched_at) VALUES (?, ?, ?)",
+                               (key, value, fetched_at))
+
+    def acquire(self, key: str, lease: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")  # Serializes competing replicas
+            try:
+                self._conn.execute("DELETE FROM locks WHERE key = ? AND expires_at <= ?", (key, now))
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO locks(key, token, expires_at) VALUES (?, ?, ?)",
+                    (key, token, now + lease))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return token if cursor.rowcount else None
+
+    def release(self, key: str, token: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM locks WHERE key = ? AND token = ?", (key, token))
+
+    def is_locked(self, key: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM locks WHERE key = ? AND expires_at > ?",
+                                     (key, time.time())).fetchone()
+        return row is not None
+
+
+class RedisBackend:
+    """Any Redis-protocol server; needs the optional `redis` package"""
+
+    # Delete the lock only if this holder still owns it
+    RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, url: str, prefix: str = "xrp:"):
+        import redis  # Optional dependency, only needed for this backend
+        self._redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[Entry]:
+        value, fetched_at = self._redis.hmget(self.prefix + key, "value", "fetched_at")
+        if value is None or fetched_at is None:
+            return None
+        return value, float(fetched_at)
+
+    def set(self, key: str, value: bytes, fetched_at: float):
+        self._redis.hset(self.prefix + key, mapping={"value": value, "fetched_at": repr(fetched_at)})
+
+    def acquire(self, key: str, lease: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        if self._redis.set(f"{self.prefix}{key}:lock", token, nx=True, px=int(lease * 1000)):
+            return token
+        return None
+
+    def release(self, key: str, token: str):
+        self._redis.eval(self.RELEASE_SCRIPT, 1, f"{self.prefix}{key}:lock", token)
+
+    def is_locked(self, key: str) -> bool:
+        return bool(self._redis.exists(f"{self.prefix}{key}:lock"))
+
+
+# ============================================================================
+# SINGLE-FLIGHT ACROSS PROCESSES
+# ============================================================================
+
+class SharedCache:
+    """Single-flight loading across processes on top of a backend
+
+    A process that needs a value first looks for one another process stored
+    recently enough. Otherwise it takes the key's lock and loads it. If the
+    lock is taken, it waits for the holder's value instead of loading it
+    too, so exactly one process fetches per interval.
+    """
+
+    def __init__(self, backend, lock_ttl: float = LOCK_TTL, poll_interval: float = POLL_INTERVAL):
+        self.backend = backend
+        self.lock_ttl = lock_ttl
+        self.poll_interval = poll_interval
+
+    def _fresh(self, key: str, ttl: float, newer_than: Optional[float]) -> Optional[Entry]:
+        entry = self.backend.get(key)
+        if entry is None or time.time() - entry[1] >= ttl:
+            return None
+        if newer_than is not None and entry[1] <= newer_than:
+            return None
+        return entry
+
+    def fetch(self, key: str, loader: Callable[[], object], ttl: float,
+              encode: Callable[[object], bytes], decode: Callable[[bytes], object],
+              newer_than: Optional[float] = None) -> Tuple[object, float]:
+        """(value, fetched_at) newer than `newer_than`, loaded by whichever process gets the lock"""
+        entry = self._fresh(key, ttl, newer_than)
+        if entry is not None:
+            metrics.inc("shared_cache_total", entry=key, result="hit")
+            return decode(entry[0]), entry[1]
+        token = self.backend.acquire(key, self.lock_ttl)
+        if token is not None:
+            try:
+                entry = self._fresh(key, ttl, newer_than)  # Stored between the check and the lock
+                if entry is not None:
+                    metrics.inc("shared_cache_total", entry=key, result="hit")
+                    return decode(entry[0]), entry[1]
+                value = loader()
+                fetched_at = time.time()
+                self.backend.set(key, encode(value), fetched_at)
+                metrics.inc("shared_cache_total", entry=key, result="fetch")
+                return value, fetched_at
+            finally:
+                self.backend.release(key, token)
+        deadline = time.time() + self.lock_ttl
+        while time.time() < deadline:
+            time.sleep(self.poll_interval)
+            locked = self.backend.is_locked(key)
+            entry = self._fresh(key, ttl, newer_than)
+            if entry is not None:
+                metrics.inc("shared_cache_total", entry=key, result="wait")
+                return decode(entry[0]), entry[1]
+            if not locked:
+                raise RuntimeError(f"Refresh of {key} in another process failed")
+        raise RuntimeError(f"Timed out waiting for another process to refresh {key}")
+
+
+def open_shared_cache(url: str = SHARED_CACHE_URL) -> Optional[SharedCache]:
+    """SharedCache for a file://, sqlite:// or redis(s):// URL; None when sharing is off"""
+    if not url:
+        return None
+    parsed = urlparse(url)
+    path = parsed.netloc + parsed.path  # file://relative/dir as well as file:///absolute/dir
+    if parsed.scheme == "file":
+        return SharedCache(FileBackend(path))
+    if parsed.scheme == "sqlite":
+        return SharedCache(SQLiteBackend(path))
+    if parsed.scheme in ("redis", "rediss"):
+        return SharedCache(RedisBackend(url))
+    raise ValueError(f"Unsupported shared cache URL {url!r}")
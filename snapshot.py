@@ -0,0 +1,70 @@
+"""
+Immutable balance snapshots
+One read-only, versioned object per refresh, shared by reference between sessions
+"""
+
+import time
+from types import MappingProxyType
+from typing import Dict, Iterable, Optional
+from wallets import WalletTable
+
+
+def freeze(value):
+    """Read-only deep copy: dicts become mapping proxies, lists become tuples"""
+    if isinstance(value, (dict, MappingProxyType)):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """Plain dicts and lists again, e.g. for json.dump"""
+    if isinstance(value, (dict, MappingProxyType)):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(item) for item in value]
+    return value
+
+
+class Snapshot:
+    """Wallet table of one refresh, never modified after construction
+
+    Every session reads the same instance, so nothing is copied or
+    unpickled per rerun; sessions only derive small filtered tables from
+    it. `version` changes with every refresh and identifies the snapshot
+    in caches of derived data. `ledger_index` and `close_time` stamp the
+    validated ledger the balances were read at.
+    """
+
+    __slots__ = ("version", "data", "ledger_index", "close_time", "taken_at")
+
+    def __init__(self, data: WalletTable, ledger_index: Optional[int] = None,
+                 taken_at: Optional[float] = None, version: Optional[int] = None,
+                 close_time: Optional[int] = None):
+        set_ = object.__setattr__
+        set_(self, "data", data)
+        set_(self, "ledger_index", ledger_index)
+        set_(self, "close_time", close_time)
+        set_(self, "taken_at", time.time() if taken_at is None else taken_at)
+        set_(self, "version", time.time_ns() if version is None else version)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Snapshot is immutable")
+
+    def __repr__(self) -> str:
+        return f"Snapshot(version={self.version}, ledger_index={self.ledger_index}, wallets={len(self.data)})"
+
+    def view(self, exchanges: Iterable[str]) -> WalletTable:
+        """Wallets of the given exchanges only"""
+        return self.data.select(exchanges)
+
+    def to_dict(self) -> Dict:
+        return {"version": self.version, "ledger_index": self.ledger_index,
+                "close_time": self.close_time, "taken_at": self.taken_at,
+                "table": self.data.to_columns()}
+
+    @classmethod
+    def from_dict(cls, raw: Dict) -> "Snapshot":
+        return cls(WalletTable.from_columns(raw["table"]), raw.get("ledger_index"),
+                   raw.get("taken_at"), raw.get("version"), raw.get("close_time"))
@@ -0,0 +1,309 @@
+"""
+Incremental balance tracking from the XRP Ledger `accounts` stream
+A full account_info sweep seeds the state; validated transactions keep it current, and
+every closed ledger publishes a consistent view of it to listeners
+"""
+
+import os
+import asyncio
+import logging
+import threading
+import time
+import aiohttp
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+from metrics import metrics
+from rippled import RIPPLE_EPOCH, dead_accounts, fetch_balances, is_transport_error, remember_close_time
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+RIPPLED_WS_URLS = [
+    "wss://s1.ripple.com",
+    "wss://s2.ripple.com",
+    "wss://xrplcluster.com",
+]
+if os.environ.get("XRP_RIPPLED_WS_URLS"):  # e.g. point at a local stub rippled
+    RIPPLED_WS_URLS = [url.strip() for url in os.environ["XRP_RIPPLED_WS_URLS"].split(",") if url.strip()]
+STREAM_ENABLED = os.environ.get("XRP_STREAM", "1") != "0"
+RECONNECT_DELAY = 5  # Seconds between connection attempts
+HEARTBEAT = 30  # WebSocket ping interval (s)
+RETRY_INTERVAL = 30  # Seconds between re-fetches of addresses a sweep failed on
+
+
+class ResyncNeeded(Exception):
+    """The in-memory state can no longer be trusted; a full sweep is required"""
+
+
+# ============================================================================
+# TRANSACTION METADATA
+# ============================================================================
+
+def balance_changes(meta: Dict) -> List[Tuple[str, Optional[int], int]]:
+    """(account, previous drops or None, final drops) for every AccountRoot touched"""
+    changes = []
+    for wrapper in meta.get("AffectedNodes", []):
+        kind, node = next(iter(wrapper.items()))
+        if node.get("LedgerEntryType") != "AccountRoot":
+            continue
+        if kind == "CreatedNode":
+            fields = node.get("NewFields", {})
+            changes.append((fields.get("Account"), None, int(fields.get("Balance", 0))))
+            continue
+        final = node.get("FinalFields", {})
+        previous = node.get("PreviousFields", {})
+        if kind == "DeletedNode":
+            changes.append((final.get("Account"), int(final.get("Balance", 0)), 0))
+        elif "Balance" in previous:
+            changes.append((final.get("Account"), int(previous["Balance"]), int(final["Balance"])))
+    return changes
+
+
+# ============================================================================
+# BALANCE STREAM
+# ============================================================================
+
+class BalanceStream:
+    """Keeps tracked balances current from the rippled `accounts` stream
+
+    A full sweep runs on (re)connect and whenever a ledger gap or a balance
+    mismatch is detected; in between, every validated transaction touching a
+    tracked account is applied as a balance delta. Runs its own event loop on
+    a daemon thread.
+
+    rippled publishes a ledger's transactions after its ledgerClosed
+    message, so each ledgerClosed completes the ledger before it. Only then
+    are balances published: balances() never mixes two ledgers, and
+    `on_ledger` listeners hear of every completed ledger together with the
+    last ledger in which a tracked balance changed.
+
+    Addresses whose account_info failed in transport during a sweep are
+    re-fetched at the last completed ledger every RETRY_INTERVAL seconds
+    until they succeed, so a quiet wallet does not stay stale until the next
+    reconnect.
+    """
+
+    def __init__(self, addresses: List[str], sweep: Callable = fetch_balances):
+        self.addresses = list(addresses)
+        self._tracked = set(self.addresses)
+        self._sweep = sweep
+        self._lock = threading.Lock()
+        self._drops: Dict[str, int] = {}
+        self._errors: Dict[str, str] = {}
+        self._published: Dict[str, Tuple[int, Optional[str]]] = {}
+        self._listeners: List[Callable[[int, Optional[int], int], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.ledger_index: Optional[int] = None  # Ledger the published balances are complete for
+        self.close_time: Optional[int] = None  # Its close time (Unix seconds), None after a sweep
+        self.changed_ledger: Optional[int] = None  # Last ledger a tracked balance changed in
+        self._open: Tuple[Optional[int], Optional[int]] = (None, None)  # Last ledgerClosed and its time
+        self._swept_ledger: Optional[int] = None
+        self._retry: Optional[asyncio.Task] = None
+        self._retried_at = 0.0
+        self.ready = False
+        self.sweeps = 0
+        self.applied = 0
+        self.last_sweep_at: Optional[float] = None
+
+    # ------------------------------------------------------------------ API
+
+    def start(self) -> "BalanceStream":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._thread_main, name="balance-stream",
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def balances(self) -> Tuple[Dict[str, Tuple[int, Optional[str]]], Optional[int]]:
+        """Current state in the same shape as rippled.fetch_balances"""
+        balances, ledger_index, _ = self.published()
+        return balances, ledger_index
+
+    def published(self) -> Tuple[Dict[str, Tuple[int, Optional[str]]], Optional[int], Optional[int]]:
+        """(balances, ledger index, close time) as of the last completed ledger"""
+        with self._lock:
+            return dict(self._published), self.ledger_index, self.close_time
+
+    def on_ledger(self, callback: Callable[[int, Optional[int], int], None]):
+        """Call `callback(ledger_index, close_time, changed_ledger)` for every completed ledger
+
+        Runs on the stream's thread and must return quickly.
+        """
+        self._listeners.append(callback)
+
+    # ------------------------------------------------------------- internals
+
+    def _thread_main(self):
+        asyncio.run(self._run())
+
+    async def _run(self):
+        attempt = 0
+        while not self._stop.is_set():
+            url = RIPPLED_WS_URLS[attempt % len(RIPPLED_WS_URLS)]
+            attempt += 1
+            try:
+                await self._follow(url)
+            except Exception as e:
+                logger.warning("Balance stream on %s dropped: %s", url, e)
+            with self._lock:
+                self.ready = False
+            if not self._stop.is_set():
+                await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _follow(self, url: str):
+        async with aiohttp.ClientSession() as session:
+            async with session.ws_connect(url, heartbeat=HEARTBEAT) as ws:
+                await ws.send_json({"id": "subscribe", "command": "subscribe",
+                                    "accounts": self.addresses, "streams": ["ledger"]})
+                # Messages that arrive during the sweep queue up in the socket
+                # and are replayed against the swept state below.
+                await self._resync()
+                last_closed = None
+                async for message in ws:
+                    if self._stop.is_set():
+                        return
+                    if message.type != aiohttp.WSMsgType.TEXT:
+                        break
+                    try:
+                        last_closed = self._handle(message.json(), last_closed)
+                    except ResyncNeeded as e:
+                        logger.info("Resyncing balance stream: %s", e)
+                        await self._resync()
+                        last_closed = None
+
+    async def _resync(self):
+        """Full account_info sweep; the stream resumes after its ledger"""
+        with self._lock:
+            self.ready = False
+        loop = asyncio.get_running_loop()
+        balances, ledger_index = await loop.run_in_executor(None, self._sweep, self.addresses)
+        with self._lock:
+            for address, (drops, error) in balances.items():
+                if error:
+                    self._errors[address] = error
+                    continue
+                self._errors.pop(address, None)
+                self._drops[address] = drops
+            self._swept_ledger = ledger_index
+            self._publish(ledger_index, None)
+            self.changed_ledger = ledger_index
+            self.sweeps += 1
+            self.last_sweep_at = time.time()
+            self.ready = True
+        self._notify()
+
+    def _publish(self, ledger_index: Optional[int], close_time: Optional[int]):
+        """Freeze the working balances as those of `ledger_index`; call with the lock held"""
+        self._published = {addr: (self._drops.get(addr, 0), self._errors.get(addr))
+                           for addr in self.addresses}
+        self.ledger_index = ledger_index
+        self.close_time = close_time
+
+    def _notify(self):
+        with self._lock:
+            ledger_index, close_time, changed = self.ledger_index, self.close_time, self.changed_ledger
+        if ledger_index is None:
+            return
+        for callback in self._listeners:
+            try:
+                callback(ledger_index, close_time, changed)
+            except Exception:
+                logger.exception("Ledger listener failed")
+
+    def _handle(self, data: Dict, last_closed: Optional[int]) -> Optional[int]:
+        """Apply one stream message; returns the last closed ledger seen"""
+        kind = data.get("type")
+        if kind == "ledgerClosed":
+            index = int(data["ledger_index"])
+            if last_closed is not None and index > last_closed + 1:
+                raise ResyncNeeded(f"ledger gap {last_closed} -> {index}")
+            close_time = int(data["ledger_time"]) + RIPPLE_EPOCH if "ledger_time" in data else None
+            if close_time is not None:
+                remember_close_time(index, close_time)
+            completed = False
+            with self._lock:
+                previous, previous_time = self._open
+                self._open = (index, close_time)
+                # The previous ledgerClosed's transactions have all arrived by now
+                if previous == index - 1 and (self.ledger_index is None or previous > self.ledger_index):
+                    self._publish(previous, previous_time)
+                    completed = True
+            if completed:
+                self._notify()
+                self._schedule_retry(previous)
+            return index
+        if kind == "response" and data.get("status") == "error":
+            raise ConnectionError(f"subscribe rejected: {data.get('error')}")
+        if kind == "transaction" and data.get("validated"):
+            self._apply(data)
+        return last_closed
+
+    def _schedule_retry(self, ledger_index: int):
+        """Start re-fetching failed addresses at `ledger_index` unless one ran recently or still runs"""
+        if self._retry is not None and not self._retry.done():
+            return
+        if time.time() - self._retried_at < RETRY_INTERVAL:
+            return
+        with self._lock:
+            failed = [addr for addr, error in self._errors.items() if is_transport_error(error)]
+        if failed:
+            self._retried_at = time.time()
+            self._retry = asyncio.get_running_loop().create_task(self._retry_failed(failed, ledger_index))
+
+    async def _retry_failed(self, failed: List[str], ledger_index: int):
+        """Fold balances of `failed` read at the completed `ledger_index` into the working state"""
+        metrics.inc("fetch_retries_total", len(failed))
+        sweeps = self.sweeps
+        loop = asyncio.get_running_loop()
+        try:
+            balances, _ = await loop.run_in_executor(None, partial(self._sweep, failed,
+                                                                   ledger_index=ledger_index))
+        except Exception as e:
+            logger.warning("Re-fetching %d failed addresses failed: %s", len(failed), e)
+            return
+        with self._lock:
+            if self.sweeps != sweeps:
+                return  # A sweep after `ledger_index` replaced the state meanwhile
+            recovered = 0
+            for address, (drops, error) in balances.items():
+                if address not in self._errors:
+                    continue  # A transaction after `ledger_index` settled it
+                if error:
+                    self._errors[address] = error
+                    continue
+                del self._errors[address]
+                self._drops[address] = drops
+                recovered += 1
+            if recovered:
+                # Visible from the next published ledger on, which the collector must not skip as quiet
+                self.changed_ledger = max(self.changed_ledger or 0, self._open[0] or ledger_index)
+        logger.info("Recovered %d of %d failed addresses at ledger %s", recovered, len(failed), ledger_index)
+
+    def _apply(self, data: Dict):
+        tx_ledger = data.get("ledger_index")
+        with self._lock:
+            if self._swept_ledger is not None and tx_ledger is not None \
+                    and tx_ledger <= self._swept_ledger:
+                return  # already part of the swept state
+            for account, previous, final in balance_changes(data.get("meta", {})):
+                if account not in self._tracked:
+                    continue
+                dead_accounts.discard(account)  # Activity: it exists now
+                current = self._drops.get(account)
+                if current is None or previous is None:
+                    self._drops[account] = final
+                elif current != previous:
+                    raise ResyncNeeded(f"balance mismatch on {account}")
+                else:
+                    self._drops[account] = current + (final - previous)
+                self._errors.pop(account, None)
+                if tx_ledger is not None:
+                    self.changed_ledger = max(self.changed_ledger or 0, tx_ledger)
+                self.applied += 1
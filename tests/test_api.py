@@ -0,0 +1,109 @@
+"""HTTP API against a stub collector: conditional GETs, gzip, parameter errors and history streaming"""
+
+import gzip
+import json
+import time
+import asyncio
+from datetime import datetime, timezone
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from api import make_app
+from history import HistoryStore
+from holdings import EXCHANGES, REGISTRY
+from snapshot import Snapshot
+from wallets import WalletTable
+
+
+class StubSource:
+    """Collector.latest() look-alike; ages are recomputed on every read like the real one"""
+
+    def __init__(self):
+        balances = {address: (1_000_000 * (i + 1), None) for i, address in enumerate(REGISTRY.addresses)}
+        self.snapshot = Snapshot(WalletTable.build(REGISTRY, balances, 1234), 1234, close_time=1_700_000_000)
+        self.fetched_at = time.time() - 10
+        self.price = {"price": 2.5, "change_24h": 1.0, "sources": {"binance": 2.5}, "error": None,
+                      "fetched_at": time.time() - 5}
+
+    def latest(self):
+        return dict(snapshot=self.snapshot, data=self.snapshot.data, ledger_index=1234,
+                    close_time=self.snapshot.close_time, version=self.snapshot.version,
+                    fetched_at=self.fetched_at, age=time.time() - self.fetched_at, refreshing=False,
+                    error=None, price=dict(self.price, age=time.time() - self.price["fetched_at"]))
+
+
+@pytest.fixture
+def source():
+    return StubSource()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    yield store
+    store.close()
+
+
+def request(source, store, *calls):
+    """Run (path, headers) requests against a fresh app; returns (status, headers, raw body) each"""
+    async def run():
+        client = TestClient(TestServer(make_app(source, store)))
+        await client.start_server()
+        try:
+            results = []
+            for path, headers in calls:
+                response = await client.get(path, headers={"Accept-Encoding": "identity", **headers},
+                                            auto_decompress=False)
+                results.append((response.status, response.headers, await response.read()))
+            return results
+        finally:
+            await client.close()
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("path", ["/v1/snapshot", "/v1/summary"])
+def test_repeat_requests_are_not_modified(source, store, path):
+    (status, headers, body), = request(source, store, (path, {}))
+    assert status == 200 and headers["ETag"]
+    again = request(source, store, (path, {"If-None-Match": headers["ETag"]}),
+                    (path, {"If-Modified-Since": headers["Last-Modified"]}))
+    assert [status for status, _, _ in again] == [304, 304]
+    assert again[0][1]["ETag"] == headers["ETag"]
+
+
+def test_snapshot_serves_no_per_read_fields(source, store):
+    (_, _, body), = request(source, store, ("/v1/snapshot", {}))
+    meta = json.loads(body)
+    assert meta["version"] and meta["price"]["price"] == 2.5
+    assert "age" not in meta["price"]
+
+
+def test_gzip_when_accepted(source, store):
+    (_, headers, body), = request(source, store, ("/v1/summary?fields=exchange,balance", {"Accept-Encoding": "gzip"}))
+    assert headers["Content-Encoding"] == "gzip"
+    rows = json.loads(gzip.decompress(body))
+    assert set(rows[0]) == {"exchange", "balance"}
+    assert {row["exchange"] for row in rows} == set(EXCHANGES)
+
+
+def test_filters(source, store):
+    exchange = next(iter(EXCHANGES))
+    (status, _, body), = request(source, store, (f"/v1/wallets?exchanges={exchange}&fields=address,drops", {}))
+    rows = json.loads(body)
+    assert status == 200 and len(rows) == len(EXCHANGES[exchange])
+    assert set(rows[0]) == {"address", "drops"}
+
+
+@pytest.mark.parametrize("query", ["fields=nope", "exchanges=nope", "format=xml", "benchmark=yesterday"])
+def test_bad_parameters_are_400(source, store, query):
+    (status, _, body), = request(source, store, (f"/v1/summary?{query}", {}))
+    assert status == 400 and "error" in json.loads(body)
+
+
+def test_history_streams_stored_rows(source, store):
+    taken_at = datetime(2025, 3, 1, 12, tzinfo=timezone.utc)
+    store.record_drops({address: 5_000_000 for address in REGISTRY.addresses[:3]}, 99, taken_at)
+    (status, headers, body), = request(source, store, ("/v1/history?start=2025-03-01&end=2025-03-01&format=ndjson", {}))
+    rows = [json.loads(line) for line in body.splitlines()]
+    assert status == 200 and "Content-Length" not in headers
+    assert sorted(row["address"] for row in rows) == sorted(REGISTRY.addresses[:3])
+    assert {(row["drops"], row["ledger_index"]) for row in rows} == {(5_000_000, 99)}
@@ -0,0 +1,98 @@
+"""Stale-while-revalidate entries: last good value, single flight, failures and touch()"""
+
+import time
+import threading
+from cache import SWREntry
+
+
+class Loader:
+    """Loader that blocks until released and counts its calls; raises while `fail` is set"""
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+        self.release = threading.Event()
+        self.release.set()
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("source down")
+        return f"value {call}"
+
+
+def test_first_value_and_fresh_reads_do_not_reload():
+    loader = Loader()
+    entry = SWREntry("test", loader, ttl=60)
+    loader.release.clear()
+    assert entry.get()["value"] is None  # Never blocks, even cold
+    loader.release.set()
+    entry.wait_for_value(5)
+    got = entry.get()
+    assert got["value"] == "value 1" and got["error"] is None and got["age"] < 1
+    assert loader.calls == 1
+
+
+def test_concurrent_stale_reads_start_one_refresh():
+    loader = Loader()
+    entry = SWREntry("test", loader, ttl=60)
+    entry.refresh(wait=True)
+    entry.fetched_at -= 120  # Stale
+    loader.release.clear()
+    readers = [threading.Thread(target=entry.get) for _ in range(20)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    got = entry.get()
+    assert got["value"] == "value 1" and got["refreshing"]  # Old value served during the refresh
+    loader.release.set()
+    assert not entry.refresh(wait=True)  # Joins the running refresh instead of starting another
+    assert loader.calls == 2
+    assert entry.get()["value"] == "value 2"
+
+
+def test_failed_refresh_keeps_value_and_waits_before_retrying():
+    loader = Loader()
+    entry = SWREntry("test", loader, ttl=60, retry_delay=30)
+    entry.refresh(wait=True)
+    entry.fetched_at -= 120
+    loader.fail = True
+    entry.refresh(wait=True)
+    got = entry.get(revalidate=False)
+    assert got["value"] == "value 1" and got["error"] == "source down"
+    assert 29 < entry.seconds_until_due() <= 30  # Retried after retry_delay, not on every read
+    entry.get()
+    assert loader.calls == 2
+
+    entry.failed_at -= 31
+    loader.fail = False
+    assert entry.seconds_until_due() <= 0
+    entry.refresh(wait=True)
+    got = entry.get(revalidate=False)
+    assert got["value"] == "value 3" and got["error"] is None
+
+
+def test_touch_resets_age_without_reloading():
+    loader = Loader()
+    entry = SWREntry("test", loader, ttl=60)
+    entry.refresh(wait=True)
+    entry.fetched_at -= 120
+    entry.touch()
+    assert entry.age() < 1 and entry.seconds_until_due() > 50
+    entry.get()
+    assert loader.calls == 1
+
+
+def test_seed_until_first_refresh():
+    loader = Loader()
+    entry = SWREntry("test", loader, ttl=60)
+    entry.seed("stored", time.time() - 3600)
+    assert entry.get(revalidate=False)["value"] == "stored"
+    entry.refresh(wait=True)
+    entry.seed("older", time.time())  # Ignored once a value exists
+    assert entry.get(revalidate=False)["value"] == "value 1"
@@ -0,0 +1,146 @@
+"""Endpoint health: ranking, circuit breaking and adaptive concurrency limits, driven through record()"""
+
+import time
+import endpoints
+from endpoints import (CLOSED, FAILURE_THRESHOLD, HALF_OPEN, INITIAL_LIMIT, MAX_LIMIT,
+                       MIN_LIMIT, MIN_SAMPLES, OPEN, EndpointManager)
+
+A, B, C = "http://a", "http://b", "http://c"
+
+
+def state(manager: EndpointManager, url: str) -> dict:
+    return next(row for row in manager.snapshot() if row["url"] == url)
+
+
+def busy(manager: EndpointManager, url: str, slots: int):
+    """Hold `slots` requests in flight on `url`, as a loaded fetch engine would"""
+    for _ in range(slots):
+        assert manager.try_acquire([url]) == url
+
+
+# ============================================================================
+# RANKING AND CIRCUIT BREAKING
+# ============================================================================
+
+def test_ranked_by_latency_and_errors():
+    manager = EndpointManager([A, B, C])
+    for _ in range(MIN_SAMPLES):
+        manager.record(A, 0.15, True)
+        manager.record(B, 0.10, True)
+    assert manager.ranked()[:2] == [B, A]
+    for _ in range(3):  # Fast but failing: 0.1 * (1 + 4 * 3/13) > 0.15
+        manager.record(B, 0.10, False)
+    assert manager.ranked()[:2] == [A, B]
+
+
+def test_consecutive_failures_open_the_circuit():
+    manager = EndpointManager([A, B])
+    manager.record(A, 0.01, True)
+    for _ in range(FAILURE_THRESHOLD - 1):
+        manager.record(A, 0.01, False)
+    assert state(manager, A)["state"] == CLOSED
+    manager.record(A, 0.01, False)
+    assert state(manager, A)["state"] == OPEN
+    assert manager.ranked() == [B, A]  # Open circuits only as a last resort
+
+
+def test_a_success_resets_the_failure_streak():
+    manager = EndpointManager([A])
+    for _ in range(4 * FAILURE_THRESHOLD):  # Keeps the error rate low
+        manager.record(A, 0.01, True)
+    for _ in range(2):
+        for _ in range(FAILURE_THRESHOLD - 1):
+            manager.record(A, 0.01, False)
+        manager.record(A, 0.01, True)
+    assert state(manager, A)["state"] == CLOSED
+
+
+def test_error_rate_opens_the_circuit():
+    manager = EndpointManager([A])
+    for i in range(MIN_SAMPLES):  # Alternating: never two failures in a row
+        manager.record(A, 0.01, i % 2 == 0)
+    assert state(manager, A)["state"] == OPEN
+
+
+def test_half_open_probe_after_cooldown(monkeypatch):
+    manager = EndpointManager([A, B])
+    for _ in range(FAILURE_THRESHOLD):
+        manager.record(A, 0.01, False)
+    assert manager.ranked() == [B, A]
+
+    monkeypatch.setattr(endpoints, "CIRCUIT_COOLDOWN", 0)
+    manager.ranked()
+    assert state(manager, A)["state"] == HALF_OPEN
+    assert state(manager, A)["error_rate"] == 0  # Probed with a clean slate
+
+    manager.record(A, 0.01, False)  # A failed probe opens it again at once
+    assert state(manager, A)["state"] == OPEN
+    manager.ranked()
+    manager.record(A, 0.01, True)  # A good probe closes it
+    assert state(manager, A)["state"] == CLOSED
+
+
+# ============================================================================
+# ADAPTIVE CONCURRENCY LIMITS
+# ============================================================================
+
+def test_additive_increase_of_a_used_limit():
+    manager = EndpointManager([A])
+    busy(manager, A, INITIAL_LIMIT)
+    for _ in range(INITIAL_LIMIT):
+        manager.record(A, 0.1, True, started=time.monotonic())
+    assert state(manager, A)["limit"] == INITIAL_LIMIT  # About one step per limit's worth
+    manager.record(A, 0.1, True, started=time.monotonic())
+    assert state(manager, A)["limit"] == INITIAL_LIMIT + 1
+
+    for _ in range(MAX_LIMIT ** 2):
+        manager.try_acquire([A])  # Keep every slot the limit grants busy
+        manager.record(A, 0.1, True, started=time.monotonic())
+    assert state(manager, A)["limit"] == MAX_LIMIT
+
+
+def test_an_unused_limit_does_not_grow():
+    manager = EndpointManager([A])
+    for _ in range(4 * INITIAL_LIMIT):
+        manager.record(A, 0.1, True, started=time.monotonic())
+    assert state(manager, A)["limit"] == INITIAL_LIMIT
+
+
+def test_overload_halves_once_per_round_without_tripping_the_circuit():
+    manager = EndpointManager([A])
+    round_started = time.monotonic()
+    busy(manager, A, INITIAL_LIMIT)
+    for _ in range(2 * MIN_SAMPLES):  # Every request of the round comes back 429
+        manager.record(A, 0.1, False, overloaded=True, started=round_started)
+    row = state(manager, A)
+    assert row["limit"] == INITIAL_LIMIT // 2
+    assert row["state"] == CLOSED and row["failures"] == 2 * MIN_SAMPLES
+
+    # Requests sent after the cut cut again, down to the floor
+    for _ in range(10):
+        manager.record(A, 0.1, False, overloaded=True, started=time.monotonic() + 1)
+    assert state(manager, A)["limit"] == MIN_LIMIT
+    assert state(manager, A)["state"] == CLOSED
+    assert [row["limit"] for row in manager.limit_history()][:3] == [INITIAL_LIMIT, 4, 2]
+
+
+def test_plain_failures_leave_the_limit_alone():
+    manager = EndpointManager([A])
+    for _ in range(FAILURE_THRESHOLD):
+        manager.record(A, 0.1, False, started=time.monotonic())
+    assert state(manager, A)["limit"] == INITIAL_LIMIT
+    assert state(manager, A)["state"] == OPEN
+
+
+def test_latency_rise_backs_off_once_per_round():
+    manager = EndpointManager([A])
+    busy(manager, A, INITIAL_LIMIT)
+    manager.record(A, 0.1, True, started=time.monotonic(), kind="account_info")
+    round_started = time.monotonic()
+    for _ in range(3):  # Past LATENCY_TOLERANCE times the baseline: queueing
+        manager.record(A, 0.5, True, started=round_started, kind="account_info")
+    assert state(manager, A)["limit"] == int(INITIAL_LIMIT * endpoints.LATENCY_BACKOFF)
+
+    # A slower kind of request has its own baseline and is not mistaken for queueing
+    manager.record(A, 2.0, True, started=time.monotonic() + 1, kind="ledger_data")
+    assert state(manager, A)["limit"] == int(INITIAL_LIMIT * endpoints.LATENCY_BACKOFF)
@@ -0,0 +1,46 @@
+"""Address validation and duplicate handling of the exchange registry"""
+
+import json
+from fake_rippled import make_address
+from registry import Registry, address_error, is_valid_address
+
+GOOD = make_address("good")
+OTHER = make_address("other")
+
+
+def test_valid_address():
+    assert is_valid_address(GOOD)
+    assert is_valid_address("rDxJNbV23mu9xsWoQHoBqZQvc77YcbJXwb")
+
+
+def test_rejects_bad_base58check():
+    # Listed under coinbase in exchanges.json, one character short of an account ID
+    assert address_error("rJUkHKXn7fonFnYs5aP1igXZ3Y1xzKB1") == "not an account address"
+    assert address_error(GOOD[:-1] + ("a" if GOOD[-1] != "a" else "b")) == "bad checksum"
+    assert address_error(GOOD[:5] + "0" + GOOD[6:]).startswith("invalid character")
+    assert address_error("rShort").startswith("length")
+
+
+def test_invalid_addresses_are_dropped_and_reported():
+    registry = Registry.from_dict({"kraken": {GOOD: "Kraken 1", "rJUkHKXn7fonFnYs5aP1igXZ3Y1xzKB1": "Bad"}})
+    assert registry.addresses == [GOOD]
+    assert [problem["address"] for problem in registry.invalid] == ["rJUkHKXn7fonFnYs5aP1igXZ3Y1xzKB1"]
+
+
+def test_duplicates_are_flagged_and_first_listing_wins():
+    registry = Registry.from_dict({"binance": {GOOD: "Binance 1"},
+                                   "kraken": {GOOD: "Kraken 1", OTHER: "Kraken 2"}})
+    assert registry.addresses == [GOOD, OTHER]
+    assert registry.exchange_of(GOOD) == "binance"
+    assert registry.duplicates == [{"address": GOOD, "label": "Kraken 1",
+                                    "exchanges": ["binance", "kraken"]}]
+
+
+def test_repeated_keys_in_the_file_are_kept_as_duplicates(tmp_path):
+    path = tmp_path / "exchanges.json"
+    path.write_text('{"kraken": {%s: "Kraken 1", %s: "Kraken 1 again"}}'
+                    % (json.dumps(GOOD), json.dumps(GOOD)))
+    registry = Registry.from_file(str(path))
+    assert registry.addresses == [GOOD]
+    assert registry.label_of(GOOD) == "Kraken 1"
+    assert registry.duplicates[0]["exchanges"] == ["kraken", "kraken"]
@@ -0,0 +1,77 @@
+"""Rich list scan against the fake rippled's fixture ledger, checked by brute force"""
+
+import pytest
+import richlist
+from fake_rippled import FakeRippled, make_address
+from registry import Registry
+from richlist import RichListScan, load_checkpoint, run_scan
+from rippled import RippledError, check_reply
+
+POPULATION = 3000
+TOP_K = 50
+SHARDS = 4
+
+REGISTRY = Registry.from_dict({
+    "binance": {make_address(f"binance{i}"): f"Binance {i}" for i in range(4)},
+    "kraken": {make_address(f"kraken{i}"): f"Kraken {i}" for i in range(3)},
+})
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    """Fixture ledger answering the scan's ledger_data calls in-process"""
+    fake = FakeRippled(population=POPULATION, holders=REGISTRY.addresses)
+    monkeypatch.setattr(richlist, "rpc", lambda data: check_reply(fake.call(data)))
+    return fake
+
+
+def new_scan(fake: FakeRippled) -> RichListScan:
+    tracked = {address: fake.balance(address) for address in REGISTRY.addresses}
+    return RichListScan(fake.ledger_index, 0, tracked, TOP_K, SHARDS)
+
+
+def brute_force(fake: FakeRippled):
+    accounts = [fake.synthetic_account(i)[1:] for i in range(POPULATION)]
+    accounts += [(address, fake.balance(address)) for address in REGISTRY.addresses]
+    return accounts
+
+
+def check(result, fake: FakeRippled):
+    accounts = brute_force(fake)
+    assert result["accounts"] == len(accounts)
+    assert result["total_drops"] == sum(drops for _, drops in accounts)
+    top = sorted(((drops, address) for address, drops in accounts), reverse=True)[:TOP_K]
+    assert [(entry["drops"], entry["address"]) for entry in result["top"]] == top
+    assert [entry["rank"] for entry in result["top"]] == list(range(1, TOP_K + 1))
+    for address in REGISTRY.addresses:
+        drops = fake.balance(address)
+        assert result["ranks"][address] == 1 + sum(1 for _, other in accounts if other > drops)
+    assert sum(bucket["accounts"] for bucket in result["histogram"]) == len(accounts)
+    assert result["exchanges"]["kraken"] == sum(fake.balance(address) for address in REGISTRY.exchanges["kraken"])
+
+
+def test_full_scan_matches_brute_force(fake, tmp_path):
+    scan = new_scan(fake)
+    assert run_scan(scan, str(tmp_path / "checkpoint.json"))
+    check(scan.result(REGISTRY), fake)
+
+
+def test_resume_from_checkpoint_counts_every_account_once(fake, tmp_path, monkeypatch):
+    checkpoint = str(tmp_path / "checkpoint.json")
+    calls = []
+
+    def failing_rpc(data):
+        calls.append(data)
+        if len(calls) > 5:
+            raise RippledError("node went away")
+        return check_reply(fake.call(data))
+
+    monkeypatch.setattr(richlist, "rpc", failing_rpc)
+    with pytest.raises(RippledError):
+        run_scan(new_scan(fake), checkpoint)
+    partial = load_checkpoint(checkpoint)
+    assert 0 < partial.accounts < POPULATION and not partial.done
+
+    monkeypatch.setattr(richlist, "rpc", lambda data: check_reply(fake.call(data)))
+    assert run_scan(partial, checkpoint)
+    check(partial.result(REGISTRY), fake)
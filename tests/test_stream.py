@@ -0,0 +1,140 @@
+"""Balance stream against an in-process fake rippled: deltas, ledger gaps and failed-address retries"""
+
+import time
+import asyncio
+import pytest
+import stream
+from fake_rippled import FakeRippled, make_address
+from stream import BalanceStream, ResyncNeeded
+
+WALLETS = [make_address(f"wallet{i}") for i in range(6)]
+
+
+def account_info(fake: FakeRippled, address: str) -> int:
+    result = fake.call({"method": "account_info", "params": [{"account": address}]})["result"]
+    return int(result["account_data"]["Balance"])
+
+
+def sweeper(fake: FakeRippled):
+    """fetch_balances stand-in reading the fake on its own loop, so no ledger closes mid-sweep"""
+    def sweep(addresses, ledger_index=None):
+        async def read():
+            return {address: (account_info(fake, address), None) for address in addresses}, fake.ledger_index
+        return asyncio.run_coroutine_threadsafe(read(), fake._loop).result(5)
+    return sweep
+
+
+def wait_until(condition, timeout: float = 10):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    fake = FakeRippled(ledger_interval=0.05, tx_per_ledger=4, seed=1)
+    _, ws_urls = fake.start()
+    monkeypatch.setattr(stream, "RIPPLED_WS_URLS", ws_urls)
+    return fake
+
+
+def settle(fake: FakeRippled, balance_stream: BalanceStream) -> int:
+    """Stop payments and wait until the stream published a ledger after the last one"""
+    fake.tx_per_ledger = 0
+    quiet_from = fake.ledger_index + 2  # The ledger closing now may still carry payments
+    wait_until(lambda: (balance_stream.ledger_index or 0) >= quiet_from)
+    return quiet_from
+
+
+# ============================================================================
+# IN-PROCESS STREAM
+# ============================================================================
+
+def test_published_balances_match_a_fresh_sweep(fake):
+    balance_stream = BalanceStream(WALLETS, sweep=sweeper(fake)).start()
+    try:
+        wait_until(lambda: balance_stream.ready)
+        start = fake.ledger_index
+        wait_until(lambda: (balance_stream.ledger_index or 0) >= start + 5)
+        settle(fake, balance_stream)
+        balances, _, close_time = balance_stream.published()
+    finally:
+        balance_stream.stop()
+    assert balances == {address: (account_info(fake, address), None) for address in WALLETS}
+    assert balance_stream.applied >= 5 * 4 * 2  # Both sides of every payment, as deltas
+    assert balance_stream.sweeps == 1  # No PreviousFields mismatch along the way
+    assert close_time is not None
+
+
+def test_skipped_ledger_forces_a_resync(fake):
+    balance_stream = BalanceStream(WALLETS, sweep=sweeper(fake)).start()
+    try:
+        wait_until(lambda: balance_stream.ready)
+        start = fake.ledger_index
+        wait_until(lambda: (balance_stream.ledger_index or 0) >= start + 2)
+
+        def skip():
+            fake.ledger_index += 1  # The next ledgerClosed jumps one index
+        fake._loop.call_soon_threadsafe(skip)
+        wait_until(lambda: balance_stream.sweeps == 2)
+        settle(fake, balance_stream)
+        balances, _, _ = balance_stream.published()
+    finally:
+        balance_stream.stop()
+    assert balances == {address: (account_info(fake, address), None) for address in WALLETS}
+
+
+# ============================================================================
+# MESSAGE HANDLING
+# ============================================================================
+
+def closed(index: int):
+    return {"type": "ledgerClosed", "ledger_index": index}
+
+
+def payment(ledger_index: int, source: str, before: int, after: int):
+    return {"type": "transaction", "validated": True, "ledger_index": ledger_index, "meta": {
+        "AffectedNodes": [{"ModifiedNode": {"LedgerEntryType": "AccountRoot",
+                                            "FinalFields": {"Account": source, "Balance": str(after)},
+                                            "PreviousFields": {"Balance": str(before)}}}]}}
+
+
+def test_gap_and_mismatch_raise_resync_needed():
+    balance_stream = BalanceStream(WALLETS[:1], sweep=lambda addresses: ({WALLETS[0]: (100, None)}, 9))
+    asyncio.run(balance_stream._resync())
+    assert balance_stream._handle(closed(10), None) == 10
+    balance_stream._handle(payment(10, WALLETS[0], 100, 80), 10)
+    assert balance_stream._handle(closed(11), 10) == 11
+    assert balance_stream.published()[0] == {WALLETS[0]: (80, None)}
+
+    with pytest.raises(ResyncNeeded, match="balance mismatch"):
+        balance_stream._handle(payment(11, WALLETS[0], 100, 50), 11)  # Expected 80 before
+    with pytest.raises(ResyncNeeded, match="ledger gap"):
+        balance_stream._handle(closed(13), 11)
+
+
+def test_failed_addresses_are_retried_at_the_completed_ledger():
+    good, flaky = WALLETS[:2]
+    calls = []
+
+    def sweep(addresses, ledger_index=None):
+        calls.append((list(addresses), ledger_index))
+        if ledger_index is None:
+            return {good: (100, None), flaky: (0, "timeout")}, 9
+        return {flaky: (500, None)}, ledger_index
+
+    async def scenario():
+        balance_stream = BalanceStream([good, flaky], sweep=sweep)
+        await balance_stream._resync()
+        assert balance_stream.published()[0][flaky] == (0, "timeout")
+        balance_stream._handle(closed(10), None)
+        balance_stream._handle(closed(11), 10)  # Completes ledger 10: retry at 10
+        await balance_stream._retry
+        balance_stream._handle(closed(12), 11)
+        return balance_stream
+
+    balance_stream = asyncio.run(scenario())
+    assert calls == [([good, flaky], None), ([flaky], 10)]
+    assert balance_stream.published()[0] == {good: (100, None), flaky: (500, None)}
+    assert balance_stream.changed_ledger >= 11  # The recovered balance is not skipped as quiet
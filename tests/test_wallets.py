@@ -0,0 +1,41 @@
+"""Per-exchange totals of the columnar wallet table, in exact int64 drops"""
+
+from fake_rippled import make_address
+from registry import Registry
+from wallets import WalletTable
+
+A, B, C, D = (make_address(seed) for seed in "abcd")
+BIG = 2 ** 53 + 1  # Not representable as a float64
+
+
+def table() -> WalletTable:
+    registry = Registry.from_dict({"binance": {A: "Binance 1", B: "Binance 2"},
+                                   "kraken": {C: "Kraken 1", D: "Kraken 2"}})
+    balances = {A: (BIG, None), B: (1, None), C: (0, "timeout"), D: (0, "actNotFound")}
+    return WalletTable.build(registry, balances, 123, last_known={C: (7, 1000.0)})
+
+
+def test_totals_are_exact_int64_drops():
+    totals = table().totals()
+    assert totals["drops"].dtype == "int64"
+    assert int(totals.loc["binance", "drops"]) == BIG + 1
+    assert float(BIG) + 1 != BIG + 1  # The same sum in float64 would be off
+
+
+def test_failed_wallets_keep_last_known_drops_and_flags():
+    totals = table().totals()
+    assert int(totals.loc["kraken", "drops"]) == 7
+    assert totals.loc["kraken", ["wallet_count", "errors", "stale", "unfunded"]].tolist() == [2, 1, 1, 1]
+
+
+def test_benchmark_totals_are_exact():
+    totals = table().with_benchmark({A: BIG - 2, B: 1}).totals()
+    assert totals["historical"].dtype == "Int64"
+    assert int(totals.loc["binance", "drops"] - totals.loc["binance", "historical"]) == 2
+    assert not totals.loc["kraken", "has_historical"]
+
+
+def test_round_trip_keeps_int64():
+    restored = WalletTable.from_columns(table().to_columns())
+    assert restored.frame["drops"].dtype == "int64"
+    assert int(restored.totals().loc["binance", "drops"]) == BIG + 1
@@ -0,0 +1,179 @@
+"""
+Columnar wallet table
+Per-wallet balances as int64 drops with categorical codes, aggregated with pandas groupby
+"""
+
+from functools import lru_cache
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+from registry import Registry
+from rippled import ACCOUNT_ERRORS, DROPS_PER_XRP
+
+COLUMNS = ("address", "name", "exchange", "drops", "failed", "stale", "unfunded", "as_of")
+
+
+@lru_cache(maxsize=8)
+def _layout(registry: Registry) -> Tuple[pd.Series, pd.Series, pd.Series]:
+    """Categorical address, label and exchange columns of a registry, built once
+
+    Every table of the same registry shares these columns' categories, so
+    a wallet row costs its integer codes, not its strings.
+    """
+    exchanges = list(registry.exchanges)
+    address = pd.Series(pd.Categorical(registry.addresses, categories=registry.addresses))
+    name = pd.Series(pd.Categorical([registry.label_of(a) for a in registry.addresses]))
+    exchange = pd.Series(pd.Categorical([registry.exchange_of(a) for a in registry.addresses],
+                                        categories=exchanges))
+    return address, name, exchange
+
+
+class WalletTable:
+    """Balances of every tracked wallet in one refresh, one row per wallet
+
+    Columns: address, name and exchange (categoricals), drops (int64), the
+    failed/stale/unfunded flags and as_of (last known balance time for stale
+    rows, NaN otherwise). Balances stay integer drops through aggregation
+    and are only converted to XRP for display, so totals are exact. Treat
+    tables as read-only: select() and with_benchmark() return new tables.
+    """
+
+    def __init__(self, frame: pd.DataFrame, exchanges: List[str],
+                 ledger_index: Optional[int] = None, close_time: Optional[int] = None):
+        self.frame = frame
+        self.exchanges = exchanges
+        self.ledger_index = ledger_index
+        self.close_time = close_time  # Close of `ledger_index` (Unix seconds) when known
+
+    @classmethod
+    def build(cls, registry: Registry, balances: Dict[str, Tuple[int, Optional[str]]],
+              ledger_index: Optional[int] = None,
+              last_known: Optional[Dict[str, Tuple[int, float]]] = None,
+              close_time: Optional[int] = None) -> "WalletTable":
+        """Table from rippled.fetch_balances output
+
+        A failed wallet keeps its `last_known` (drops, as_of) balance and is
+        flagged stale; wallets the ledger reports as missing or malformed
+        are flagged unfunded with zero drops.
+        """
+        last_known = last_known or {}
+        count = len(registry)
+        drops = np.zeros(count, dtype=np.int64)
+        failed = np.zeros(count, dtype=bool)
+        stale = np.zeros(count, dtype=bool)
+        unfunded = np.zeros(count, dtype=bool)
+        as_of = np.full(count, np.nan)
+        for i, address in enumerate(registry.addresses):
+            amount, error = balances.get(address, (0, "Failed to fetch"))
+            if error in ACCOUNT_ERRORS:
+                unfunded[i] = True
+            elif error:
+                failed[i] = True
+                if address in last_known:
+                    drops[i], as_of[i] = last_known[address]
+                    stale[i] = True
+            else:
+                drops[i] = amount
+        address, name, exchange = _layout(registry)
+        frame = pd.DataFrame({
+            "address": address, "name": name, "exchange": exchange, "drops": drops,
+            "failed": failed, "stale": stale, "unfunded": unfunded, "as_of": as_of,
+        })
+        return cls(frame, list(registry.exchanges), ledger_index, close_time)
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    # ------------------------------------------------------------ views
+
+    def select(self, exchanges: Iterable[str]) -> "WalletTable":
+        """Rows of the given exchanges only"""
+        wanted = [name for name in self.exchanges if name in set(exchanges)]
+        frame = self.frame[self.frame["exchange"].isin(wanted)]
+        return WalletTable(frame, wanted, self.ledger_index, self.close_time)
+
+    def with_benchmark(self, historical: Union[pd.Series, Mapping[str, int]]) -> "WalletTable":
+        """Copy with a nullable int64 `historical` drops column from {address: drops}"""
+        if not isinstance(historical, pd.Series):
+            historical = pd.Series(historical, dtype="Int64")
+        aligned = historical.reindex(self.frame["address"].astype(str)).astype("Int64")
+        frame = self.frame.assign(historical=aligned.array)  # .to_numpy() would fall back to float64
+        return WalletTable(frame, self.exchanges, self.ledger_index, self.close_time)
+
+    # ------------------------------------------------------------ aggregates
+
+    def totals(self) -> pd.DataFrame:
+        """Per-exchange drops total and flag counts, indexed by exchange"""
+        groups = self.frame.groupby("exchange", observed=False, sort=False)
+        totals = pd.DataFrame({
+            "drops": groups["drops"].sum(),
+            "wallet_count": groups.size(),
+            "errors": groups["failed"].sum(),
+            "stale": groups["stale"].sum(),
+            "unfunded": groups["unfunded"].sum(),
+        })
+        if "historical" in self.frame:
+            historical = self.frame["historical"].groupby(self.frame["exchange"], observed=False)
+            totals["historical"] = historical.sum()
+            totals["has_historical"] = historical.count() > 0
+        return totals.reindex(self.exchanges, fill_value=0)
+
+    def good_drops(self) -> Dict[str, int]:
+        """{address: drops} of the wallets fetched successfully this refresh"""
+        ok = self.frame[~self.frame["failed"]]
+        return dict(zip(ok["address"].astype(str), ok["drops"].tolist()))
+
+    def last_known(self, taken_at: float) -> Dict[str, Tuple[int, float]]:
+        """{address: (drops, as_of)} worth keeping for wallets that fail next time"""
+        fresh = self.frame[~self.frame["failed"]]
+        stale = self.frame[self.frame["stale"]]
+        known = dict(zip(fresh["address"].astype(str),
+                         zip(fresh["drops"].tolist(), [taken_at] * len(fresh))))
+        known.update(zip(stale["address"].astype(str),
+                         zip(stale["drops"].tolist(), stale["as_of"].tolist())))
+        return known
+
+    def wallets(self, exchange: str) -> pd.DataFrame:
+        """Wallet rows of one exchange with balances in XRP"""
+        rows = self.frame[self.frame["exchange"] == exchange]
+        return rows.assign(balance=rows["drops"] / DROPS_PER_XRP)
+
+    # ------------------------------------------------------------ export
+
+    def to_dict(self) -> Dict:
+        """Nested {exchange: {total, wallets: [...], ...}} with XRP balances"""
+        totals = self.totals()
+        data = {name: {"total": int(row["drops"]) / DROPS_PER_XRP,
+                       "wallet_count": int(row["wallet_count"]), "errors": int(row["errors"]),
+                       "stale": int(row["stale"]), "unfunded": int(row["unfunded"]),
+                       "ledger_index": self.ledger_index, "wallets": []}
+                for name, row in totals.iterrows()}
+        for row in self.frame.itertuples(index=False):
+            data[row.exchange]["wallets"].append({
+                "address": row.address, "name": row.name, "balance": row.drops / DROPS_PER_XRP,
+                "error": "Failed to fetch" if row.failed else None, "stale": bool(row.stale),
+                "as_of": None if np.isnan(row.as_of) else row.as_of, "unfunded": bool(row.unfunded),
+            })
+        return data
+
+    def to_columns(self) -> Dict:
+        """JSON-friendly column lists, inverse of from_columns"""
+        columns = {name: self.frame[name].tolist() for name in COLUMNS}
+        columns["as_of"] = [None if np.isnan(x) else x for x in columns["as_of"]]
+        return {"exchanges": self.exchanges, "ledger_index": self.ledger_index,
+                "close_time": self.close_time, "columns": columns}
+
+    @classmethod
+    def from_columns(cls, raw: Dict) -> "WalletTable":
+        columns = raw["columns"]
+        frame = pd.DataFrame({
+            "address": pd.Categorical(columns["address"]),
+            "name": pd.Categorical(columns["name"]),
+            "exchange": pd.Categorical(columns["exchange"], categories=raw["exchanges"]),
+            "drops": np.asarray(columns["drops"], dtype=np.int64),
+            "failed": np.asarray(columns["failed"], dtype=bool),
+            "stale": np.asarray(columns["stale"], dtype=bool),
+            "unfunded": np.asarray(columns["unfunded"], dtype=bool),
+            "as_of": np.asarray([np.nan if x is None else x for x in columns["as_of"]], dtype=float),
+        })
+        return cls(frame, raw["exchanges"], raw.get("ledger_index"), raw.get("close_time"))